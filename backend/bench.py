@@ -0,0 +1,309 @@
+"""
+Micro-benchmarks for the service-layer hot functions.
+
+Fixtures are generated deterministically (fixed seed, fake upstream payloads),
+so runs are comparable. Each case reports nanoseconds per call and its cost
+relative to a fixed pure-Python calibration loop timed in alternation with it;
+--check compares the relative cost, so a baseline recorded on one machine can
+be checked on another (and on a noisy one).
+
+The startup case times `import main` in fresh interpreters, relative to
+importing FastAPI alone, and --check also fails if the upstream SDKs (which
+are imported on first use) were imported with it.
+
+Usage:
+    python bench.py                 # run all cases
+    python bench.py --save          # record bench_baseline.json
+    python bench.py --check         # exit 1 if a case regressed past --tolerance
+    python bench.py -k youtube      # only cases whose name contains "youtube"
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import timeit
+
+import httpx
+
+from pipeline import build_topic
+from services.fakes import (
+    FakeFirecrawlClient,
+    FakeUpstream,
+    FakeYouTubeClient,
+    UpstreamProfile,
+    fake_serper_transport,
+)
+from services.scraper import scraper_service
+from services.search import search_service
+from services.youtube import youtube_service
+from ranking import domain_reputation, rank_roadmap
+
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BACKEND_DIR, "bench_baseline.json")
+SEED = 20240601
+
+STARTUP_CASE = "startup.import_main"
+# Slow SDK imports that must stay out of `import main`
+LAZY_MODULES = ("google.genai", "googleapiclient.discovery", "firecrawl")
+
+COURSE_URL_TEMPLATES = [
+    "https://www.udemy.com/course/{}/",
+    "https://www.coursera.org/learn/{}",
+    "https://www.skillshare.com/en/classes/{}",
+    "https://www.pluralsight.com/courses/{}",
+    "https://www.linkedin.com/learning/{}",
+    "https://www.edx.org/course/{}",
+    "https://example-academy.io/courses/{}",
+]
+
+
+def build_fixtures() -> dict:
+    """Deterministic inputs for every case, shaped like real upstream payloads."""
+    rng = random.Random(SEED)
+    instant = UpstreamProfile(median_latency=0.0)
+    slugs = [f"{rng.choice(['python', 'react', 'docker', 'sql', 'rust'])}-course-{i}" for i in range(50)]
+    course_urls = [COURSE_URL_TEMPLATES[i % len(COURSE_URL_TEMPLATES)].format(slug) for i, slug in enumerate(slugs)]
+
+    firecrawl = FakeFirecrawlClient(FakeUpstream("firecrawl", instant))
+    pages = [firecrawl.scrape_url(url) for url in course_urls[:20]]
+
+    serper = fake_serper_transport(FakeUpstream("serper", instant))
+    organic, video_results = [], []
+    for slug in slugs[:20]:
+        for payload, results, key in (({"q": slug, "num": 10}, organic, "organic"),
+                                      ({"q": slug, "type": "videos", "num": 10}, video_results, "videos")):
+            request = httpx.Request("POST", "https://google.serper.dev/search", json=payload)
+            results.extend(serper.handle_request(request).json()[key])
+
+    video_urls = [v["link"] for v in video_results]
+    video_urls += [
+        f"https://youtu.be/{v['link'][-11:]}?t=42" for v in video_results[:20]
+    ] + [
+        f"https://www.youtube.com/embed/{v['link'][-11:]}" for v in video_results[:20]
+    ] + ["https://www.youtube.com/channel/UC", "https://example.com/video"] * 5
+
+    ids = [url[-11:] for url in video_urls[:50]]
+    items = FakeYouTubeClient(FakeUpstream("youtube", instant)).videos().list(id=",".join(ids)).execute()["items"]
+
+    doc_candidates = [d for d in (search_service._parse_result(r) for r in organic) if d]
+    video_candidates = [
+        {
+            "title": item["snippet"]["title"],
+            "url": f"https://www.youtube.com/watch?v={item['id']}",
+            "_view_count": int(item["statistics"]["viewCount"]),
+            "_duration_seconds": youtube_service._iso_duration_seconds(item["contentDetails"]["duration"]),
+            "_key": item["id"],
+        }
+        for item in items
+    ]
+    roadmap_topics = [{"topic": f"Topic {i}", "estimatedHours": rng.choice([1, 2.5, 4, 8])} for i in range(15)]
+
+    videos = [
+        {k: v for k, v in video.items() if not k.startswith("_")}
+        for video in youtube_service._fallback_response(video_results[:3], 3)
+    ]
+    docs = [search_service._parse_result(r) for r in organic]
+    docs = [{k: v for k, v in d.items() if not k.startswith("_")} for d in docs if d][:2]
+
+    return {
+        "course_urls": course_urls,
+        "pages": [(page["markdown"], {}) for page in pages] + [(page["markdown"], page["metadata"]) for page in pages],
+        "organic": organic,
+        "video_urls": video_urls,
+        "durations": [item["contentDetails"]["duration"] for item in items],
+        "view_counts": [int(item["statistics"]["viewCount"]) for item in items] + [0, 999, 12_000_000_000],
+        # One roadmap: 15 topics with 10 video and 10 doc candidates each (overlapping across topics)
+        "roadmap": [(
+            roadmap_topics,
+            [[video_candidates[(3 * i + j) % len(video_candidates)] for j in range(10)] for i in range(15)],
+            [[doc_candidates[(3 * i + j) % len(doc_candidates)] for j in range(10)] for i in range(15)],
+        )],
+        "topics": [
+            (i, {"topic": f"Topic {i}", "description": "Description", "estimatedHours": 2.5}, videos, docs)
+            for i in range(15)
+        ],
+    }
+
+
+def build_cases(fixtures: dict) -> dict:
+    """Case name -> (function, list of argument tuples)."""
+    return {
+        "scraper.detect_platform": (scraper_service.detect_platform, [(u,) for u in fixtures["course_urls"]]),
+        "scraper.extract_title": (scraper_service._extract_title, fixtures["pages"]),
+        "search.parse_result": (search_service._parse_result, [(r,) for r in fixtures["organic"]]),
+        "youtube.extract_video_id": (youtube_service._extract_video_id, [(u,) for u in fixtures["video_urls"]]),
+        "youtube.parse_iso_duration": (youtube_service._parse_iso_duration, [(d,) for d in fixtures["durations"]]),
+        "youtube.format_views": (youtube_service._format_views, [(c,) for c in fixtures["view_counts"]]),
+        "pipeline.build_topic": (build_topic, fixtures["topics"]),
+        "ranking.score_url": (domain_reputation.score_url, [(r["link"],) for r in fixtures["organic"]]),
+        "ranking.rank_roadmap": (rank_roadmap, fixtures["roadmap"]),
+    }
+
+
+def _calibration_loop() -> int:
+    total = 0
+    for i in range(1000):
+        total += i * i % 7
+    return total
+
+
+def _timer(func, args_list: list) -> tuple[timeit.Timer, int]:
+    def run():
+        for args in args_list:
+            func(*args)
+
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    return timer, number * len(args_list)
+
+
+def time_case(func, args_list: list, repeat: int) -> dict:
+    """
+    Best-of-repeat nanoseconds per call, alternating with the calibration loop.
+
+    Returns:
+        dict with "ns" per call and "relative" (ns / calibration ns)
+    """
+    case_timer, case_calls = _timer(func, args_list)
+    calibration_timer, calibration_calls = _timer(_calibration_loop, [()])
+    case_best = calibration_best = float("inf")
+    for _ in range(repeat):
+        calibration_best = min(calibration_best, calibration_timer.timeit(calibration_calls) / calibration_calls)
+        case_best = min(case_best, case_timer.timeit(case_calls // len(args_list)) / case_calls)
+    return {"ns": case_best * 1e9, "relative": case_best / calibration_best}
+
+
+def run_benchmarks(cases: dict, repeat: int) -> dict:
+    return {name: time_case(func, args_list, repeat) for name, (func, args_list) in cases.items()}
+
+
+def _import_seconds(module: str) -> tuple[float, list[str]]:
+    """Import time of a module in a fresh interpreter, and the LAZY_MODULES it pulled in."""
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps([elapsed, [m for m in {LAZY_MODULES!r} if m in sys.modules]]))\n"
+    )
+    env = dict(os.environ, LOG_LEVEL="CRITICAL")
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    elapsed, loaded = json.loads(output.strip().splitlines()[-1])
+    return elapsed, loaded
+
+
+def time_startup(repeat: int) -> dict:
+    """
+    Best-of-repeat `import main` time, alternating with importing FastAPI alone.
+
+    Returns:
+        dict with "ns", "relative" (main / fastapi) and "eager" (LAZY_MODULES imported)
+    """
+    main_best = fastapi_best = float("inf")
+    eager = set()
+    for _ in range(repeat):
+        fastapi_best = min(fastapi_best, _import_seconds("fastapi")[0])
+        elapsed, loaded = _import_seconds("main")
+        main_best = min(main_best, elapsed)
+        eager.update(loaded)
+    return {"ns": main_best * 1e9, "relative": main_best / fastapi_best, "eager": sorted(eager)}
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Names of cases whose relative cost exceeds the baseline by more than tolerance."""
+    return [
+        name for name, result in results.items()
+        if name in baseline and result["relative"] > baseline[name]["relative"] * (1 + tolerance)
+    ]
+
+
+def check(measure, results: dict, baseline: dict, args: argparse.Namespace) -> list[str]:
+    """
+    Compare against the baseline, re-measuring flagged cases before failing.
+
+    A real regression survives every retry; scheduler noise usually does not.
+    measure(name) times one case again.
+    """
+    for _ in range(args.retries):
+        flagged = regressions(results, baseline, args.tolerance)
+        if not flagged:
+            break
+        print(f"Re-measuring {len(flagged)} case(s): {', '.join(flagged)}")
+        for name in flagged:
+            retry = measure(name)
+            if retry["relative"] < results[name]["relative"]:
+                results[name] = retry
+
+    failed = regressions(results, baseline, args.tolerance)
+    for name, result in results.items():
+        if result.get("eager"):
+            print(f"  {name:<30} imports {', '.join(result['eager'])} eagerly  REGRESSION")
+            if name not in failed:
+                failed.append(name)
+            continue
+        if name not in baseline:
+            print(f"  {name:<30} {result['ns']:>10.0f} ns  (no baseline)")
+            continue
+        ratio = result["relative"] / baseline[name]["relative"]
+        status = "REGRESSION" if name in failed else "ok"
+        print(f"  {name:<30} {result['ns']:>10.0f} ns  x{ratio:.2f} vs baseline  {status}")
+    return failed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark service-layer hot functions.")
+    parser.add_argument("-k", dest="selected", default="", help="Only run cases containing this string")
+    parser.add_argument("--repeat", type=int, default=10, help="Timing repeats per case (best is kept)")
+    parser.add_argument("--save", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Compare against the baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown for --check (0.25 = 25%%)")
+    parser.add_argument("--retries", type=int, default=2, help="Re-measure flagged cases this many times for --check")
+    parser.add_argument("--startup-repeat", type=int, default=5, help="Fresh interpreters per startup timing")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON path")
+    args = parser.parse_args()
+
+    cases = {name: case for name, case in build_cases(build_fixtures()).items() if args.selected in name}
+    results = run_benchmarks(cases, args.repeat)
+    if args.selected in STARTUP_CASE:
+        results[STARTUP_CASE] = time_startup(args.startup_repeat)
+
+    def measure(name: str) -> dict:
+        if name == STARTUP_CASE:
+            return time_startup(args.startup_repeat)
+        return time_case(*cases[name], args.repeat)
+
+    if args.check:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        failed = check(measure, results, baseline, args)
+        if failed:
+            print(f"❌ {len(failed)} regression(s): {', '.join(failed)}")
+            sys.exit(1)
+        print("✅ No regressions")
+        return
+
+    for name, result in results.items():
+        if name == STARTUP_CASE:
+            print(f"  {name:<30} {result['ns'] / 1e6:>10.0f} ms  ({result['relative']:.2f} x import fastapi)")
+            continue
+        print(f"  {name:<30} {result['ns']:>10.0f} ns/call  ({result['relative']:.4f} x calibration)")
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {name: {"ns": round(r["ns"], 1), "relative": round(r["relative"], 5)} for name, r in results.items()},
+                f, indent=2, sort_keys=True,
+            )
+            f.write("\n")
+        print(f"💾 Baseline written to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,44 +5,160 @@ Helps reduce Firecrawl API usage by caching results.
 
 import hashlib
 import time
-from typing import Optional, Any
+from typing import Optional, Any, Callable
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from config import settings
+from metrics import CACHE_EVENTS
+
+
+# Query parameters that only track referrals/campaigns and never change the course
+TRACKING_PARAMS = {
+    "couponcode", "referralcode", "ranmid", "raneaid", "ransiteid",
+    "lsnpubid", "gclid", "fbclid", "ref",
+}
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalize a course URL into a canonical key.
+    
+    Forces https, lowercases the host, drops "www.", fragments, trailing slashes
+    and tracking parameters so that the same course shares one cache entry.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    query.sort()
+    
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def hash_key(key: str) -> str:
+    """Hash a cache key; the hash of a canonical URL doubles as its course ID."""
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+class LazyValue:
+    """Raw payload restored from a snapshot, decoded on first access."""
+    
+    __slots__ = ("raw", "decode")
+    
+    def __init__(self, raw: str, decode: Callable[[str], Any]):
+        self.raw = raw
+        self.decode = decode
 
 
 class SimpleCache:
     """Thread-safe in-memory cache with TTL."""
     
-    def __init__(self, ttl: int = None):
+    def __init__(self, ttl: int = None, name: str = "default"):
         self._cache: dict[str, tuple[Any, float]] = {}
         self._ttl = ttl or settings.CACHE_TTL
+        self.name = name
+        self._hits = CACHE_EVENTS.labels(name, "hit")
+        self._misses = CACHE_EVENTS.labels(name, "miss")
+        self._evictions = CACHE_EVENTS.labels(name, "eviction")
+        self._subscribers: list[tuple[Callable, Callable]] = []
+    
+    def subscribe(self, on_store: Callable[[str, Any, float], None], on_remove: Callable[[str], None]) -> None:
+        """Call on_store(hashed_key, value, timestamp) for every stored entry and on_remove(hashed_key) when one goes."""
+        self._subscribers.append((on_store, on_remove))
+    
+    def _stored(self, hashed: str, value: Any, timestamp: float) -> None:
+        for on_store, _ in self._subscribers:
+            on_store(hashed, value, timestamp)
+    
+    def _removed(self, hashed: str) -> None:
+        for _, on_remove in self._subscribers:
+            on_remove(hashed)
     
     def _hash_key(self, key: str) -> str:
         """Create a hash of the key for consistent storage."""
-        return hashlib.md5(key.encode()).hexdigest()
+        return hash_key(key)
     
     def get(self, key: str) -> Optional[Any]:
         """Get a value from cache if it exists and hasn't expired."""
-        hashed = self._hash_key(key)
-        
+        return self.get_hashed(self._hash_key(key))
+    
+    def get_hashed(self, hashed: str) -> Optional[Any]:
+        """Get a value by its already-hashed key."""
         if hashed not in self._cache:
+            self._misses.inc()
             return None
         
         value, timestamp = self._cache[hashed]
         
         # Check if expired
         if time.time() - timestamp > self._ttl:
-            del self._cache[hashed]
+            self._cache.pop(hashed, None)
+            self._removed(hashed)
+            self._evictions.inc()
+            self._misses.inc()
             return None
         
+        self._hits.inc()
+        
+        # Decode snapshot entries the first time they are read
+        if isinstance(value, LazyValue):
+            value = value.decode(value.raw)
+            self._cache[hashed] = (value, timestamp)
+        
         return value
     
-    def set(self, key: str, value: Any) -> None:
-        """Store a value in cache with current timestamp."""
+    def expires_in(self, hashed: str) -> Optional[float]:
+        """Seconds until an entry expires (None if absent or expired); not counted as a lookup."""
+        entry = self._cache.get(hashed)
+        if entry is None:
+            return None
+        remaining = self._ttl - (time.time() - entry[1])
+        return remaining if remaining >= 0 else None
+    
+    def set(self, key: str, value: Any, timestamp: float = None) -> None:
+        """Store a value in cache with current (or given) timestamp."""
         hashed = self._hash_key(key)
-        self._cache[hashed] = (value, time.time())
+        timestamp = timestamp or time.time()
+        self._cache[hashed] = (value, timestamp)
+        self._stored(hashed, value, timestamp)
+    
+    def entries(self) -> list[tuple[str, Any, float]]:
+        """Return (hashed_key, value, timestamp) for all unexpired entries."""
+        now = time.time()
+        return [
+            (k, value, ts) for k, (value, ts) in list(self._cache.items())
+            if now - ts <= self._ttl
+        ]
+    
+    def restore(self, hashed_key: str, value: Any, timestamp: float) -> bool:
+        """
+        Restore an entry by its hashed key (used when loading snapshots).
+        
+        Expired entries and entries older than what is already cached are
+        skipped. Returns True if the entry was stored.
+        """
+        if time.time() - timestamp > self._ttl:
+            return False
+        current = self._cache.get(hashed_key)
+        if current and current[1] >= timestamp:
+            return False
+        self._cache[hashed_key] = (value, timestamp)
+        self._stored(hashed_key, value, timestamp)
+        return True
+    
+    def __len__(self) -> int:
+        return len(self._cache)
     
     def clear(self) -> None:
         """Clear all cached values."""
+        if self._subscribers:
+            for hashed in list(self._cache):
+                self._removed(hashed)
         self._cache.clear()
     
     def cleanup_expired(self) -> int:
@@ -54,9 +170,71 @@ class SimpleCache:
         ]
         for k in expired_keys:
             del self._cache[k]
+            self._removed(k)
+        self._evictions.inc(len(expired_keys))
+        return len(expired_keys)
+
+
+class NegativeCache:
+    """
+    Short-lived cache of failures, each entry with its own TTL.
+    
+    Bounded to max_entries (oldest dropped first), since the keys come
+    from arbitrary user-submitted URLs.
+    """
+    
+    def __init__(self, max_entries: int, name: str = "negative"):
+        self._cache: dict[str, tuple[Any, float]] = {}
+        self.max_entries = max_entries
+        self.name = name
+        self._hits = CACHE_EVENTS.labels(name, "hit")
+        self._misses = CACHE_EVENTS.labels(name, "miss")
+        self._evictions = CACHE_EVENTS.labels(name, "eviction")
+    
+    def get_hashed(self, hashed: str) -> Optional[tuple[Any, float]]:
+        """Return (value, seconds left) if an unexpired failure is cached."""
+        entry = self._cache.get(hashed)
+        if entry is None:
+            self._misses.inc()
+            return None
+        value, expires_at = entry
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            self._cache.pop(hashed, None)
+            self._evictions.inc()
+            self._misses.inc()
+            return None
+        self._hits.inc()
+        return value, remaining
+    
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Cache a failure for ttl seconds (ttl <= 0 disables)."""
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        hashed = hash_key(key)
+        self._cache.pop(hashed, None)
+        while len(self._cache) >= self.max_entries:
+            self._cache.pop(next(iter(self._cache)))
+            self._evictions.inc()
+        self._cache[hashed] = (value, time.time() + ttl)
+    
+    def __len__(self) -> int:
+        return len(self._cache)
+    
+    def clear(self) -> None:
+        self._cache.clear()
+    
+    def cleanup_expired(self) -> int:
+        """Remove expired entries and return count of removed items."""
+        now = time.time()
+        expired_keys = [k for k, (_, expires_at) in self._cache.items() if expires_at <= now]
+        for k in expired_keys:
+            del self._cache[k]
+        self._evictions.inc(len(expired_keys))
         return len(expired_keys)
 
 
 # Global cache instances
-course_cache = SimpleCache()  # Cache for scraped course content
-roadmap_cache = SimpleCache()  # Cache for full generated roadmaps
+course_cache = SimpleCache(name="course")  # Cache for scraped course content
+roadmap_cache = SimpleCache(name="roadmap")  # Cache for full generated roadmaps
+scrape_failure_cache = NegativeCache(settings.NEGATIVE_CACHE_MAX_ENTRIES, name="scrape_failure")  # Failed scrapes
@@ -13,15 +13,48 @@ load_dotenv()
 class Settings:
     """Application settings loaded from environment variables."""
     
-    # API Keys
+    # API Keys (each may be a comma-separated list; calls rotate over the pool)
     FIRECRAWL_API_KEY: str = os.getenv("FIRECRAWL_API_KEY", "")
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     SERPER_API_KEY: str = os.getenv("SERPER_API_KEY", "")
     YOUTUBE_API_KEY: str = os.getenv("YOUTUBE_API_KEY", "")
     
+    # Per-key quotas (0 = unlimited, usage is still counted)
+    FIRECRAWL_CREDITS_PER_KEY: int = int(os.getenv("FIRECRAWL_CREDITS_PER_KEY", "0"))
+    GEMINI_RPM_PER_KEY: int = int(os.getenv("GEMINI_RPM_PER_KEY", "15"))
+    GEMINI_TPM_PER_KEY: int = int(os.getenv("GEMINI_TPM_PER_KEY", "250000"))
+    
+    # Gemini model routing: models from cheapest to heaviest (the next one retries invalid answers)
+    GEMINI_MODELS: str = os.getenv("GEMINI_MODELS", "gemini-2.5-flash-lite,gemini-2.5-flash")
+    # Pages up to GEMINI_SMALL_INPUT_CHARS get a smaller answer budget: room for the
+    # most topics the prompt allows at GEMINI_TOKENS_PER_TOPIC each (a JSON topic with
+    # its description runs to about 100 tokens)
+    GEMINI_SMALL_INPUT_CHARS: int = int(os.getenv("GEMINI_SMALL_INPUT_CHARS", "3000"))
+    GEMINI_TOKENS_PER_TOPIC: int = int(os.getenv("GEMINI_TOKENS_PER_TOPIC", "128"))
+    GEMINI_MAX_OUTPUT_TOKENS: int = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "2048"))
+    # Heavier models may think before answering; thinking counts against the output budget
+    GEMINI_ESCALATED_OUTPUT_TOKENS: int = int(os.getenv("GEMINI_ESCALATED_OUTPUT_TOKENS", "8192"))
+    GEMINI_MAX_CONTENT_CHARS: int = int(os.getenv("GEMINI_MAX_CONTENT_CHARS", "15000"))
+    # Under pressure (quota headroom below GEMINI_LOW_QUOTA_HEADROOM or smoothed latency
+    # above GEMINI_SLOW_SECONDS) content is cut to GEMINI_PRESSURE_CONTENT_CHARS and not escalated
+    GEMINI_PRESSURE_CONTENT_CHARS: int = int(os.getenv("GEMINI_PRESSURE_CONTENT_CHARS", "8000"))
+    GEMINI_LOW_QUOTA_HEADROOM: float = float(os.getenv("GEMINI_LOW_QUOTA_HEADROOM", "0.1"))
+    GEMINI_SLOW_SECONDS: float = float(os.getenv("GEMINI_SLOW_SECONDS", "10"))
+    SERPER_CREDITS_PER_KEY: int = int(os.getenv("SERPER_CREDITS_PER_KEY", "0"))
+    YOUTUBE_UNITS_PER_DAY: int = int(os.getenv("YOUTUBE_UNITS_PER_DAY", "10000"))
+    # Cooldown after a 429 (rate) or 402/403 (quota) from a key, doubling while it keeps failing
+    KEY_COOLDOWN_SECONDS: float = float(os.getenv("KEY_COOLDOWN_SECONDS", "60"))
+    KEY_QUOTA_COOLDOWN_SECONDS: float = float(os.getenv("KEY_QUOTA_COOLDOWN_SECONDS", "3600"))
+    KEY_MAX_COOLDOWN_SECONDS: float = float(os.getenv("KEY_MAX_COOLDOWN_SECONDS", "21600"))
+    
     # App settings
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
     
+    # Logging: level, "color" or "json" output, background writer thread
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "color").lower()
+    LOG_ASYNC: bool = os.getenv("LOG_ASYNC", "true").lower() == "true"
+    
     # CORS - Allow frontend origins
     ALLOWED_ORIGINS: list = [
         "http://localhost:5173",  # Vite dev server
@@ -29,12 +62,120 @@ class Settings:
         "https://*.vercel.app",   # Vercel deployments
     ]
     
-    # Rate limiting (simple in-memory)
-    MAX_REQUESTS_PER_MINUTE: int = 5
+    # Threads for blocking upstream calls (scrape, LLM, searches)
+    EXECUTOR_WORKERS: int = int(os.getenv("EXECUTOR_WORKERS", "32"))
+    
+    # Upstream SDKs are imported lazily; warm them up in the background after startup
+    WARM_UP_CLIENTS: bool = os.getenv("WARM_UP_CLIENTS", "true").lower() == "true"
+    
+    # Offline mode: replace all upstream APIs with local fakes (load testing)
+    FAKE_UPSTREAMS: bool = os.getenv("FAKE_UPSTREAMS", "false").lower() == "true"
+    FAKE_LATENCY_SCALE: float = float(os.getenv("FAKE_LATENCY_SCALE", "1.0"))
+    
+    # Upstream cassettes: "off", "record" (capture real responses) or "replay" (serve them offline)
+    CASSETTE_MODE: str = os.getenv("CASSETTE_MODE", "off").lower()
+    CASSETTE_DIR: str = os.getenv("CASSETTE_DIR", "data/cassettes")
+    CASSETTE_LATENCY_SCALE: float = float(os.getenv("CASSETTE_LATENCY_SCALE", "1.0"))
+    
+    # Rate limiting per client IP (in-memory token buckets)
+    # Uncached roadmap generations per client per minute (cache hits are not charged)
+    MAX_REQUESTS_PER_MINUTE: int = int(os.getenv("MAX_REQUESTS_PER_MINUTE", "5"))
+    # Coarse limit on all requests per client per minute (flood protection)
+    CLIENT_REQUESTS_PER_MINUTE: int = int(os.getenv("CLIENT_REQUESTS_PER_MINUTE", "120"))
+    # Clients tracked at once (least recently seen are forgotten)
+    RATE_LIMIT_MAX_CLIENTS: int = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+    # Use the first X-Forwarded-For hop as the client IP (only behind a trusted proxy)
+    TRUST_FORWARDED_FOR: bool = os.getenv("TRUST_FORWARDED_FOR", "false").lower() == "true"
+    
+    # Generation scheduling: at most MAX_PIPELINES_IN_FLIGHT pipelines run at once (0 = no cap);
+    # further cache misses wait in a per-client fair queue, and are shed with 503 when it is full
+    MAX_PIPELINES_IN_FLIGHT: int = int(os.getenv("MAX_PIPELINES_IN_FLIGHT", "8"))
+    GENERATION_QUEUE_SIZE: int = int(os.getenv("GENERATION_QUEUE_SIZE", "64"))
+    OVERLOAD_RETRY_AFTER: int = int(os.getenv("OVERLOAD_RETRY_AFTER", "15"))
+    # Most course URLs accepted by POST /generate-roadmaps
+    BATCH_MAX_URLS: int = int(os.getenv("BATCH_MAX_URLS", "25"))
+    # Seconds between client-disconnect checks for queued requests
+    QUEUE_POLL_INTERVAL: float = float(os.getenv("QUEUE_POLL_INTERVAL", "1.0"))
     
     # Cache TTL in seconds (24 hours)
     CACHE_TTL: int = 86400
     
+    # Negative cache for failed scrapes, keyed by canonical URL: permanent failures
+    # (404, not a course page) are remembered longer than transient ones (timeouts,
+    # 5xx, rate limits). 0 disables caching of that kind.
+    NEGATIVE_CACHE_TTL_PERMANENT: int = int(os.getenv("NEGATIVE_CACHE_TTL_PERMANENT", "3600"))
+    NEGATIVE_CACHE_TTL_TRANSIENT: int = int(os.getenv("NEGATIVE_CACHE_TTL_TRANSIENT", "60"))
+    NEGATIVE_CACHE_MAX_ENTRIES: int = int(os.getenv("NEGATIVE_CACHE_MAX_ENTRIES", "10000"))
+    
+    # Near-duplicate courses: a scrape whose content is at least this similar
+    # (estimated Jaccard over word shingles) to a cached course, on any URL or
+    # platform, and whose title shares at least SIMILARITY_TITLE_THRESHOLD of
+    # its words, reuses that roadmap's topics. 0 disables.
+    # Pages with fewer distinct shingles (walls, interstitials) never match.
+    SIMILARITY_THRESHOLD: float = float(os.getenv("SIMILARITY_THRESHOLD", "0.95"))
+    SIMILARITY_TITLE_THRESHOLD: float = float(os.getenv("SIMILARITY_TITLE_THRESHOLD", "0.5"))
+    SIMILARITY_MIN_SHINGLES: int = int(os.getenv("SIMILARITY_MIN_SHINGLES", "150"))
+    SIMILARITY_MAX_ENTRIES: int = int(os.getenv("SIMILARITY_MAX_ENTRIES", "50000"))
+    
+    # Compression for cached roadmap bytes: "gzip", "zstd" (needs zstandard) or "none"
+    CACHE_COMPRESSION: str = os.getenv("CACHE_COMPRESSION", "gzip").lower()
+    
+    # Cache-Control for GET /roadmaps/{course_id} (browser + Vercel/CDN edge)
+    ROADMAP_CACHE_CONTROL: str = os.getenv(
+        "ROADMAP_CACHE_CONTROL",
+        "public, max-age=3600, s-maxage=86400, stale-while-revalidate=604800",
+    )
+    
+    # Cache warmer: regenerates the WARM_TOP_K most requested roadmaps (at least
+    # WARM_MIN_REQUESTS lookups, halved every WARM_DECAY_INTERVAL seconds) that expire
+    # within WARM_REFRESH_AHEAD seconds, checked every WARM_INTERVAL seconds
+    CACHE_WARMER: bool = os.getenv("CACHE_WARMER", "true").lower() == "true"
+    WARM_TOP_K: int = int(os.getenv("WARM_TOP_K", "100"))
+    WARM_MIN_REQUESTS: int = int(os.getenv("WARM_MIN_REQUESTS", "3"))
+    WARM_DECAY_INTERVAL: float = float(os.getenv("WARM_DECAY_INTERVAL", "21600"))
+    WARM_REFRESH_AHEAD: float = float(os.getenv("WARM_REFRESH_AHEAD", "7200"))
+    WARM_INTERVAL: float = float(os.getenv("WARM_INTERVAL", "60"))
+    # Only in these UTC hours ("0-6,22-24"; blank = any time), with no queued generations
+    # and at least WARM_MIN_QUOTA_HEADROOM of Gemini quota left; at most WARM_MAX_PER_HOUR (0 = no cap)
+    WARM_OFF_PEAK_HOURS: str = os.getenv("WARM_OFF_PEAK_HOURS", "")
+    WARM_MIN_QUOTA_HEADROOM: float = float(os.getenv("WARM_MIN_QUOTA_HEADROOM", "0.5"))
+    WARM_MAX_PER_HOUR: int = int(os.getenv("WARM_MAX_PER_HOUR", "30"))
+    
+    # Persistent roadmap store (loaded into the cache on startup)
+    ROADMAP_STORE_PATH: str = os.getenv("ROADMAP_STORE_PATH", "data/roadmaps.jsonl")
+    
+    # Cache snapshot written on shutdown and restored on startup (.gz = compressed)
+    CACHE_SNAPSHOT_PATH: str = os.getenv("CACHE_SNAPSHOT_PATH", "data/cache-snapshot.jsonl.gz")
+    
+    # Event loop lag monitor: sample interval and stall threshold (seconds)
+    LOOP_MONITOR: bool = os.getenv("LOOP_MONITOR", "true").lower() == "true"
+    LOOP_LAG_INTERVAL: float = float(os.getenv("LOOP_LAG_INTERVAL", "0.25"))
+    LOOP_LAG_THRESHOLD: float = float(os.getenv("LOOP_LAG_THRESHOLD", "0.1"))
+    
+    # Readiness (GET /ready): sampled every READY_PROBE_INTERVAL seconds over READY_WINDOW_SECONDS
+    READY_PROBE_INTERVAL: float = float(os.getenv("READY_PROBE_INTERVAL", "5"))
+    READY_WINDOW_SECONDS: float = float(os.getenv("READY_WINDOW_SECONDS", "60"))
+    # An upstream is failing at this error rate over at least READY_MIN_CALLS calls
+    READY_MAX_ERROR_RATE: float = float(os.getenv("READY_MAX_ERROR_RATE", "0.5"))
+    READY_MIN_CALLS: int = int(os.getenv("READY_MIN_CALLS", "5"))
+    # Not ready (503) past this loop lag (seconds) or executor backlog (0 = no limit)
+    READY_MAX_LOOP_LAG: float = float(os.getenv("READY_MAX_LOOP_LAG", "0.5"))
+    READY_MAX_EXECUTOR_QUEUE: int = int(os.getenv("READY_MAX_EXECUTOR_QUEUE", "200"))
+    
+    # Sampling profiler limits for /admin/profile
+    PROFILE_MAX_SECONDS: float = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+    PROFILE_MIN_INTERVAL_MS: float = float(os.getenv("PROFILE_MIN_INTERVAL_MS", "2"))
+    
+    # Tracing: keep the N slowest requests of the last TRACE_WINDOW seconds
+    TRACE_BUFFER_SIZE: int = int(os.getenv("TRACE_BUFFER_SIZE", "20"))
+    TRACE_WINDOW: int = int(os.getenv("TRACE_WINDOW", "3600"))
+    # Optional directory for Chrome trace JSON of kept traces slower than the minimum
+    TRACE_EXPORT_DIR: str = os.getenv("TRACE_EXPORT_DIR", "")
+    TRACE_EXPORT_MIN_SECONDS: float = float(os.getenv("TRACE_EXPORT_MIN_SECONDS", "5"))
+    
+    # Token required in the X-Admin-Token header for /admin endpoints (empty = disabled)
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    
     def validate(self) -> list[str]:
         """Check if required API keys are set. Returns list of missing keys."""
         missing = []
@@ -0,0 +1,207 @@
+"""
+Readiness probing for FuckPaidCourses backend.
+
+GET /health only says whether keys are configured. GET /ready is meant for
+load balancers that poll constantly, so it never does work per request: a
+background task samples upstream health and local saturation every
+READY_PROBE_INTERVAL seconds and caches the verdict as ready-to-send JSON.
+
+Upstream latency and error rates come from the calls the shared clients
+already make (fpc_upstream_calls_total / fpc_upstream_call_seconds) over the
+last READY_WINDOW_SECONDS, together with the key pools' remaining budget.
+Probing the paid APIs directly would spend quota on every sample. Local
+saturation covers event loop lag (measured by the prober's own wake-ups, and
+only counted when it lasts over two samples, so one slow callback doesn't fail
+the probe) and the queues in front of the pipeline.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Optional
+
+from config import settings
+from keypool import KeyPool, QUOTA_STATUSES
+from logger import logger
+from metrics import registry, UPSTREAM_CALLS, UPSTREAM_SECONDS
+
+
+READY = registry.gauge(
+    "fpc_ready",
+    "1 when GET /ready reports the instance able to serve (ready or degraded)",
+)
+UPSTREAM_ERROR_RATE = registry.gauge(
+    "fpc_upstream_error_rate",
+    "Failed share of upstream calls over the readiness window",
+    ("upstream",),
+)
+
+
+def is_failure(outcome: str) -> bool:
+    """
+    Whether an upstream call outcome counts against the upstream's health.
+
+    Client errors such as a 404 for a missing course page are answers, not
+    failures; 5xx, timeouts and quota/rate statuses are failures.
+    """
+    if outcome == "ok":
+        return False
+    if outcome.isdigit() and 400 <= int(outcome) < 500:
+        return outcome in QUOTA_STATUSES
+    return True
+
+
+def _quantile(counts: list[int], buckets: tuple, q: float) -> Optional[float]:
+    """Upper bucket bound below which a fraction q of observations fall."""
+    total = sum(counts)
+    if not total:
+        return None
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        if cumulative >= q * total:
+            return bound
+    return buckets[-1]  # In the +Inf bucket: report the largest finite bound
+
+
+def _sample_upstreams() -> dict[str, dict]:
+    """Cumulative calls, failures and latency buckets per upstream."""
+    samples: dict[str, dict] = {}
+    for (upstream, outcome), child in UPSTREAM_CALLS.children():
+        sample = samples.setdefault(upstream, {"calls": 0.0, "failures": 0.0, "latency": None})
+        sample["calls"] += child.value
+        if is_failure(outcome):
+            sample["failures"] += child.value
+    for (upstream,), child in UPSTREAM_SECONDS.children():
+        sample = samples.setdefault(upstream, {"calls": 0.0, "failures": 0.0, "latency": None})
+        sample["latency"] = child.snapshot()[0]
+    return samples
+
+
+class ReadinessProber:
+    """Background sampler of upstream and saturation health with a cached /ready answer."""
+
+    def __init__(
+        self,
+        pools: dict[str, KeyPool],
+        saturation: Callable[[], dict[str, dict]],
+        interval: float = 5.0,
+        window: float = 60.0,
+    ):
+        self.pools = pools
+        self.saturation = saturation
+        self.interval = interval
+        self.window = window
+        self._samples: deque = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._lags: deque = deque(maxlen=2)
+        self.status = "starting"
+        self.status_code = 503
+        self.body = json.dumps({"status": "starting"}).encode("utf-8")
+
+    def start(self) -> None:
+        """Take a first sample now and keep sampling on the running loop."""
+        self.sample()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._lags.append(max(0.0, time.monotonic() - start - self.interval))
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error("Readiness sample failed: %s", e)
+
+    @property
+    def loop_lag(self) -> float:
+        """Wake-up lag sustained over the last two samples (seconds)."""
+        return min(self._lags, default=0.0)
+
+    def _upstream_health(self, name: str) -> dict:
+        """Calls, error rate, latency and key budget of one upstream over the window."""
+        newest = self._samples[-1][1].get(name)
+        oldest = self._samples[0][1].get(name) if len(self._samples) > 1 else None
+        calls = failures = 0
+        latency = None
+        if newest:
+            calls = int(newest["calls"] - (oldest["calls"] if oldest else 0))
+            failures = int(newest["failures"] - (oldest["failures"] if oldest else 0))
+            if newest["latency"] is not None:
+                counts = newest["latency"]
+                if oldest and oldest["latency"] is not None:
+                    counts = [n - o for n, o in zip(counts, oldest["latency"])]
+                latency = counts
+        error_rate = failures / calls if calls else 0.0
+        UPSTREAM_ERROR_RATE.labels(name).set(error_rate)
+
+        health = {
+            "calls": calls,
+            "errorRate": round(error_rate, 3),
+            "p50Seconds": _quantile(latency, UPSTREAM_SECONDS.buckets, 0.5) if latency else None,
+            "p90Seconds": _quantile(latency, UPSTREAM_SECONDS.buckets, 0.9) if latency else None,
+        }
+        pool = self.pools.get(name)
+        if pool is not None:
+            available, wait = pool.availability()
+            health["keys"] = {"total": len(pool), "available": available}
+            if wait:
+                health["keys"]["nextAvailableInSeconds"] = round(wait, 1)
+
+        if pool is not None and not len(pool):
+            health["status"] = "unconfigured"
+        elif pool is not None and not health["keys"]["available"]:
+            health["status"] = "exhausted"
+        elif calls >= settings.READY_MIN_CALLS and error_rate >= settings.READY_MAX_ERROR_RATE:
+            health["status"] = "failing"
+        elif not calls:
+            health["status"] = "idle"
+        else:
+            health["status"] = "ok"
+        return health
+
+    def sample(self) -> None:
+        """Sample health now and cache the /ready response (event loop only)."""
+        now = time.monotonic()
+        self._samples.append((now, _sample_upstreams()))
+        while len(self._samples) > 1 and self._samples[1][0] <= now - self.window:
+            self._samples.popleft()
+
+        upstreams = {name: self._upstream_health(name) for name in self.pools}
+        checks = {
+            "loopLagSeconds": {
+                "value": round(self.loop_lag, 3),
+                "limit": settings.READY_MAX_LOOP_LAG,
+                "saturated": bool(settings.READY_MAX_LOOP_LAG) and self.loop_lag >= settings.READY_MAX_LOOP_LAG,
+            },
+            **self.saturation(),
+        }
+
+        if any(check["saturated"] for check in checks.values()):
+            status = "unavailable"
+        elif any(u["status"] not in ("ok", "idle") for u in upstreams.values()):
+            status = "degraded"
+        else:
+            status = "ready"
+        if status != self.status and self.status != "starting":
+            log = logger.info if status == "ready" else logger.warning
+            log("🩺 Readiness changed: %s -> %s", self.status, status)
+
+        self.status = status
+        self.status_code = 503 if status == "unavailable" else 200
+        READY.set(0 if status == "unavailable" else 1)
+        self.body = json.dumps({
+            "status": status,
+            "sampledAt": datetime.utcnow().isoformat(),
+            "windowSeconds": round(min(self.window, now - self._samples[0][0]), 1),
+            "checks": checks,
+            "upstreams": upstreams,
+        }, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,404 @@
+"""
+API key pools for FuckPaidCourses backend.
+
+Each upstream can be configured with several keys (comma-separated in the
+usual env var). Every key tracks its usage against the upstream's quotas
+(e.g. YouTube units per day, Gemini requests and tokens per minute) in
+sliding windows. Each call goes to the least-loaded key that still has
+budget. Keys answering 429, or a 402/403 the upstream documents as a quota
+error, are cooled off with exponential backoff while they keep failing.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from config import settings
+from logger import logger
+from metrics import registry, error_code, response_status
+
+
+KEY_EXHAUSTED = registry.counter(
+    "fpc_api_keys_exhausted_total",
+    "Upstream calls that found no API key with budget left",
+    ("upstream",),
+)
+KEY_COOLDOWNS = registry.counter(
+    "fpc_api_key_cooldowns_total",
+    "API keys put on cooldown after quota or rate limit errors",
+    ("upstream", "status"),
+)
+
+# Statuses meaning "this key is out of quota / rate limited"
+QUOTA_STATUSES = {"402", "403", "429"}
+
+# Error reasons Google APIs give for a 403 that is about quota (other 403s are bad keys or blocked sites)
+QUOTA_REASONS = {
+    "quotaExceeded", "dailyLimitExceeded", "rateLimitExceeded", "userRateLimitExceeded",
+    "RATE_LIMIT_EXCEEDED", "RESOURCE_EXHAUSTED",
+}
+
+
+def _error_body(exc: BaseException) -> dict:
+    """JSON error body of an upstream exception ({} if there is none)."""
+    details = getattr(exc, "details", None)  # google-genai: the parsed response
+    if isinstance(details, dict):
+        return details
+    content = getattr(exc, "content", None)  # googleapiclient HttpError
+    if content is None:
+        content = getattr(getattr(exc, "response", None), "content", None)  # httpx / requests (Firecrawl)
+    if not isinstance(content, (bytes, str)) or not content:
+        return {}
+    try:
+        body = json.loads(content)
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+def _error_reasons(exc: BaseException) -> set[str]:
+    """Reasons and status names in a Google-style error body ({"error": {"status", "errors", "details"}})."""
+    error = _error_body(exc).get("error")
+    if not isinstance(error, dict):
+        return set()
+    reasons = {error.get("status")}
+    for item in (error.get("errors") or []) + (error.get("details") or []):
+        if isinstance(item, dict):
+            reasons.add(item.get("reason"))
+    return {reason for reason in reasons if isinstance(reason, str)}
+
+
+def quota_status(exc: BaseException) -> Optional[str]:
+    """
+    The status of an upstream error that means "this key is out of quota or rate limited", else None.
+
+    A 429 always counts. A 402 counts only when the upstream returned it
+    (Payment Required: Firecrawl is out of credits), not when
+    "402" merely appears in a message. A 403 counts only when its error body
+    names a quota reason; otherwise it is a bad key or a site refusing the
+    scrape, and cooling the key off would not help.
+    """
+    status = error_code(exc)
+    if status == "429":
+        return status
+    if status not in QUOTA_STATUSES or response_status(exc) != status:
+        return None
+    if status == "402" or _error_reasons(exc) & QUOTA_REASONS:
+        return status
+    return None
+
+
+class NoKeyAvailable(Exception):
+    """Raised when every key is cooling down or out of budget."""
+
+    def __init__(self, upstream: str, retry_after: Optional[float]):
+        wait = f"{retry_after:.0f}s" if retry_after is not None else "unknown"
+        super().__init__(f"No {upstream} API key with quota left (next available in {wait})")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class Quota:
+    """A usage budget per key: `limit` units per `period` seconds (period 0 = never resets)."""
+    name: str
+    limit: float
+    period: float = 0
+
+
+def parse_keys(value: str) -> list[str]:
+    """Comma-separated keys from an env var, blanks and duplicates dropped."""
+    keys = []
+    for key in value.split(","):
+        key = key.strip()
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+class UsageWindow:
+    """Usage within a sliding window of `period` seconds (caller holds the pool lock)."""
+
+    def __init__(self, quota: Quota):
+        self.quota = quota
+        self.used = 0.0
+        self.events: deque = deque()
+
+    def _expire(self, now: float) -> None:
+        if not self.quota.period:
+            return
+        horizon = now - self.quota.period
+        while self.events and self.events[0][0] <= horizon:
+            self.used -= self.events.popleft()[1]
+
+    def add(self, amount: float, now: float) -> None:
+        self._expire(now)
+        self.used += amount
+        if self.quota.period:
+            self.events.append((now, amount))
+
+    def load(self, now: float) -> float:
+        """Fraction of the budget in use (0 when unlimited)."""
+        self._expire(now)
+        return self.used / self.quota.limit if self.quota.limit else 0.0
+
+    def remaining(self, now: float) -> Optional[float]:
+        self._expire(now)
+        return max(0.0, self.quota.limit - self.used) if self.quota.limit else None
+
+    def available_in(self, amount: float, now: float) -> Optional[float]:
+        """Seconds until `amount` fits in the budget, or None if it never will."""
+        self._expire(now)
+        if not self.quota.limit or self.used + amount <= self.quota.limit:
+            return 0.0
+        if not self.quota.period or amount > self.quota.limit:
+            return None
+        freed = self.used + amount - self.quota.limit
+        for timestamp, used in self.events:
+            freed -= used
+            if freed <= 0:
+                return timestamp + self.quota.period - now
+        return None
+
+
+class ApiKey:
+    """One key with its usage windows and cooldown state."""
+
+    def __init__(self, secret: str, quotas: list[Quota]):
+        self.secret = secret
+        self.windows = {quota.name: UsageWindow(quota) for quota in quotas}
+        self.cooldown_until = 0.0
+        self.strikes = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.client = None
+
+    @property
+    def label(self) -> str:
+        """Masked key for logs and reports."""
+        return f"...{self.secret[-4:]}" if len(self.secret) > 8 else "..."
+
+    def load(self, now: float) -> float:
+        return max((w.load(now) for w in self.windows.values()), default=0.0)
+
+    def wait_for(self, cost: dict[str, float], now: float) -> Optional[float]:
+        """Seconds until this key can take `cost` (0 = now, None = not within its quotas)."""
+        waits = [max(0.0, self.cooldown_until - now)]
+        for name, amount in cost.items():
+            window = self.windows.get(name)
+            if window is None:
+                continue
+            wait = window.available_in(amount, now)
+            if wait is None:
+                return None
+            waits.append(wait)
+        return max(waits)
+
+
+class Lease:
+    """A key checked out for one upstream call."""
+
+    def __init__(self, pool: "KeyPool", key: ApiKey):
+        self.pool = pool
+        self.key = key
+
+    @property
+    def secret(self) -> str:
+        return self.key.secret
+
+    @property
+    def client(self) -> Any:
+        return self.pool.client_for(self.key)
+
+    def charge(self, quota: str, amount: float) -> None:
+        """Correct usage after the call (e.g. actual tokens vs the estimate)."""
+        self.pool.charge(self.key, {quota: amount})
+
+
+class KeyPool:
+    """Quota-aware rotation over the API keys of one upstream."""
+
+    def __init__(
+        self,
+        upstream: str,
+        keys: list[str],
+        quotas: list[Quota] = (),
+        client_factory: Callable[[str], Any] = None,
+        share_clients: bool = True,
+        max_wait: float = 30.0,
+    ):
+        self.upstream = upstream
+        self.quotas = list(quotas)
+        self.client_factory = client_factory
+        self.share_clients = share_clients
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self.keys: list[ApiKey] = []
+        self.set_keys(keys)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def set_keys(self, secrets: list[str]) -> None:
+        """Replace the key list, keeping the usage of keys that stay."""
+        with self._lock:
+            existing = {key.secret: key for key in self.keys}
+            self.keys = [existing.get(s) or ApiKey(s, self.quotas) for s in secrets]
+
+    def set_client_factory(self, factory: Callable[[str], Any]) -> None:
+        """Swap the SDK client factory (fakes, cassettes); drops cached clients."""
+        with self._lock:
+            self.client_factory = factory
+            for key in self.keys:
+                key.client = None
+
+    def client_for(self, key: ApiKey) -> Any:
+        if self.client_factory is None:
+            return None
+        if not self.share_clients:
+            return self.client_factory(key.secret)
+        if key.client is None:
+            key.client = self.client_factory(key.secret)
+        return key.client
+
+    def warm_up(self) -> None:
+        """Build the first key's client ahead of the first call (imports the SDK)."""
+        if self.keys and self.client_factory is not None:
+            self.client_for(self.keys[0])
+
+    def availability(self) -> tuple[int, Optional[float]]:
+        """
+        Keys that could take a one-unit call right now, without reserving one.
+
+        Returns:
+            (available keys, seconds until the next one frees up: 0 if one is
+            available now, None if none will within its quotas)
+        """
+        cost = {quota.name: 1 for quota in self.quotas}
+        now = time.monotonic()
+        with self._lock:
+            waits = [key.wait_for(cost, now) for key in self.keys]
+        known = [wait for wait in waits if wait is not None]
+        return sum(1 for wait in known if wait == 0), min(known, default=None)
+
+    def headroom(self) -> float:
+        """Unused share of the budget on the least-loaded key not cooling off (1.0 = untouched or unlimited)."""
+        now = time.monotonic()
+        with self._lock:
+            loads = [key.load(now) for key in self.keys if key.cooldown_until <= now]
+        return max(0.0, 1.0 - min(loads)) if loads else 0.0
+
+    def charge(self, key: ApiKey, cost: dict[str, float]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for name, amount in cost.items():
+                if name in key.windows:
+                    key.windows[name].add(amount, now)
+
+    def _pick(self, cost: dict[str, float]) -> tuple[Optional[ApiKey], Optional[float]]:
+        """Least-loaded key that can take `cost` now (reserving it), else the shortest wait."""
+        now = time.monotonic()
+        with self._lock:
+            best, best_rank, shortest = None, None, None
+            for key in self.keys:
+                wait = key.wait_for(cost, now)
+                if wait is None:
+                    continue
+                if wait > 0:
+                    shortest = wait if shortest is None else min(shortest, wait)
+                    continue
+                rank = (key.load(now), key.in_flight, key.calls)
+                if best_rank is None or rank < best_rank:
+                    best, best_rank = key, rank
+            if best is not None:
+                for name, amount in cost.items():
+                    if name in best.windows:
+                        best.windows[name].add(amount, now)
+                best.in_flight += 1
+                best.calls += 1
+            return best, shortest
+
+    def acquire(self, cost: dict[str, float] = None) -> ApiKey:
+        """
+        Check out a key for a call costing `cost` (quota name -> amount).
+
+        Blocks (executor threads only) while the soonest key frees up within
+        max_wait seconds, e.g. a per-minute window rolling over.
+
+        Raises:
+            NoKeyAvailable: no key can take the call within max_wait
+        """
+        cost = cost or {}
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            key, wait = self._pick(cost)
+            if key is not None:
+                return key
+            if wait is None or time.monotonic() + wait > deadline:
+                KEY_EXHAUSTED.labels(self.upstream).inc()
+                raise NoKeyAvailable(self.upstream, wait)
+            time.sleep(wait)
+
+    def release(self, key: ApiKey, exc: BaseException = None) -> None:
+        """Return a key; quota/rate errors put it on cooldown."""
+        status = quota_status(exc) if exc is not None else None
+        with self._lock:
+            key.in_flight -= 1
+            if exc is None:
+                key.strikes = 0
+                return
+            key.errors += 1
+            if status is None:
+                return
+            if len(self.keys) == 1:
+                return  # No other key to rotate to; the caller sees the error as before
+            key.strikes += 1
+            base = settings.KEY_COOLDOWN_SECONDS if status == "429" else settings.KEY_QUOTA_COOLDOWN_SECONDS
+            cooldown = min(base * 2 ** (key.strikes - 1), settings.KEY_MAX_COOLDOWN_SECONDS)
+            key.cooldown_until = time.monotonic() + cooldown
+        KEY_COOLDOWNS.labels(self.upstream, status).inc()
+        logger.warning(
+            "🔑 %s key %s returned %s, cooling off for %.0fs",
+            self.upstream, key.label, status, cooldown,
+        )
+
+    @contextmanager
+    def use(self, **cost: float):
+        """Lease a key for one call: `with pool.use(units=1) as lease: lease.client...`."""
+        key = self.acquire(cost)
+        try:
+            yield Lease(self, key)
+        except BaseException as e:
+            self.release(key, e)
+            raise
+        else:
+            self.release(key)
+
+    def report(self) -> list[dict]:
+        """Per-key usage, remaining budget and cooldown state."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "key": key.label,
+                    "calls": key.calls,
+                    "errors": key.errors,
+                    "inFlight": key.in_flight,
+                    "coolingDownFor": round(max(0.0, key.cooldown_until - now), 1),
+                    "quotas": {
+                        name: {
+                            "limit": window.quota.limit or None,
+                            "periodSeconds": window.quota.period or None,
+                            "used": round(window.used, 1),
+                            "remaining": None if window.remaining(now) is None else round(window.remaining(now), 1),
+                        }
+                        for name, window in key.windows.items()
+                    },
+                }
+                for key in self.keys
+            ]
@@ -0,0 +1,245 @@
+"""
+Load generator for POST /generate-roadmap.
+
+Drives the API at a target request rate (open loop, Poisson arrivals) with a
+Zipf-distributed mix of course URLs, then reports throughput, latency
+percentiles, cache hit rate and upstream call counts.
+
+By default the app runs in-process with fake upstreams (services/fakes.py), so
+perf changes can be measured on a laptop without touching real quotas:
+
+    python loadtest.py --rps 20 --duration 60 --courses 500 --latency-scale 0.1
+
+Use --target http://host:port to load an already running server instead.
+
+With --replay DIR the requests logged by a server in CASSETTE_MODE=record are
+re-sent with their original inter-arrival times (scaled by --speed), and the
+in-process app serves upstream calls from the recorded cassettes with their
+recorded latencies, reproducing a production day offline:
+
+    python loadtest.py --replay data/cassettes --speed 10
+"""
+
+import argparse
+import asyncio
+import collections
+import os
+import random
+import re
+import time
+
+import httpx
+
+
+METRIC_LINE = re.compile(r'^fpc_upstream_calls_total\{upstream="([^"]+)",outcome="([^"]+)"\} (\S+)$')
+
+
+def zipf_sampler(population: list[str], s: float, rng: random.Random):
+    """Return a function drawing items with probability proportional to 1/rank^s."""
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, len(population) + 1):
+        total += 1.0 / rank ** s
+        cum_weights.append(total)
+    return lambda: rng.choices(population, cum_weights=cum_weights)[0]
+
+
+def course_urls(count: int) -> list[str]:
+    """Synthetic but plausible course URLs, spread over a few platforms."""
+    templates = [
+        "https://www.udemy.com/course/{}/",
+        "https://www.coursera.org/learn/{}",
+        "https://www.skillshare.com/en/classes/{}",
+        "https://www.pluralsight.com/courses/{}",
+    ]
+    return [templates[i % len(templates)].format(f"course-{i}-bootcamp") for i in range(count)]
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def upstream_calls(metrics_text: str) -> dict[str, dict[str, float]]:
+    """Parse fpc_upstream_calls_total from /metrics output."""
+    calls: dict[str, dict[str, float]] = collections.defaultdict(dict)
+    for line in metrics_text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            calls[match.group(1)][match.group(2)] = float(match.group(3))
+    return calls
+
+
+def generated_arrivals(args: argparse.Namespace):
+    """(offset seconds, url) with Poisson arrivals over a Zipf URL mix."""
+    rng = random.Random(args.seed)
+    pick = zipf_sampler(course_urls(args.courses), args.zipf, rng)
+    offset = 0.0
+    while offset < args.duration:
+        yield offset, pick()
+        offset += rng.expovariate(args.rps)
+
+
+def recorded_arrivals(directory: str, speed: float):
+    """(offset seconds, url) from a cassette request log, time-compressed by speed."""
+    from services.cassettes import REQUEST_LOG, read_records
+
+    records = [
+        (record["t"], record["url"])
+        for record in read_records(os.path.join(directory, REQUEST_LOG))
+        if "t" in record and "url" in record
+    ]
+    records.sort()
+    if records:
+        first = records[0][0]
+        for t, url in records:
+            yield (t - first) / speed, url
+
+
+async def run_load(client: httpx.AsyncClient, args: argparse.Namespace, arrivals) -> dict:
+    """Send requests at their arrival offsets and collect results."""
+    results = []
+    in_flight = set()
+
+    client_rng = random.Random(args.seed + 1)
+
+    async def one(url: str) -> None:
+        headers = {}
+        if args.clients:
+            n = client_rng.randrange(args.clients)
+            headers["X-Forwarded-For"] = f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+        start = time.perf_counter()
+        try:
+            response = await client.post("/generate-roadmap", json={"url": url}, headers=headers, timeout=args.timeout)
+            status = response.status_code
+            cache = response.headers.get("X-Cache", "")
+        except httpx.HTTPError as e:
+            status, cache = type(e).__name__, ""
+        results.append((time.perf_counter() - start, status, cache))
+
+    start = time.perf_counter()
+    for offset, url in arrivals:
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) < args.max_in_flight:
+            task = asyncio.create_task(one(url))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        else:
+            results.append((0.0, "dropped", ""))
+
+    if in_flight:
+        await asyncio.wait(in_flight)
+    return {"results": results, "elapsed": time.perf_counter() - start}
+
+
+def report(run: dict, before: dict, after: dict) -> None:
+    results = run["results"]
+    sent = [r for r in results if r[1] != "dropped"]
+    ok = sorted(r[0] for r in sent if r[1] == 200)
+    statuses = collections.Counter(str(r[1]) for r in results)
+    hits = sum(1 for r in sent if r[2] == "HIT")
+    cached = sum(1 for r in sent if r[2] in ("HIT", "MISS"))
+    negative = sum(1 for r in sent if r[2] == "NEGATIVE")
+
+    print()
+    print("=" * 60)
+    print(f"Requests:     {len(sent)} sent in {run['elapsed']:.1f}s ({len(sent) / run['elapsed']:.1f} req/s)")
+    print(f"Status:       {dict(statuses)}")
+    for label, latencies in (
+        ("ok", ok),
+        ("hits", sorted(r[0] for r in sent if r[1] == 200 and r[2] == "HIT")),
+        ("misses", sorted(r[0] for r in sent if r[1] == 200 and r[2] == "MISS")),
+    ):
+        print(f"Latency {label + ':':<7} p50={percentile(latencies, 50) * 1000:.0f}ms  "
+              f"p90={percentile(latencies, 90) * 1000:.0f}ms  p99={percentile(latencies, 99) * 1000:.0f}ms  "
+              f"max={(latencies[-1] if latencies else 0) * 1000:.0f}ms")
+    print(f"Cache hits:   {hits}/{cached} ({hits / cached * 100 if cached else 0:.1f}%)")
+    print(f"Failed-scrape cache hits: {negative}")
+    print("Upstream calls:")
+    for upstream in sorted(after):
+        delta = {
+            outcome: int(count - before.get(upstream, {}).get(outcome, 0))
+            for outcome, count in sorted(after[upstream].items())
+        }
+        print(f"  {upstream:<10} {delta}")
+    print("=" * 60)
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    if args.target:
+        client = httpx.AsyncClient(base_url=args.target)
+        lifespan = None
+    else:
+        # In-process app with fake (or recorded) upstreams and no persisted state
+        from config import settings
+        settings.FAKE_LATENCY_SCALE = args.latency_scale
+        settings.ROADMAP_STORE_PATH = ""
+        settings.CACHE_SNAPSHOT_PATH = ""
+        # Every in-process request comes from one address: spread them over
+        # --clients synthetic IPs, or turn per-client limits off
+        settings.TRUST_FORWARDED_FOR = bool(args.clients)
+        if not args.clients:
+            settings.MAX_REQUESTS_PER_MINUTE = 0
+            settings.CLIENT_REQUESTS_PER_MINUTE = 0
+        # Key pools: --keys fake keys per upstream, per-key quotas only with --quotas
+        if args.keys:
+            for name in ("FIRECRAWL_API_KEY", "GEMINI_API_KEY", "SERPER_API_KEY", "YOUTUBE_API_KEY"):
+                setattr(settings, name, ",".join(f"loadtest-key-{i:04d}" for i in range(args.keys)))
+        if not args.quotas:
+            for name in ("FIRECRAWL_CREDITS_PER_KEY", "GEMINI_RPM_PER_KEY", "GEMINI_TPM_PER_KEY",
+                         "SERPER_CREDITS_PER_KEY", "YOUTUBE_UNITS_PER_DAY"):
+                setattr(settings, name, 0)
+        from main import app
+        if args.replay:
+            from services.cassettes import install_cassettes
+            install_cassettes("replay", args.replay, args.latency_scale)
+        else:
+            from services.fakes import install_fakes
+            install_fakes(seed=args.seed)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest")
+        lifespan = app.router.lifespan_context(app)
+
+    async with client:
+        if lifespan:
+            await lifespan.__aenter__()
+        try:
+            before = upstream_calls((await client.get("/metrics")).text)
+            if args.replay:
+                arrivals = recorded_arrivals(args.replay, args.speed)
+            else:
+                arrivals = generated_arrivals(args)
+            run = await run_load(client, args, arrivals)
+            after = upstream_calls((await client.get("/metrics")).text)
+        finally:
+            if lifespan:
+                await lifespan.__aexit__(None, None, None)
+    report(run, before, after)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test POST /generate-roadmap.")
+    parser.add_argument("--target", help="Base URL of a running server (default: in-process with fakes)")
+    parser.add_argument("--rps", type=float, default=10.0, help="Target request rate")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load")
+    parser.add_argument("--courses", type=int, default=200, help="Distinct course URLs in the mix")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of URL popularity")
+    parser.add_argument("--max-in-flight", type=int, default=500, help="Drop arrivals beyond this many open requests")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply fake or recorded upstream latencies")
+    parser.add_argument("--replay", metavar="DIR", help="Replay requests and upstream responses from a cassette directory")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time compression for --replay arrivals")
+    parser.add_argument("--clients", type=int, default=0,
+                        help="Spread requests over this many client IPs via X-Forwarded-For (0 = no per-client limits in-process)")
+    parser.add_argument("--keys", type=int, default=0, help="Fake API keys per upstream (in-process)")
+    parser.add_argument("--quotas", action="store_true", help="Apply the configured per-key quotas (in-process)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for arrivals, URL mix and fakes")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
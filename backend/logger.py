@@ -1,13 +1,26 @@
 """
 Logging configuration for FuckPaidCourses backend.
 Provides structured, detailed logging with colors and timing.
+
+Records are handed to a background writer thread through a queue (LOG_ASYNC),
+so formatting and stdout I/O never run on the event loop. LOG_FORMAT=json
+switches to one JSON object per line for production log collectors.
 """
 
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
+import re
 import sys
 import time
 from functools import wraps
-from typing import Callable, Any
+from typing import Callable, Any, Optional
+
+from config import settings
+from tracing import current_span
 
 
 # ANSI color codes for terminal
@@ -67,26 +80,122 @@ class ColoredFormatter(logging.Formatter):
         return formatted
 
 
-def setup_logging(level: int = logging.INFO) -> logging.Logger:
-    """Configure and return the application logger."""
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, without ANSI color codes."""
+    
+    ANSI_PATTERN = re.compile(r"\033\[[0-9;]*m")
+    
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": self.ANSI_PATTERN.sub("", record.getMessage()).strip(),
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TraceContextFilter(logging.Filter):
+    """Attach the current trace ID while still on the logging thread's caller."""
+    
+    def filter(self, record):
+        span = current_span()
+        record.trace_id = span.trace_id if span else None
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that only merges args on the caller; the writer thread formats (tracebacks too)."""
+    
+    def prepare(self, record):
+        # The stdlib version formats here and drops exc_info, so the listener's formatter never sees it
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+# Background writer for async logging (None when logging synchronously)
+_listener = None
+
+
+def setup_logging(level: int = logging.INFO, fmt: str = "color", async_mode: bool = True) -> logging.Logger:
+    """
+    Configure and return the application logger.
+    
+    Args:
+        level: Minimum level; disabled calls return before any formatting
+        fmt: "color" for terminals, "json" for structured production logs
+        async_mode: Hand records to a background writer thread via a queue
+    """
+    global _listener
     logger = logging.getLogger("fpc")
     logger.setLevel(level)
+    logger.propagate = False
     
-    # Remove existing handlers
+    # Remove existing handlers (and stop a previous writer)
     logger.handlers.clear()
+    logger.filters.clear()
+    stop_logging()
     
-    # Console handler with colors
+    # Console handler with colors or JSON
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
-    console_handler.setFormatter(ColoredFormatter())
+    console_handler.setFormatter(JSONFormatter() if fmt == "json" else ColoredFormatter())
+    
+    if fmt == "json":
+        logger.addFilter(TraceContextFilter())
     
-    logger.addHandler(console_handler)
+    if async_mode:
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(DeferredQueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(log_queue, console_handler)
+        _listener.start()
+    else:
+        logger.addHandler(console_handler)
     
     return logger
 
 
+def stop_logging() -> None:
+    """Flush queued records and stop the background writer."""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+def parse_level(name: str) -> Optional[int]:
+    """Numeric level for a name such as "INFO" or "10", None if it is not a level."""
+    if name.isdigit():
+        return int(name)
+    level = logging.getLevelName(name.upper())
+    return level if isinstance(level, int) else None
+
+
+def configured_level() -> int:
+    """LOG_LEVEL as a number, INFO when it is not a valid level name."""
+    level = parse_level(settings.LOG_LEVEL)
+    return logging.INFO if level is None else level
+
+
 # Global logger instance
-logger = setup_logging()
+logger = setup_logging(
+    level=configured_level(),
+    fmt=settings.LOG_FORMAT,
+    async_mode=settings.LOG_ASYNC,
+)
+atexit.register(stop_logging)
+if parse_level(settings.LOG_LEVEL) is None:
+    logger.warning("Unknown LOG_LEVEL %r, logging at INFO", settings.LOG_LEVEL)
+
+# Banner rule around request logs (a constant, so nothing is formatted per call)
+_RULE = "=" * 50
 
 
 def log_timing(operation: str):
@@ -95,31 +204,27 @@ def log_timing(operation: str):
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
             start = time.time()
-            logger.info(f"⏳ Starting: {operation}")
+            logger.info("⏳ Starting: %s", operation)
             
             try:
                 result = func(*args, **kwargs)
-                elapsed = time.time() - start
-                logger.info(f"✅ Completed: {operation} ({elapsed:.2f}s)")
+                logger.info("✅ Completed: %s (%.2fs)", operation, time.time() - start)
                 return result
             except Exception as e:
-                elapsed = time.time() - start
-                logger.error(f"Failed: {operation} ({elapsed:.2f}s) - {str(e)}")
+                logger.error("Failed: %s (%.2fs) - %s", operation, time.time() - start, e)
                 raise
         
         @wraps(func)
         async def async_wrapper(*args, **kwargs) -> Any:
             start = time.time()
-            logger.info(f"⏳ Starting: {operation}")
+            logger.info("⏳ Starting: %s", operation)
             
             try:
                 result = await func(*args, **kwargs)
-                elapsed = time.time() - start
-                logger.info(f"✅ Completed: {operation} ({elapsed:.2f}s)")
+                logger.info("✅ Completed: %s (%.2fs)", operation, time.time() - start)
                 return result
             except Exception as e:
-                elapsed = time.time() - start
-                logger.error(f"Failed: {operation} ({elapsed:.2f}s) - {str(e)}")
+                logger.error("Failed: %s (%.2fs) - %s", operation, time.time() - start, e)
                 raise
         
         import asyncio
@@ -140,25 +245,25 @@ class RequestLogger:
     
     def __enter__(self):
         self.start_time = time.time()
-        logger.info(f"{'='*50}")
-        logger.info(f"🚀 {Colors.BOLD}NEW REQUEST: {self.request_type}{Colors.RESET}")
+        logger.info(_RULE)
+        logger.info("🚀 %sNEW REQUEST: %s%s", Colors.BOLD, self.request_type, Colors.RESET)
         if self.identifier:
-            logger.info(f"   📍 Target: {self.identifier[:80]}...")
-        logger.info(f"{'='*50}")
+            logger.info("   📍 Target: %.80s...", self.identifier)
+        logger.info(_RULE)
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         elapsed = time.time() - self.start_time
         
         if exc_type:
-            logger.error(f"{'='*50}")
-            logger.error(f"❌ REQUEST FAILED after {elapsed:.2f}s")
-            logger.error(f"   Error: {exc_val}")
-            logger.error(f"{'='*50}")
+            logger.error(_RULE)
+            logger.error("❌ REQUEST FAILED after %.2fs", elapsed)
+            logger.error("   Error: %s", exc_val)
+            logger.error(_RULE)
         else:
-            logger.info(f"{'='*50}")
-            logger.info(f"🎉 {Colors.GREEN}REQUEST COMPLETED in {elapsed:.2f}s{Colors.RESET}")
-            logger.info(f"{'='*50}")
+            logger.info(_RULE)
+            logger.info("🎉 %sREQUEST COMPLETED in %.2fs%s", Colors.GREEN, elapsed, Colors.RESET)
+            logger.info(_RULE)
         
         return False
     
@@ -167,13 +272,20 @@ class RequestLogger:
         step_num = len(self.steps) + 1
         self.steps.append(name)
         
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        
         elapsed = time.time() - self.start_time
         
         if details:
-            logger.info(f"   [{step_num}] {name}: {details} (+{elapsed:.2f}s)")
+            logger.info("   [%d] %s: %s (+%.2fs)", step_num, name, details, elapsed)
         else:
-            logger.info(f"   [{step_num}] {name} (+{elapsed:.2f}s)")
+            logger.info("   [%d] %s (+%.2fs)", step_num, name, elapsed)
     
-    def detail(self, message: str):
-        """Log additional detail."""
-        logger.info(f"       ↳ {message}")
+    def detail(self, message: str, *args):
+        """
+        Log additional detail.
+        
+        Pass values as %-style args so nothing is formatted when INFO is disabled.
+        """
+        logger.info("       ↳ " + message, *args)
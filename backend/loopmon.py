@@ -0,0 +1,111 @@
+"""
+Event-loop lag monitor for FuckPaidCourses backend.
+
+A tiny asyncio task measures how late its periodic wake-ups are (scheduling
+lag) and exports it as a metric. A watchdog thread checks the task's
+heartbeat; when the loop has been stuck longer than the threshold it captures
+the stack of the loop thread, pointing straight at the blocking call.
+"""
+
+import asyncio
+import collections
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from config import settings
+from logger import logger
+from metrics import registry
+
+
+LOOP_LAG = registry.histogram(
+    "fpc_event_loop_lag_seconds",
+    "Event loop scheduling delay measured by the lag monitor",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_LAG_MAX = registry.gauge(
+    "fpc_event_loop_lag_max_seconds",
+    "Largest event loop lag seen since the previous /metrics scrape window",
+)
+LOOP_STALLS = registry.counter(
+    "fpc_event_loop_stalls_total",
+    "Times the event loop was blocked longer than LOOP_LAG_THRESHOLD",
+)
+
+
+class LoopLagMonitor:
+    """Measures event loop lag and captures stacks of blocking calls."""
+
+    def __init__(self, interval: float, threshold: float, max_stalls: int = 20):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: collections.deque = collections.deque(maxlen=max_stalls)
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._window_max = 0.0
+
+    @property
+    def current_lag(self) -> float:
+        """Seconds the loop is currently overdue (0 when it is responsive)."""
+        return max(0.0, time.monotonic() - self._heartbeat - self.interval)
+
+    def start(self) -> None:
+        """Start the lag task on the running loop and the watchdog thread."""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        threading.Thread(target=self._watch, name="fpc-loop-watchdog", daemon=True).start()
+        LOOP_LAG_MAX.set_function(self._collect_window_max)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+
+    def _collect_window_max(self) -> float:
+        value, self._window_max = self._window_max, 0.0
+        return value
+
+    async def _measure(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - start - self.interval)
+            self._heartbeat = now
+            LOOP_LAG.observe(lag)
+            if lag > self._window_max:
+                self._window_max = lag
+
+    def _watch(self) -> None:
+        """Watchdog thread: capture one stack per stall while the loop is stuck."""
+        captured = False
+        while not self._stop.wait(self.interval / 2):
+            if self.current_lag < self.threshold:
+                captured = False
+                continue
+            if captured:
+                continue
+            captured = True
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            LOOP_STALLS.inc()
+            self.stalls.append({
+                "at": time.time(),
+                "lagSeconds": round(self.current_lag, 3),
+                "stack": stack,
+            })
+            logger.warning(
+                "🐢 Event loop blocked for %.2fs, loop thread stack:\n%s",
+                self.current_lag, stack,
+            )
+
+
+loop_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL, settings.LOOP_LAG_THRESHOLD)
@@ -5,28 +5,154 @@ Transform paid course URLs into free learning roadmaps.
 """
 
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import json
 import time
 
 from config import settings
-from cache import course_cache, roadmap_cache
-from logger import logger, RequestLogger, Colors
+from cache import course_cache, roadmap_cache, scrape_failure_cache, canonical_url, hash_key
+from logger import logger, RequestLogger, Colors, stop_logging
 from models.schemas import (
     GenerateRoadmapRequest,
+    BatchRoadmapRequest,
     RoadmapResponse,
     ErrorResponse,
-    CourseInfo,
-    Topic,
-    Video,
-    Documentation,
+    SearchResponse,
 )
 from services.scraper import scraper_service
 from services.llm import llm_service
 from services.youtube import youtube_service
 from services.search import search_service
+from services.fakes import install_fakes
+from services import cassettes
+from persistence import RoadmapStore, save_snapshot, load_snapshot
+from similarity import course_index
+from roadmap_index import roadmap_index, SEARCH_SECONDS
+from responses import CachedRoadmap
+from ratelimit import (
+    ClientRateLimiter,
+    ClientRateLimitMiddleware,
+    RATE_LIMITED,
+    client_ip,
+    retry_after,
+)
+from loopmon import loop_monitor
+from health import ReadinessProber
+from popularity import popularity, CacheWarmer
+from scheduler import GenerationScheduler, QueueFull, ClientDisconnected
+from profiler import profiler, ProfilerBusy, to_collapsed, to_speedscope
+from tracing import start_trace, span, run_in_executor, slow_traces, executor_stats
+from pipeline import build_roadmap
+from metrics import (
+    registry,
+    InFlightMiddleware,
+    STAGE_SECONDS,
+    EXECUTOR_QUEUE_DEPTH,
+    EXECUTOR_CALLS_IN_FLIGHT,
+)
+
+
+# Shared pool for blocking service calls (installed as the loop's default executor)
+executor = ThreadPoolExecutor(max_workers=settings.EXECUTOR_WORKERS, thread_name_prefix="fpc-io")
+EXECUTOR_QUEUE_DEPTH.set_function(lambda: executor_stats.queued)
+EXECUTOR_CALLS_IN_FLIGHT.set_function(lambda: executor_stats.in_flight)
+
+
+# Per-client limits: coarse for all requests, strict for uncached generation
+request_limiter = ClientRateLimiter(settings.CLIENT_REQUESTS_PER_MINUTE, max_clients=settings.RATE_LIMIT_MAX_CLIENTS)
+generation_limiter = ClientRateLimiter(settings.MAX_REQUESTS_PER_MINUTE, max_clients=settings.RATE_LIMIT_MAX_CLIENTS)
+
+# Cache misses wait here for one of MAX_PIPELINES_IN_FLIGHT generation slots
+generation_scheduler = GenerationScheduler(
+    settings.MAX_PIPELINES_IN_FLIGHT,
+    settings.GENERATION_QUEUE_SIZE,
+    settings.QUEUE_POLL_INTERVAL,
+)
+
+
+if settings.FAKE_UPSTREAMS:
+    install_fakes()
+if settings.CASSETTE_MODE != "off":
+    cassettes.install_cassettes(settings.CASSETTE_MODE, settings.CASSETTE_DIR, settings.CASSETTE_LATENCY_SCALE)
+
+
+def _saturation() -> dict[str, dict]:
+    """Queue checks for the readiness probe."""
+    executor_queue = executor_stats.queued
+    return {
+        "generationQueue": {
+            "value": generation_scheduler.queued,
+            "limit": settings.GENERATION_QUEUE_SIZE,
+            "saturated": not generation_scheduler.has_capacity(),
+        },
+        "executorQueue": {
+            "value": executor_queue,
+            "limit": settings.READY_MAX_EXECUTOR_QUEUE,
+            "saturated": bool(settings.READY_MAX_EXECUTOR_QUEUE) and executor_queue >= settings.READY_MAX_EXECUTOR_QUEUE,
+        },
+    }
+
+
+readiness_prober = ReadinessProber(
+    {
+        "firecrawl": scraper_service.key_pool,
+        "gemini": llm_service.key_pool,
+        "serper": search_service.key_pool,
+        "youtube": youtube_service.key_pool,
+    },
+    _saturation,
+    settings.READY_PROBE_INTERVAL,
+    settings.READY_WINDOW_SECONDS,
+)
+
+
+# Keep the search index in step with the roadmap cache
+roadmap_cache.subscribe(roadmap_index.add_cached, roadmap_index.remove)
+
+
+# Caches included in snapshots, by snapshot name
+SNAPSHOT_CACHES = {"roadmap": roadmap_cache, "course": course_cache, "similarity": course_index}
+
+
+def _warm_start() -> None:
+    """Load the roadmap store and the previous instance's cache snapshot, then index it for search (executor)."""
+    start = time.time()
+    try:
+        stored = RoadmapStore(settings.ROADMAP_STORE_PATH).load_into(roadmap_cache)
+        restored = load_snapshot(settings.CACHE_SNAPSHOT_PATH, SNAPSHOT_CACHES)
+    except Exception as e:
+        logger.error("Warm start failed: %s", e)
+    else:
+        logger.info(
+            "💾 Warm start: %d stored roadmaps, %d snapshot entries (%.2fs)",
+            stored, restored, time.time() - start,
+        )
+    # Restored roadmaps stay raw in the cache (even after a partial restore); index them off the event loop
+    start = time.time()
+    indexed = roadmap_index.index_pending()
+    logger.info("🔎 Indexed %d restored roadmaps for search (%.2fs)", indexed, time.time() - start)
+
+
+def _warm_up_clients() -> None:
+    """Import the upstream SDKs and build their clients, so the first request doesn't pay for it."""
+    start = time.time()
+    for name, warm_up in (
+        ("firecrawl", scraper_service.key_pool.warm_up),
+        ("gemini", llm_service.key_pool.warm_up),
+        ("youtube", youtube_service.key_pool.warm_up),
+        ("serper", search_service.warm_up),
+    ):
+        try:
+            warm_up()
+        except Exception as e:
+            logger.warning("Could not warm up %s client: %s", name, e)
+    logger.info("🔥 Upstream clients ready (%.2fs)", time.time() - start)
 
 
 @asynccontextmanager
@@ -47,18 +173,51 @@ async def lifespan(app: FastAPI):
     logger.info(f"   🤖 Gemini:    {'Ready' if settings.GEMINI_API_KEY else 'Not configured'}")
     logger.info(f"   🔍 Serper:    {'Ready' if settings.SERPER_API_KEY else 'Not configured'}")
     logger.info(f"   📺 YouTube:   Ready (no key needed)")
+    if settings.FAKE_UPSTREAMS:
+        logger.warning("🧪 FAKE_UPSTREAMS enabled - all upstream APIs are simulated")
+    if settings.CASSETTE_MODE != "off":
+        logger.warning(f"📼 Cassettes in {settings.CASSETTE_MODE} mode ({settings.CASSETTE_DIR})")
     logger.info(f"{'='*60}")
     
+    loop = asyncio.get_event_loop()
+    loop.set_default_executor(executor)
+    if settings.LOOP_MONITOR:
+        loop_monitor.start()
+    readiness_prober.start()
+    if settings.CACHE_WARMER:
+        cache_warmer.start()
+    
+    # Restore caches in the background so the port binds immediately
+    warm_start = loop.run_in_executor(None, _warm_start)
+    if settings.WARM_UP_CLIENTS:
+        loop.run_in_executor(None, _warm_up_clients)
+    
     yield
     
     # Shutdown
     logger.info(f"{'='*60}")
     logger.info("👋 Shutting down FuckPaidCourses API")
+    loop_monitor.stop()
+    readiness_prober.stop()
+    cache_warmer.stop()
+    await warm_start
+    if settings.CACHE_SNAPSHOT_PATH:
+        try:
+            saved = await loop.run_in_executor(
+                None, save_snapshot, settings.CACHE_SNAPSHOT_PATH, SNAPSHOT_CACHES
+            )
+            logger.info(f"   💾 Saved {saved} cache entries to snapshot")
+        except Exception as e:
+            logger.error(f"Failed to save cache snapshot: {e}")
     logger.info(f"   Clearing caches...")
     course_cache.clear()
     roadmap_cache.clear()
+    scrape_failure_cache.clear()
+    course_index.clear()
+    popularity.clear()
     logger.info("✅ Shutdown complete")
     logger.info(f"{'='*60}")
+    stop_logging()
 
 
 # Create FastAPI app
@@ -69,6 +228,9 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Inside CORS, so 429s still carry CORS headers
+app.add_middleware(ClientRateLimitMiddleware, limiter=request_limiter)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -76,7 +238,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Roadmap-Id", "Content-Location", "X-Cache", "Retry-After"],
 )
+app.add_middleware(InFlightMiddleware)
 
 
 @app.get("/")
@@ -88,7 +252,12 @@ async def root():
         "status": "running",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
             "generate": "POST /generate-roadmap",
+            "batch": "POST /generate-roadmaps",
+            "roadmap": "GET /roadmaps/{course_id}",
+            "search": "GET /search?q=...",
+            "metrics": "/metrics",
         }
     }
 
@@ -109,32 +278,290 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness for load balancers: the background prober's cached verdict (503 when saturated)."""
+    return Response(
+        readiness_prober.body,
+        status_code=readiness_prober.status_code,
+        media_type="application/json",
+        headers={"Cache-Control": "no-store"},
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, upstream calls, cache and load gauges."""
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def require_admin(token: str) -> None:
+    """Reject admin requests without a valid X-Admin-Token."""
+    if not settings.ADMIN_TOKEN or token != settings.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403,
+            detail={"error": "FORBIDDEN", "message": "Admin token required"}
+        )
+
+
+@app.post("/admin/cache/snapshot")
+async def snapshot_cache(x_admin_token: str = Header("")):
+    """Write a cache snapshot now (same file the server restores on startup)."""
+    require_admin(x_admin_token)
+    loop = asyncio.get_event_loop()
+    start = time.time()
+    saved = await loop.run_in_executor(
+        None, save_snapshot, settings.CACHE_SNAPSHOT_PATH, SNAPSHOT_CACHES
+    )
+    return {
+        "success": True,
+        "entries": saved,
+        "path": settings.CACHE_SNAPSHOT_PATH,
+        "seconds": round(time.time() - start, 3),
+    }
+
+
+@app.get("/admin/traces")
+async def get_traces(format: str = "json", x_admin_token: str = Header("")):
+    """
+    Slowest recent requests with their full span trees.
+    
+    format=json returns nested spans; format=chrome returns trace-event JSON
+    for Perfetto / chrome://tracing.
+    """
+    require_admin(x_admin_token)
+    traces = slow_traces.slowest()
+    if format == "chrome":
+        return [t.to_chrome() for t in traces]
+    return {"traces": [t.to_dict() for t in traces]}
+
+
+@app.get("/admin/keys")
+async def get_key_pools(x_admin_token: str = Header("")):
+    """Per-key usage, remaining quota and cooldowns for every upstream (keys masked)."""
+    require_admin(x_admin_token)
+    return {
+        service.key_pool.upstream: service.key_pool.report()
+        for service in (scraper_service, llm_service, search_service, youtube_service)
+    }
+
+
+@app.get("/admin/loop-stalls")
+async def get_loop_stalls(x_admin_token: str = Header("")):
+    """Recent event loop stalls with the stack of the blocking call."""
+    require_admin(x_admin_token)
+    return {
+        "thresholdSeconds": loop_monitor.threshold,
+        "stalls": list(reversed(loop_monitor.stalls)),
+    }
+
+
+@app.get("/admin/profile")
+async def run_profile(
+    seconds: float = 10,
+    interval_ms: float = 10,
+    format: str = "collapsed",
+    include_idle: bool = False,
+    x_admin_token: str = Header(""),
+):
+    """
+    Sample all threads of this worker for N seconds and return the profile.
+    
+    format=collapsed returns folded stacks (flamegraph.pl / speedscope import),
+    format=speedscope returns speedscope JSON. Duration and sampling rate are
+    capped, and only one profile runs at a time.
+    """
+    require_admin(x_admin_token)
+    seconds = min(max(seconds, 0.1), settings.PROFILE_MAX_SECONDS)
+    interval = max(interval_ms, settings.PROFILE_MIN_INTERVAL_MS) / 1000
+    
+    try:
+        result = await profiler.sample_async(seconds, interval, include_idle)
+    except ProfilerBusy:
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "PROFILER_BUSY", "message": "A profile is already running"}
+        )
+    
+    logger.info("🔬 Profile captured: %d ticks over %.1fs", result["ticks"], result["seconds"])
+    if format == "speedscope":
+        return to_speedscope(result)
+    return Response(to_collapsed(result), media_type="text/plain; charset=utf-8")
+
+
 @app.post("/generate-roadmap", response_model=RoadmapResponse)
-async def generate_roadmap(request: GenerateRoadmapRequest):
+async def generate_roadmap(
+    request: GenerateRoadmapRequest,
+    http_request: Request,
+    accept_encoding: str = Header(""),
+):
     """
     Generate a free learning roadmap from a paid course URL.
+    
+    Roadmaps are cached as serialized bytes and returned as a raw Response,
+    so cache hits skip response_model validation and serialization entirely.
+    Cache misses are admission controlled and rate limited per client.
     """
     url = request.url.strip()
+    validate_url(url)
+    
+    if cassettes.cassette_store and settings.CASSETTE_MODE == "record":
+        cassettes.cassette_store.record_request(url)
+    
+    # Check cache first
+    cache_key = canonical_url(url)
+    course_id = hash_key(cache_key)
+    popularity.record(course_id, url)
+    id_headers = {"X-Roadmap-Id": course_id, "Content-Location": f"/roadmaps/{course_id}"}
+    cached_roadmap = roadmap_cache.get_hashed(course_id)
+    if cached_roadmap:
+        logger.info("📦 %sCACHE HIT%s - Returning cached roadmap", Colors.GREEN, Colors.RESET)
+        logger.info("   URL: %.60s...", url)
+        return cached_roadmap.to_response(accept_encoding, {**id_headers, "X-Cache": "HIT"})
+    
+    precheck_miss(url, course_id)
+    client = admit_generation(http_request)
+    
+    try:
+        cached = await generate_and_cache(url, cache_key, client, http_request.is_disconnected)
+    except ClientDisconnected:
+        logger.info("🔌 Client disconnected while queued - dropped before generation")
+        return Response(status_code=499)
+    return cached.to_response(accept_encoding, {**id_headers, "X-Cache": "MISS"})
+
+
+@app.post("/generate-roadmaps")
+async def generate_roadmaps(request: BatchRoadmapRequest, http_request: Request):
+    """
+    Generate roadmaps for a bundle of course URLs, streamed back as NDJSON.
+    
+    URLs are canonicalized and deduplicated. Cached roadmaps are sent first,
+    then each miss as soon as its pipeline completes. Misses are admitted,
+    rate limited and queued like single requests, and share topic resource
+    lookups, so a topic common to several courses is enriched once.
+    
+    Lines: {"url", "courseId", "status": 200, "cache", "roadmap"} or
+    {"url", "courseId", "status", "error", "message"[, "retryAfter"]}.
+    """
+    urls = [url.strip() for url in request.urls]
+    if len(urls) > settings.BATCH_MAX_URLS:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "TOO_MANY_URLS", "message": f"At most {settings.BATCH_MAX_URLS} URLs per batch"}
+        )
+    
+    ready: list[bytes] = []
+    misses: list[tuple[str, str, str, str]] = []
+    seen = set()
+    for url in urls:
+        try:
+            validate_url(url)
+        except HTTPException as e:
+            ready.append(_batch_line(url, None, e))
+            continue
+        cache_key = canonical_url(url)
+        course_id = hash_key(cache_key)
+        if course_id in seen:
+            continue
+        seen.add(course_id)
+        popularity.record(course_id, url)
+        if cassettes.cassette_store and settings.CASSETTE_MODE == "record":
+            cassettes.cassette_store.record_request(url)
+        
+        cached_roadmap = roadmap_cache.get_hashed(course_id)
+        if cached_roadmap:
+            ready.append(_batch_line(url, course_id, cached_roadmap, "HIT"))
+            continue
+        try:
+            precheck_miss(url, course_id)
+            client = admit_generation(http_request)
+        except HTTPException as e:
+            ready.append(_batch_line(url, course_id, e))
+            continue
+        misses.append((url, cache_key, course_id, client))
+    
+    logger.info(
+        "📚 Batch of %d URLs: %d unique, %d answered now, %d to generate",
+        len(urls), len(seen), len(ready), len(misses),
+    )
+    shared_topics: dict = {}
+    
+    async def generate(url: str, cache_key: str, course_id: str, client: str) -> bytes:
+        try:
+            cached = await generate_and_cache(url, cache_key, client, http_request.is_disconnected, shared_topics)
+        except HTTPException as e:
+            return _batch_line(url, course_id, e)
+        except ClientDisconnected:
+            return b""
+        return _batch_line(url, course_id, cached, "MISS")
     
-    # Validate URL format
+    async def stream():
+        # Started up front; pipelines already running finish (and are cached) if the client leaves
+        tasks = [asyncio.ensure_future(generate(*miss)) for miss in misses]
+        for line in ready:
+            yield line
+        for next_done in asyncio.as_completed(tasks):
+            line = await next_done
+            if line:
+                yield line
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def _batch_line(url: str, course_id: Optional[str], result, cache: str = "") -> bytes:
+    """One NDJSON line of a batch response; roadmap JSON bytes are embedded as cached."""
+    line = {"url": url, "courseId": course_id}
+    if isinstance(result, HTTPException):
+        detail = result.detail if isinstance(result.detail, dict) else {"error": "ERROR", "message": str(result.detail)}
+        headers = result.headers or {}
+        line.update(status=result.status_code, **detail)
+        if "X-Cache" in headers:
+            line["cache"] = headers["X-Cache"]
+        if "Retry-After" in headers:
+            line["retryAfter"] = int(headers["Retry-After"])
+        return json.dumps(line).encode("utf-8") + b"\n"
+    line.update(status=200, cache=cache)
+    return json.dumps(line)[:-1].encode("utf-8") + b',"roadmap":' + result.json_bytes() + b"}\n"
+
+
+def validate_url(url: str) -> None:
+    """Raises HTTPException 400 unless the URL is http(s)."""
     if not url.startswith(("http://", "https://")):
-        logger.warning(f"Invalid URL format: {url}")
+        logger.warning("Invalid URL format: %s", url)
         raise HTTPException(
             status_code=400,
             detail={"error": "INVALID_URL", "message": "URL must start with http:// or https://"}
         )
+
+
+def precheck_miss(url: str, course_id: str) -> None:
+    """
+    Cheap checks for a cache miss before it is admitted to the pipeline.
     
-    # Check cache first
-    cached_roadmap = roadmap_cache.get(url)
-    if cached_roadmap:
-        logger.info(f"📦 {Colors.GREEN}CACHE HIT{Colors.RESET} - Returning cached roadmap")
-        logger.info(f"   URL: {url[:60]}...")
-        return cached_roadmap
+    Obviously non-course URLs and recently failed scrapes never reach
+    Firecrawl. Raises HTTPException 400 (NOT_A_COURSE, cached failure) or
+    503 (MISSING_CONFIG).
+    """
+    reason = scraper_service.non_course_reason(url)
+    if reason:
+        logger.warning("Rejected non-course URL: %s (%s)", url, reason)
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "NOT_A_COURSE", "message": reason}
+        )
+    failure = scrape_failure_cache.get_hashed(course_id)
+    if failure:
+        failed, remaining = failure
+        logger.info("🚫 %sNEGATIVE CACHE HIT%s - Scrape failed recently", Colors.YELLOW, Colors.RESET)
+        headers = {"X-Cache": "NEGATIVE"}
+        if not failed["permanent"]:
+            headers["Retry-After"] = str(max(1, round(remaining)))
+        raise HTTPException(status_code=400, detail=failed["detail"], headers=headers)
     
     # Validate API keys
     missing = settings.validate()
     if missing:
-        logger.error(f"Missing configuration: {missing}")
+        logger.error("Missing configuration: %s", missing)
         raise HTTPException(
             status_code=503,
             detail={
@@ -142,154 +569,153 @@ async def generate_roadmap(request: GenerateRoadmapRequest):
                 "message": f"Server is not fully configured. Missing: {', '.join(missing)}"
             }
         )
+
+
+async def generate_and_cache(
+    url: str,
+    cache_key: str,
+    client: str,
+    is_disconnected=None,
+    shared_topics: dict = None,
+) -> CachedRoadmap:
+    """
+    Run the pipeline in a generation slot, then serialize and cache the roadmap
+    (unless it was built from fallback topics).
     
+    Raises:
+        HTTPException: pipeline failure, or 503 when the queue is full
+        ClientDisconnected: the client went away while queued
+    """
     # Use RequestLogger for detailed tracking
-    with RequestLogger("Generate Roadmap", url) as req_log:
+    with RequestLogger("Generate Roadmap", url) as req_log, start_trace("generate_roadmap", url=url):
         try:
-            # Step 1: Scrape the course page
-            req_log.step("Scraping course page", "Using Firecrawl API")
-            start_scrape = time.time()
-            scraped = scraper_service.scrape_course(url)
-            scrape_time = time.time() - start_scrape
-            
-            if not scraped.get("success"):
-                raise HTTPException(
-                    status_code=400,
-                    detail={
-                        "error": "SCRAPE_FAILED",
-                        "message": f"Could not scrape course page: {scraped.get('error', 'Unknown error')}"
-                    }
-                )
-            
-            course_title = scraped["title"]
-            platform = scraped["platform"]
-            content = scraped["content"]
-            
-            req_log.detail(f"Title: {course_title}")
-            req_log.detail(f"Platform: {platform}")
-            req_log.detail(f"Content length: {len(content)} chars")
-            req_log.detail(f"Scrape time: {scrape_time:.2f}s")
-            
-            # Step 2: Extract topics using LLM
-            req_log.step("Extracting topics with AI", "Using Gemini 2.5 Flash Lite")
-            start_llm = time.time()
-            raw_topics = llm_service.extract_topics(content, course_title)
-            llm_time = time.time() - start_llm
-            
-            req_log.detail(f"Extracted {len(raw_topics)} topics")
-            req_log.detail(f"LLM time: {llm_time:.2f}s")
-            
-            for i, topic in enumerate(raw_topics):
-                req_log.detail(f"  Topic {i+1}: {topic['topic']}")
-            
-            # Step 3 & 4: Find resources for each topic (in parallel)
-            req_log.step("Finding resources", f"YouTube + Serper for {len(raw_topics)} topics")
-            start_resources = time.time()
-            roadmap_topics = await _enrich_topics(raw_topics, req_log)
-            resources_time = time.time() - start_resources
-            
-            req_log.detail(f"Resource search time: {resources_time:.2f}s")
-            
-            # Count total resources
-            total_videos = sum(len(t.videos) for t in roadmap_topics)
-            total_docs = sum(len(t.documentation) for t in roadmap_topics)
-            req_log.detail(f"Total videos found: {total_videos}")
-            req_log.detail(f"Total docs found: {total_docs}")
-            
-            # Build response
-            req_log.step("Building response")
-            response = RoadmapResponse(
-                success=True,
-                course=CourseInfo(
-                    title=course_title,
-                    platform=platform,
-                    originalUrl=url,
-                    totalTopics=len(roadmap_topics),
-                ),
-                roadmap=roadmap_topics,
-                generatedAt=datetime.utcnow(),
-            )
-            
-            # Cache the result
-            roadmap_cache.set(url, response)
-            req_log.detail("Response cached for future requests")
-            
-            return response
-            
-        except HTTPException:
-            raise
-        except Exception as e:
-            logger.error(f"Failed to generate roadmap: {str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail={
-                    "error": "GENERATION_FAILED",
-                    "message": f"Failed to generate roadmap: {str(e)}"
-                }
-            )
+            async with generation_scheduler.slot(client, is_disconnected):
+                response = await build_roadmap(url, req_log, shared_topics)
+        except QueueFull:
+            raise _overloaded()
+        
+        # Serialize once, cache the bytes and send the same bytes
+        with span("serialize"), STAGE_SECONDS.labels("serialize").time():
+            cached = CachedRoadmap.from_roadmap(response)
+        if response._fallback:
+            # Generic topics, not this course's: the next request tries Gemini again
+            req_log.detail("Built from fallback topics, not cached")
+            return cached
+        roadmap_cache.set(cache_key, cached)
+        req_log.detail("Response cached for future requests (%d bytes, %s)", len(cached.body), cached.encoding)
+        return cached
+
+
+async def _refresh_popular(course_id: str, url: str) -> None:
+    """Cache warmer: regenerate a popular roadmap through the usual checks, queue and pipeline."""
+    precheck_miss(url, course_id)
+    await generate_and_cache(url, canonical_url(url), "cache-warmer")
+
+
+def _warmer_paused() -> bool:
+    """Leave the upstreams to real traffic while misses queue or Gemini quota runs low."""
+    return (
+        generation_scheduler.queued > 0
+        or llm_service.key_pool.headroom() < settings.WARM_MIN_QUOTA_HEADROOM
+    )
+
 
+cache_warmer = CacheWarmer(popularity, _refresh_popular, roadmap_cache.expires_in, _warmer_paused)
 
-async def _enrich_topics(raw_topics: list[dict], req_log: RequestLogger) -> list[Topic]:
-    """Add YouTube videos and documentation to each topic."""
+
+def _overloaded() -> HTTPException:
+    RATE_LIMITED.labels("overload").inc()
+    logger.warning(
+        "🚦 Shedding generation request: %d running, %d queued",
+        generation_scheduler.running, generation_scheduler.queued,
+    )
+    return HTTPException(
+        status_code=503,
+        detail={
+            "error": "OVERLOADED",
+            "message": "Server is busy generating other roadmaps. Please retry shortly."
+        },
+        headers={"Retry-After": str(settings.OVERLOAD_RETRY_AFTER)},
+    )
+
+
+def admit_generation(http_request: Request) -> str:
+    """
+    Admission control and per-client metering for uncached generation.
     
-    async def enrich_single_topic(index: int, topic_data: dict) -> Topic:
-        """Enrich a single topic with resources."""
-        topic_name = topic_data["topic"]
-        
-        # Run YouTube and Serper searches concurrently
-        loop = asyncio.get_event_loop()
-        
-        # These are sync functions, run them in thread pool
-        videos_task = loop.run_in_executor(
-            None, 
-            youtube_service.search_videos, 
-            f"{topic_name} tutorial",
-            3
-        )
-        docs_task = loop.run_in_executor(
-            None,
-            search_service.search_documentation,
-            topic_name,
-            2
-        )
-        
-        videos_raw, docs_raw = await asyncio.gather(videos_task, docs_task)
-        
-        # Log results for this topic
-        logger.debug(f"       Topic {index+1}: {len(videos_raw)} videos, {len(docs_raw)} docs")
-        
-        # Convert to Pydantic models
-        videos = [Video(**v) for v in videos_raw]
-        docs = [Documentation(**d) for d in docs_raw]
-        
-        return Topic(
-            id=index + 1,
-            order=index + 1,
-            topic=topic_data["topic"],
-            description=topic_data.get("description", ""),
-            estimatedHours=topic_data.get("estimatedHours"),
-            videos=videos,
-            documentation=docs,
+    The queue is checked before charging the client, so requests shed for load
+    do not use up the client's allowance. Raises HTTPException 503/429 with
+    Retry-After.
+    
+    Returns:
+        The client key (IP) for fair queueing
+    """
+    if not generation_scheduler.has_capacity():
+        raise _overloaded()
+    
+    client = client_ip(http_request.scope)
+    wait = generation_limiter.check(client)
+    if wait:
+        RATE_LIMITED.labels("generation").inc()
+        logger.warning("🚦 Rate limited %s: next roadmap generation in %.0fs", client, wait)
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "error": "RATE_LIMITED",
+                "message": f"Too many new roadmaps requested. Try again in {retry_after(wait)}s."
+            },
+            headers={"Retry-After": retry_after(wait)},
         )
+    return client
+
+
+@app.get("/roadmaps/{course_id}", response_model=RoadmapResponse)
+async def get_roadmap(
+    course_id: str,
+    accept_encoding: str = Header(""),
+    if_none_match: str = Header(""),
+):
+    """
+    Fetch an already generated roadmap by course ID (X-Roadmap-Id from POST).
     
-    # Process all topics concurrently
-    logger.info(f"       Processing {len(raw_topics)} topics in parallel...")
-    tasks = [
-        enrich_single_topic(i, topic) 
-        for i, topic in enumerate(raw_topics)
-    ]
+    Responses carry a strong ETag and CDN-friendly Cache-Control, and
+    If-None-Match is answered with 304, so repeat views are served by the
+    browser or the edge cache.
+    """
+    cached_roadmap = roadmap_cache.get_hashed(course_id)
+    if not cached_roadmap:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "ROADMAP_NOT_FOUND", "message": "No roadmap cached for this course ID"}
+        )
     
-    results = await asyncio.gather(*tasks)
-    logger.info(f"       ✅ All topics enriched")
+    headers = {"Cache-Control": settings.ROADMAP_CACHE_CONTROL}
+    if cached_roadmap.not_modified(if_none_match):
+        return cached_roadmap.not_modified_response(accept_encoding, headers)
+    return cached_roadmap.to_response(accept_encoding, headers)
+
+
+@app.get("/search", response_model=SearchResponse)
+async def search_roadmaps(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """
+    Search already generated roadmaps by topic, description and course title.
     
-    return results
+    Served from the in-process BM25 index, so it never touches the pipeline.
+    Fetch a result's full roadmap from /roadmaps/{courseId}.
+    """
+    with SEARCH_SECONDS.time():
+        results = roadmap_index.search(q, limit)
+    return {"query": q, "total": len(results), "results": results}
 
 
 # Error handlers
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Handle unexpected errors gracefully."""
-    logger.error(f"Unhandled exception: {type(exc).__name__}: {exc}")
+    logger.error("Unhandled exception: %s: %s", type(exc).__name__, exc)
     return {
         "success": False,
         "error": "INTERNAL_ERROR",
@@ -0,0 +1,377 @@
+"""
+Prometheus-style metrics for FuckPaidCourses backend.
+Counters, gauges and histograms rendered in the text exposition format at /metrics.
+
+Recording takes one uncontended lock per metric child, cheap enough to stay on
+in production.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+
+# Latency buckets in seconds (fast cache paths up to slow LLM calls)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    """Render a {name="value",...} label set."""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class: a named metric family with optional labels."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        """Return the child for a label set, creating it on first use."""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def children(self) -> list[tuple[tuple, object]]:
+        """(label values, child) pairs, e.g. for sampling values outside /metrics."""
+        return list(self._children.items())
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value", "func", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.func: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def set_function(self, func: Callable[[], float]) -> None:
+        """Read the value from a callback at scrape time."""
+        self.func = func
+
+    def get(self) -> float:
+        return self.func() if self.func else self.value
+
+    @contextmanager
+    def track_inprogress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    def render(self, name, labelnames, key):
+        value = self.value
+        if self.func:
+            try:
+                value = self.func()
+            except Exception:
+                value = float("nan")
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(value)}"]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._children[()].dec(amount)
+
+    def set_function(self, func: Callable[[], float]) -> None:
+        self._children[()].set_function(func)
+
+    def get(self) -> float:
+        """Current value (unlabelled gauges only)."""
+        return self._children[()].get()
+
+    def track_inprogress(self):
+        return self._children[()].track_inprogress()
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> tuple[list[int], float]:
+        """Per-bucket counts (not cumulative, +Inf last) and the sum."""
+        with self._lock:
+            return list(self.counts), self.sum
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (latencies) in fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def time(self):
+        return self._children[()].time()
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def response_status(exc: BaseException) -> Optional[str]:
+    """
+    HTTP status an upstream exception carries as an attribute, or None.
+
+    Handles httpx, requests (Firecrawl SDK), googleapiclient and google-genai errors.
+    """
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "resp", None), "status", None)
+    if status is None:
+        status = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if isinstance(status, int) or (isinstance(status, str) and status.isdigit()):
+        return str(status)
+    return None
+
+
+def error_code(exc: BaseException) -> str:
+    """
+    Best-effort HTTP status (or error class) for an upstream exception.
+
+    Uses response_status() and falls back to a status code found in the
+    message (older Firecrawl SDKs).
+    """
+    status = response_status(exc)
+    if status is not None:
+        return status
+
+    name = type(exc).__name__.lower()
+    if "timeout" in name:
+        return "timeout"
+    match = re.search(r"\b([45]\d\d)\b", str(exc))
+    if match:
+        return match.group(1)
+    return "error"
+
+
+# Global registry and application metrics
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "fpc_pipeline_stage_seconds",
+    "Time spent in each roadmap pipeline stage",
+    ("stage",),
+)
+UPSTREAM_CALLS = registry.counter(
+    "fpc_upstream_calls_total",
+    "Calls to upstream APIs by outcome (ok, HTTP status or error class)",
+    ("upstream", "outcome"),
+)
+UPSTREAM_SECONDS = registry.histogram(
+    "fpc_upstream_call_seconds",
+    "Latency of upstream API calls",
+    ("upstream",),
+)
+CACHE_EVENTS = registry.counter(
+    "fpc_cache_events_total",
+    "Cache lookups and evictions by cache and event (hit, miss, eviction)",
+    ("cache", "event"),
+)
+HTTP_IN_FLIGHT = registry.gauge(
+    "fpc_http_requests_in_flight",
+    "HTTP requests currently being handled",
+)
+PIPELINES_IN_FLIGHT = registry.gauge(
+    "fpc_pipelines_in_flight",
+    "Roadmap generation pipelines currently running",
+)
+EXECUTOR_QUEUE_DEPTH = registry.gauge(
+    "fpc_executor_queue_depth",
+    "Blocking service calls waiting for an executor thread",
+)
+EXECUTOR_CALLS_IN_FLIGHT = registry.gauge(
+    "fpc_executor_calls_in_flight",
+    "Blocking service calls submitted and not yet completed (queued or running)",
+)
+
+
+@contextmanager
+def track_upstream(upstream: str):
+    """Count and time one upstream call, recording the error code on failure."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        UPSTREAM_CALLS.labels(upstream, error_code(e)).inc()
+        raise
+    else:
+        UPSTREAM_CALLS.labels(upstream, "ok").inc()
+    finally:
+        UPSTREAM_SECONDS.labels(upstream).observe(time.perf_counter() - start)
+
+
+class InFlightMiddleware:
+    """Pure ASGI middleware tracking in-flight HTTP requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            HTTP_IN_FLIGHT.dec()
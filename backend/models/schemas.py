@@ -2,7 +2,7 @@
 Pydantic models for request/response schemas.
 """
 
-from pydantic import BaseModel, HttpUrl, Field
+from pydantic import BaseModel, HttpUrl, Field, PrivateAttr
 from typing import Optional
 from datetime import datetime
 
@@ -13,6 +13,11 @@ class GenerateRoadmapRequest(BaseModel):
     url: str = Field(..., description="URL of the paid course to convert")
 
 
+class BatchRoadmapRequest(BaseModel):
+    """Request body for generating roadmaps for several course URLs at once."""
+    urls: list[str] = Field(..., min_length=1, description="Course URLs (duplicates are generated once)")
+
+
 # Response Models
 class Video(BaseModel):
     """YouTube video information."""
@@ -56,6 +61,8 @@ class RoadmapResponse(BaseModel):
     course: CourseInfo
     roadmap: list[Topic]
     generatedAt: datetime = Field(default_factory=datetime.utcnow)
+    # Built from generic fallback topics (no usable Gemini answer): served, never cached
+    _fallback: bool = PrivateAttr(default=False)
 
 
 class ErrorResponse(BaseModel):
@@ -63,3 +70,26 @@ class ErrorResponse(BaseModel):
     success: bool = False
     error: str
     message: str
+
+
+class SearchTopicHit(BaseModel):
+    """A topic of a cached roadmap matching a search query."""
+    id: int
+    topic: str
+    description: str
+    score: float
+
+
+class SearchResult(BaseModel):
+    """A cached roadmap matching a search query (fetch it from /roadmaps/{courseId})."""
+    courseId: str
+    course: CourseInfo
+    score: float
+    topics: list[SearchTopicHit]
+
+
+class SearchResponse(BaseModel):
+    """Search results over already generated roadmaps."""
+    query: str
+    total: int
+    results: list[SearchResult]
@@ -0,0 +1,158 @@
+"""
+Persistence for FuckPaidCourses backend.
+Append-only roadmap store and cache snapshots that survive restarts.
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+
+from cache import SimpleCache, LazyValue
+from config import settings
+from models.schemas import RoadmapResponse
+from responses import CachedRoadmap, dump_roadmap
+
+
+SNAPSHOT_HEADER = "#fpc-snapshot v1"
+
+# Cache name -> (encode value to JSON text, decode JSON text to value)
+SNAPSHOT_CODECS = {
+    "roadmap": (
+        lambda v: v.json_bytes().decode("utf-8"),
+        lambda raw: CachedRoadmap.from_json(raw.encode("utf-8")),
+    ),
+    "course": (lambda v: json.dumps(v, ensure_ascii=False), json.loads),
+    "similarity": (lambda v: json.dumps(v, separators=(",", ":")), json.loads),
+}
+
+
+def _open_text(path: str, mode: str, compressed: bool):
+    """Open a snapshot file as text, optionally gzip-compressed."""
+    if compressed:
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=6)
+    return open(path, mode, encoding="utf-8")
+
+
+def save_snapshot(path: str, caches: dict[str, SimpleCache]) -> int:
+    """
+    Write all unexpired cache entries to a snapshot file.
+    
+    Each line is "<cache>\t<hashed key>\t<timestamp>\t<value json>", so the
+    loader can restore entries without parsing the values. The file is written
+    to a temporary path and renamed, so readers never see a partial snapshot.
+    
+    Returns:
+        Number of entries written
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    
+    written = 0
+    tmp_path = f"{path}.tmp"
+    with _open_text(tmp_path, "w", compressed=path.endswith(".gz")) as f:
+        f.write(SNAPSHOT_HEADER + "\n")
+        for name, cache in caches.items():
+            encode = SNAPSHOT_CODECS[name][0]
+            for hashed, value, timestamp in cache.entries():
+                # Entries never read since the last restore are still raw JSON
+                raw = value.raw if isinstance(value, LazyValue) else encode(value)
+                f.write(f"{name}\t{hashed}\t{timestamp!r}\t{raw}\n")
+                written += 1
+    os.replace(tmp_path, path)
+    return written
+
+
+def load_snapshot(path: str, caches: dict[str, SimpleCache]) -> int:
+    """
+    Restore cache entries from a snapshot file.
+    
+    Values are kept as raw JSON and only decoded when first read from the
+    cache, so loading costs little more than reading the file.
+    
+    Returns:
+        Number of entries restored
+    """
+    if not os.path.exists(path):
+        return 0
+    
+    restored = 0
+    with _open_text(path, "r", compressed=path.endswith(".gz")) as f:
+        if f.readline().rstrip("\n") != SNAPSHOT_HEADER:
+            return 0
+        for line in f:
+            try:
+                name, hashed, timestamp, raw = line.rstrip("\n").split("\t", 3)
+                cache = caches.get(name)
+                if cache is None:
+                    continue
+                value = LazyValue(raw, SNAPSHOT_CODECS[name][1])
+                if cache.restore(hashed, value, float(timestamp)):
+                    restored += 1
+            except ValueError:
+                continue
+    return restored
+
+
+class RoadmapStore:
+    """
+    Append-only store of generated roadmaps.
+
+    Each line is {"k": canonical_url, "t": timestamp, "v": roadmap_json}.
+    Lines are flushed and fsynced one by one, so a crash loses at most the
+    line being written (a truncated last line is skipped on load).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, key: str, roadmap: RoadmapResponse, timestamp: float = None) -> None:
+        """Durably append one roadmap to the store."""
+        value = dump_roadmap(roadmap).decode("utf-8")
+        line = f'{{"k":{json.dumps(key)},"t":{timestamp or time.time()!r},"v":{value}}}'
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def keys(self, max_age: float = None) -> set[str]:
+        """Return the canonical keys present in the store (stored within max_age seconds, if given)."""
+        now = time.time()
+        return {
+            key for key, timestamp, _ in self._read()
+            if max_age is None or now - timestamp <= max_age
+        }
+
+    def load_into(self, cache: SimpleCache) -> int:
+        """Load stored roadmaps younger than CACHE_TTL into a cache. Returns number of entries loaded."""
+        loaded = 0
+        now = time.time()
+        for key, timestamp, value in self._read():
+            if now - timestamp > settings.CACHE_TTL:
+                continue  # Already expired: it would never be served
+            roadmap = RoadmapResponse.model_validate(value)
+            cache.set(key, CachedRoadmap.from_roadmap(roadmap), timestamp=timestamp)
+            loaded += 1
+        return loaded
+
+    def _read(self):
+        """Yield (key, timestamp, value) for every valid line in the store."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    yield record["k"], record["t"], record["v"]
+                except (json.JSONDecodeError, KeyError):
+                    # Partial line from an interrupted write
+                    continue
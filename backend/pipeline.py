@@ -0,0 +1,289 @@
+"""
+Roadmap generation pipeline: scrape -> extract topics -> find resources.
+
+Kept apart from main so offline tools (precompute.py, bench.py) can import
+it without building the FastAPI app (middleware, key pools warm-up, cache
+warmer, fakes/cassettes installation).
+"""
+
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+import asyncio
+import re
+import time
+
+from config import settings
+from cache import roadmap_cache, scrape_failure_cache, canonical_url, hash_key
+from logger import logger, RequestLogger
+from models.schemas import RoadmapResponse, CourseInfo, Topic
+from services.scraper import scraper_service
+from services.llm import llm_service
+from services.youtube import youtube_service
+from services.search import search_service
+from similarity import course_index, title_similarity
+from ranking import rank_roadmap
+from keypool import NoKeyAvailable
+from tracing import span, run_in_executor
+from metrics import STAGE_SECONDS, PIPELINES_IN_FLIGHT, CACHE_EVENTS
+
+
+async def build_roadmap(url: str, req_log: RequestLogger, shared_topics: dict = None) -> RoadmapResponse:
+    """
+    Run the full pipeline (scrape -> extract topics -> find resources) for a URL.
+    
+    Blocking service calls run in the default executor so several pipelines
+    can run concurrently on one event loop. Pipelines given the same
+    shared_topics dict (a batch) look up resources for each topic once.
+    Raises HTTPException on failure.
+    """
+    PIPELINES_IN_FLIGHT.inc()
+    
+    try:
+        # Step 1: Scrape the course page
+        req_log.step("Scraping course page", "Using Firecrawl API")
+        start_scrape = time.time()
+        scraped = await run_in_executor("scrape", scraper_service.scrape_course, url)
+        scrape_time = time.time() - start_scrape
+        STAGE_SECONDS.labels("scrape").observe(scrape_time)
+        
+        if not scraped.get("success"):
+            detail = {
+                "error": "SCRAPE_FAILED",
+                "message": f"Could not scrape course page: {scraped.get('error', 'Unknown error')}"
+            }
+            # Remember the failure so retries don't pay for another Firecrawl call
+            permanent = scraped.get("permanent", False)
+            ttl = settings.NEGATIVE_CACHE_TTL_PERMANENT if permanent else settings.NEGATIVE_CACHE_TTL_TRANSIENT
+            scrape_failure_cache.set(canonical_url(url), {"detail": detail, "permanent": permanent}, ttl)
+            req_log.detail("Scrape failure cached for %ds (%s)", ttl, "permanent" if permanent else "transient")
+            raise HTTPException(status_code=400, detail=detail)
+        
+        course_title = scraped["title"]
+        platform = scraped["platform"]
+        content = scraped["content"]
+        
+        req_log.detail("Title: %s", course_title)
+        req_log.detail("Platform: %s", platform)
+        req_log.detail("Content length: %d chars", len(content))
+        req_log.detail("Scrape time: %.2fs", scrape_time)
+        
+        # Same course under another URL? Reuse its topics and resources
+        course_id = hash_key(canonical_url(url))
+        signature = None
+        if settings.SIMILARITY_THRESHOLD > 0:
+            signature, similar = await run_in_executor(
+                "similarity", find_similar_roadmap, content, course_id, course_title
+            )
+            if similar:
+                source_id, similarity, roadmap_topics = similar
+                req_log.step("Reusing near-duplicate course", f"{similarity:.0%} similar to {source_id}")
+                course_index.add(course_id, signature)
+                return RoadmapResponse(
+                    success=True,
+                    course=CourseInfo(
+                        title=course_title,
+                        platform=platform,
+                        originalUrl=url,
+                        totalTopics=len(roadmap_topics),
+                    ),
+                    roadmap=roadmap_topics,
+                    generatedAt=datetime.utcnow(),
+                )
+        
+        # Step 2: Extract topics using LLM
+        route = llm_service.route(len(content))
+        req_log.step("Extracting topics with AI", f"Using {route.model} ({route.reason})")
+        start_llm = time.time()
+        raw_topics = await run_in_executor(
+            "extract_topics", llm_service.extract_topics, content, course_title, route
+        )
+        fallback = any(topic.get("fallback") for topic in raw_topics)
+        llm_time = time.time() - start_llm
+        STAGE_SECONDS.labels("llm").observe(llm_time)
+        
+        req_log.detail("Extracted %d topics", len(raw_topics))
+        req_log.detail("LLM time: %.2fs", llm_time)
+        
+        for i, topic in enumerate(raw_topics):
+            req_log.detail("  Topic %d: %s", i + 1, topic["topic"])
+        
+        # Step 3 & 4: Find resources for each topic (in parallel)
+        req_log.step("Finding resources", f"YouTube + Serper for {len(raw_topics)} topics")
+        start_resources = time.time()
+        with span("enrich", topics=len(raw_topics)):
+            roadmap_topics = await _enrich_topics(raw_topics, req_log, shared_topics)
+        resources_time = time.time() - start_resources
+        STAGE_SECONDS.labels("enrich").observe(resources_time)
+        
+        req_log.detail("Resource search time: %.2fs", resources_time)
+        
+        # Count total resources
+        total_videos = sum(len(t.videos) for t in roadmap_topics)
+        total_docs = sum(len(t.documentation) for t in roadmap_topics)
+        req_log.detail("Total videos found: %d", total_videos)
+        req_log.detail("Total docs found: %d", total_docs)
+        
+        if signature and not fallback:
+            course_index.add(course_id, signature)
+        
+        # Build response
+        req_log.step("Building response")
+        response = RoadmapResponse(
+            success=True,
+            course=CourseInfo(
+                title=course_title,
+                platform=platform,
+                originalUrl=url,
+                totalTopics=len(roadmap_topics),
+            ),
+            roadmap=roadmap_topics,
+            generatedAt=datetime.utcnow(),
+        )
+        response._fallback = fallback
+        return response
+        
+    except HTTPException:
+        raise
+    except NoKeyAvailable as e:
+        logger.error("Failed to generate roadmap: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "QUOTA_EXHAUSTED",
+                "message": f"Upstream API quota exhausted: {str(e)}"
+            },
+            headers={"Retry-After": str(max(1, round(e.retry_after or settings.OVERLOAD_RETRY_AFTER)))},
+        )
+    except Exception as e:
+        logger.error("Failed to generate roadmap: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "GENERATION_FAILED",
+                "message": f"Failed to generate roadmap: {str(e)}"
+            }
+        )
+    finally:
+        PIPELINES_IN_FLIGHT.dec()
+
+
+def build_topic(index: int, topic_data: dict, videos_raw: list[dict], docs_raw: list[dict]) -> Topic:
+    """
+    Validate a topic and its resources in one model_validate() call.
+    
+    Nested dicts are validated by pydantic-core directly, which is cheaper than
+    constructing each Video/Documentation model separately.
+    """
+    return Topic.model_validate({
+        "id": index + 1,
+        "order": index + 1,
+        "topic": topic_data["topic"],
+        "description": topic_data.get("description", ""),
+        "estimatedHours": topic_data.get("estimatedHours"),
+        "videos": videos_raw,
+        "documentation": docs_raw,
+    })
+
+
+def find_similar_roadmap(
+    content: str, course_id: str, title: str
+) -> tuple[Optional[tuple[int, ...]], Optional[tuple[str, float, list[Topic]]]]:
+    """
+    Signature of the scraped content and the topics of the most similar course
+    that still has a cached roadmap (CPU bound, run in the executor).
+    
+    The course may be on any URL or platform. Besides the content similarity,
+    the titles must share at least SIMILARITY_TITLE_THRESHOLD of their words,
+    so look-alike pages of two different courses never share a roadmap.
+    
+    Returns:
+        (signature or None, (source course ID, estimated similarity, topics) or None)
+    """
+    signature, matches = course_index.match(content, course_id)
+    for source_id, similarity in matches:
+        cached = roadmap_cache.get_hashed(source_id)
+        if cached is None:
+            course_index.remove(source_id)  # Its roadmap expired or was never cached
+            continue
+        roadmap = RoadmapResponse.model_validate_json(cached.json_bytes())
+        if title_similarity(roadmap.course.title, title) < settings.SIMILARITY_TITLE_THRESHOLD:
+            continue
+        CACHE_EVENTS.labels("similar_course", "hit").inc()
+        return signature, (source_id, similarity, roadmap.roadmap)
+    CACHE_EVENTS.labels("similar_course", "miss").inc()
+    return signature, None
+
+
+def _topic_key(topic_name: str) -> str:
+    """Case- and punctuation-insensitive key of a topic name (shared lookups within a batch)."""
+    return " ".join(re.findall(r"[a-z0-9+#]+", topic_name.lower()))
+
+
+async def _find_resources(topic_name: str) -> tuple[list[dict], list[dict]]:
+    """Search YouTube video and documentation candidates for a topic concurrently (unranked)."""
+    # These are sync functions, run them in thread pool concurrently
+    videos_task = run_in_executor(
+        "youtube_search",
+        youtube_service.video_candidates,
+        f"{topic_name} tutorial",
+    )
+    docs_task = run_in_executor(
+        "docs_search",
+        search_service.documentation_candidates,
+        topic_name,
+    )
+    return await asyncio.gather(videos_task, docs_task)
+
+
+async def _enrich_topics(raw_topics: list[dict], req_log: RequestLogger, shared: dict = None) -> list[Topic]:
+    """
+    Add YouTube videos and documentation to each topic.
+    
+    Candidates are looked up per topic, then ranked for the whole roadmap at
+    once (ranking.rank_roadmap), so one video or page isn't repeated across
+    topics. With a shared dict (topic key -> lookup future), a topic already
+    looked up or in flight for another course of the batch reuses that lookup.
+    """
+    
+    async def find_single_topic(index: int, topic_data: dict) -> tuple[list[dict], list[dict]]:
+        """Resource candidates for a single topic."""
+        topic_name = topic_data["topic"]
+        start = time.perf_counter()
+        
+        with span("topic", index=index + 1, topic=topic_name):
+            if shared is None:
+                videos_raw, docs_raw = await _find_resources(topic_name)
+            else:
+                key = _topic_key(topic_name)
+                lookup = shared.get(key)
+                CACHE_EVENTS.labels("batch_topic", "miss" if lookup is None else "hit").inc()
+                if lookup is None:
+                    lookup = shared[key] = asyncio.ensure_future(_find_resources(topic_name))
+                # Shielded: one course being cancelled must not cancel the others' lookup
+                videos_raw, docs_raw = await asyncio.shield(lookup)
+        STAGE_SECONDS.labels("enrich_topic").observe(time.perf_counter() - start)
+        
+        # Log candidates for this topic
+        logger.debug("       Topic %d: %d video, %d doc candidates", index + 1, len(videos_raw), len(docs_raw))
+        
+        return videos_raw, docs_raw
+    
+    # Process all topics concurrently
+    logger.info("       Processing %d topics in parallel...", len(raw_topics))
+    tasks = [
+        find_single_topic(i, topic) 
+        for i, topic in enumerate(raw_topics)
+    ]
+    candidates = await asyncio.gather(*tasks)
+    
+    # Rank all candidates of the roadmap in one pass (cheap, stays on the loop)
+    with span("rank"), STAGE_SECONDS.labels("rank").time():
+        ranked = rank_roadmap(raw_topics, [c[0] for c in candidates], [c[1] for c in candidates])
+    results = [
+        build_topic(i, topic, videos_raw, docs_raw)
+        for i, (topic, (videos_raw, docs_raw)) in enumerate(zip(raw_topics, ranked))
+    ]
+    logger.info("       ✅ All topics enriched")
+    
+    return results
@@ -0,0 +1,232 @@
+"""
+Course popularity tracking and cache warming for FuckPaidCourses backend.
+
+Every roadmap lookup is counted in a count-min sketch (fixed memory however
+many distinct courses are requested), and the most requested courses are kept
+in a small top-K table. Counts are halved every WARM_DECAY_INTERVAL seconds,
+so popularity follows recent traffic.
+
+A background warmer regenerates top-K roadmaps that are about to expire (or
+already have) before the next request has to wait for the pipeline. It only
+runs off-peak (within WARM_OFF_PEAK_HOURS, with no generation queue and
+enough Gemini quota headroom) and within WARM_MAX_PER_HOUR refreshes.
+"""
+
+import asyncio
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from config import settings
+from logger import logger
+from metrics import registry
+from ratelimit import TokenBucket
+
+
+WARMER_REFRESHES = registry.counter(
+    "fpc_cache_warmer_refreshes_total",
+    "Popular roadmaps regenerated by the cache warmer, by outcome",
+    ("outcome",),
+)
+POPULAR_COURSES = registry.gauge(
+    "fpc_popularity_top_courses",
+    "Courses in the popularity top-K table",
+)
+
+
+class CountMinSketch:
+    """Approximate counts in depth x width counters; never undercounts (caller locks)."""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self._rows = [[0] * width for _ in range(depth)]
+        self._salts = [f"{row}:".encode("utf-8") for row in range(depth)]
+
+    def _cells(self, key: str) -> list[int]:
+        data = key.encode("utf-8")
+        return [zlib.crc32(salt + data) % self.width for salt in self._salts]
+
+    def add(self, key: str, amount: int = 1) -> int:
+        """Count key (conservative update: only the smallest cells grow). Returns its new estimate."""
+        cells = self._cells(key)
+        estimate = min(row[cell] for row, cell in zip(self._rows, cells)) + amount
+        for row, cell in zip(self._rows, cells):
+            if row[cell] < estimate:
+                row[cell] = estimate
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[cell] for row, cell in zip(self._rows, self._cells(key)))
+
+    def halve(self) -> None:
+        for row in self._rows:
+            for i, value in enumerate(row):
+                if value:
+                    row[i] = value >> 1
+
+
+class PopularityTracker:
+    """Count-min sketch of course lookups plus the top-K courses with a URL to regenerate them (thread-safe)."""
+
+    def __init__(self, top_k: int = 100, width: int = 2048, depth: int = 4):
+        self.top_k = top_k
+        self._sketch = CountMinSketch(width, depth)
+        self._lock = threading.Lock()
+        # course_id -> [estimated count, url]
+        self._top: dict[str, list] = {}
+        self._floor = 0  # Smallest count in a full top-K table
+
+    def record(self, course_id: str, url: str) -> None:
+        """Count one lookup of a course (event loop; O(depth), O(K) when the top-K changes)."""
+        with self._lock:
+            count = self._sketch.add(course_id)
+            entry = self._top.get(course_id)
+            if entry is not None:
+                entry[0], entry[1] = count, url
+                return
+            if len(self._top) < self.top_k:
+                self._top[course_id] = [count, url]
+                if len(self._top) == self.top_k:
+                    self._floor = min(e[0] for e in self._top.values())
+                return
+            if count <= self._floor:
+                return
+            coldest = min(self._top, key=lambda k: self._top[k][0])
+            del self._top[coldest]
+            self._top[course_id] = [count, url]
+            self._floor = min(e[0] for e in self._top.values())
+
+    def top(self, limit: int = None) -> list[tuple[str, str, int]]:
+        """Most requested courses first: (course_id, url, estimated count)."""
+        with self._lock:
+            ranked = sorted(self._top.items(), key=lambda item: -item[1][0])
+        return [(course_id, url, count) for course_id, (count, url) in ranked[:limit]]
+
+    def decay(self) -> None:
+        """Halve all counts, dropping top-K courses that fall to zero."""
+        with self._lock:
+            self._sketch.halve()
+            for course_id, entry in list(self._top.items()):
+                entry[0] >>= 1
+                if not entry[0]:
+                    del self._top[course_id]
+            self._floor = min((e[0] for e in self._top.values()), default=0) if len(self._top) >= self.top_k else 0
+
+    def __len__(self) -> int:
+        return len(self._top)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sketch = CountMinSketch(self._sketch.width, self._sketch.depth)
+            self._top.clear()
+            self._floor = 0
+
+
+def parse_hours(value: str) -> list[tuple[int, int]]:
+    """UTC hour ranges like "0-6,22-24" as (start, end) pairs; blank = no restriction."""
+    ranges = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        ranges.append((int(start), int(end or int(start) + 1)))
+    return ranges
+
+
+class CacheWarmer:
+    """Background task regenerating popular roadmaps before they expire (event loop only)."""
+
+    def __init__(
+        self,
+        tracker: PopularityTracker,
+        refresh: Callable[[str, str], Awaitable[None]],
+        expires_in: Callable[[str], Optional[float]],
+        paused: Callable[[], bool],
+    ):
+        """
+        Args:
+            refresh: coroutine function regenerating and caching (course_id, url)
+            expires_in: seconds until a course's cached roadmap expires (None if not cached)
+            paused: True while real traffic or low quota needs the upstreams
+        """
+        self.tracker = tracker
+        self.refresh = refresh
+        self.expires_in = expires_in
+        self.paused = paused
+        self.budget = TokenBucket(settings.WARM_MAX_PER_HOUR / 3600) if settings.WARM_MAX_PER_HOUR else None
+        self.off_peak_hours = parse_hours(settings.WARM_OFF_PEAK_HOURS)
+        self._task: Optional[asyncio.Task] = None
+        self._last_decay = time.monotonic()
+        # course_id -> monotonic time of a failed refresh (not retried for WARM_DECAY_INTERVAL)
+        self._failed: dict[str, float] = {}
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def off_peak(self) -> bool:
+        """Within the configured off-peak hours (UTC) and not busy with real traffic."""
+        if self.off_peak_hours:
+            hour = datetime.now(timezone.utc).hour
+            if not any(start <= hour < end for start, end in self.off_peak_hours):
+                return False
+        return not self.paused()
+
+    def due(self) -> list[tuple[str, str]]:
+        """Popular courses whose roadmap is missing or expires within WARM_REFRESH_AHEAD seconds."""
+        now = time.monotonic()
+        for course_id, failed_at in list(self._failed.items()):
+            if now - failed_at >= settings.WARM_DECAY_INTERVAL:
+                del self._failed[course_id]
+        return [
+            (course_id, url)
+            for course_id, url, count in self.tracker.top()
+            if count >= settings.WARM_MIN_REQUESTS
+            and course_id not in self._failed
+            and (self.expires_in(course_id) or 0) < settings.WARM_REFRESH_AHEAD
+        ]
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.WARM_INTERVAL)
+            if time.monotonic() - self._last_decay >= settings.WARM_DECAY_INTERVAL:
+                self.tracker.decay()
+                self._last_decay = time.monotonic()
+            try:
+                await self.warm()
+            except Exception as e:
+                logger.error("Cache warmer failed: %s", e)
+
+    async def warm(self) -> int:
+        """Refresh due courses, most popular first, while off-peak and within budget. Returns refreshes."""
+        refreshed = 0
+        for course_id, url in self.due():
+            if not self.off_peak():
+                break
+            if self.budget and self.budget.try_acquire():
+                break  # Out of budget until the bucket refills
+            try:
+                await self.refresh(course_id, url)
+            except Exception as e:
+                self._failed[course_id] = time.monotonic()
+                WARMER_REFRESHES.labels("failed").inc()
+                logger.warning("🔥 Cache warmer could not refresh %s: %s", url, e)
+                continue
+            WARMER_REFRESHES.labels("ok").inc()
+            refreshed += 1
+        if refreshed:
+            logger.info("🔥 Cache warmer refreshed %d popular roadmaps", refreshed)
+        return refreshed
+
+
+# Global popularity of roadmap lookups
+popularity = PopularityTracker(settings.WARM_TOP_K)
+POPULAR_COURSES.set_function(lambda: len(popularity))
@@ -0,0 +1,209 @@
+"""
+Bulk offline roadmap precompute.
+
+Reads a list of course URLs, deduplicates them by canonical URL and runs the
+same pipeline as POST /generate-roadmap with bounded concurrency and
+per-upstream rate limits. Results are appended to the persistent roadmap store
+(loaded into the cache on server startup). Progress is checkpointed, so an
+interrupted run resumes where it stopped; URLs that failed or were rejected
+in an earlier run are skipped unless --retry-failed is given.
+
+Usage:
+    python precompute.py urls.txt --concurrency 4 --gemini-rps 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+
+from fastapi import HTTPException
+
+from cache import canonical_url
+from config import settings
+from logger import logger, RequestLogger
+from persistence import RoadmapStore
+from pipeline import build_roadmap
+from ratelimit import TokenBucket
+from tracing import start_trace
+from services.scraper import scraper_service
+from services.llm import llm_service
+from services.youtube import youtube_service
+from services.search import search_service
+from services.fakes import install_fakes
+from services import cassettes
+
+
+# Checkpoint statuses not retried on the next run (without --retry-failed)
+TERMINAL_STATUSES = {"failed", "rejected"}
+
+
+class Checkpoint:
+    """JSON lines log of processed keys: {"k": key, "status": "done"|"failed"|"rejected", "error": ...}."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> dict[str, str]:
+        """Return the latest status recorded for each key."""
+        statuses = {}
+        if not os.path.exists(self.path):
+            return statuses
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    statuses[record["k"]] = record["status"]
+                except (json.JSONDecodeError, KeyError):
+                    continue
+        return statuses
+
+    def record(self, key: str, status: str, error: str = None) -> None:
+        """Append a status line for a key."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps({"k": key, "status": status, "error": error, "t": time.time()})
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+
+
+def read_urls(path: str) -> dict[str, str]:
+    """Read URLs (one per line, '#' comments allowed) and map canonical key -> first URL seen."""
+    urls = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            url = line.strip()
+            if not url or url.startswith("#"):
+                continue
+            if not url.startswith(("http://", "https://")):
+                logger.warning("Skipping invalid URL: %s", url)
+                continue
+            urls.setdefault(canonical_url(url), url)
+    return urls
+
+
+async def precompute(
+    urls: dict[str, str],
+    store: RoadmapStore,
+    checkpoint: Checkpoint,
+    concurrency: int,
+    retry_failed: bool = False,
+) -> dict[str, int]:
+    """
+    Generate and store roadmaps for all pending URLs. Returns counts by outcome.
+    
+    A course counts as done only while its stored roadmap is younger than
+    CACHE_TTL; older ones are regenerated. Obviously non-course URLs are
+    rejected without calling any upstream, as on the request path, and the
+    rejection is recorded once (not again on every run).
+    """
+    done = store.keys(max_age=settings.CACHE_TTL)
+    statuses = checkpoint.load()
+
+    pending, rejected = {}, 0
+    for key, url in urls.items():
+        if key in done:
+            continue
+        status = statuses.get(key)
+        if status in TERMINAL_STATUSES and not retry_failed:
+            continue
+        reason = scraper_service.non_course_reason(url)
+        if reason:
+            logger.warning("Rejected non-course URL: %s (%s)", url, reason)
+            if status != "rejected":
+                checkpoint.record(key, "rejected", reason)
+            rejected += 1
+            continue
+        pending[key] = url
+
+    counts = {
+        "total": len(urls),
+        "skipped": len(urls) - len(pending) - rejected,
+        "done": 0,
+        "failed": 0,
+        "rejected": rejected,
+    }
+    logger.info(f"📋 {len(urls)} unique courses, {len(pending)} pending, {counts['skipped']} already processed")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def process(key: str, url: str) -> None:
+        async with semaphore:
+            try:
+                with RequestLogger("Precompute Roadmap", url) as req_log, start_trace("precompute", url=url):
+                    response = await build_roadmap(url, req_log)
+                if response._fallback:
+                    raise HTTPException(status_code=502, detail="No usable topics from Gemini (fallback topics not stored)")
+                store.append(key, response)
+                checkpoint.record(key, "done")
+                counts["done"] += 1
+            except HTTPException as e:
+                message = e.detail.get("message") if isinstance(e.detail, dict) else str(e.detail)
+                checkpoint.record(key, "failed", message)
+                counts["failed"] += 1
+
+            finished = counts["done"] + counts["failed"]
+            logger.info("📈 Progress: %d/%d (%d failed)", finished, len(pending), counts["failed"])
+
+    await asyncio.gather(*(process(key, url) for key, url in pending.items()))
+    return counts
+
+
+def configure_rate_limits(args: argparse.Namespace) -> None:
+    """Attach per-upstream token buckets to the service singletons."""
+    if args.firecrawl_rps:
+        scraper_service.rate_limiter = TokenBucket(args.firecrawl_rps)
+    if args.gemini_rps:
+        llm_service.rate_limiter = TokenBucket(args.gemini_rps)
+    if args.serper_rps:
+        search_service.rate_limiter = TokenBucket(args.serper_rps)
+    if args.youtube_rps:
+        youtube_service.rate_limiter = TokenBucket(args.youtube_rps)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-generate roadmaps for a list of course URLs.")
+    parser.add_argument("urls_file", help="File with one course URL per line")
+    parser.add_argument("--store", default=settings.ROADMAP_STORE_PATH, help="Roadmap store to append to")
+    parser.add_argument("--checkpoint", default="data/precompute.checkpoint.jsonl", help="Progress checkpoint file")
+    parser.add_argument("--concurrency", type=int, default=4, help="Pipelines to run at once")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry URLs that failed or were rejected in a previous run")
+    parser.add_argument("--firecrawl-rps", type=float, default=1.0, help="Max Firecrawl calls per second")
+    parser.add_argument("--gemini-rps", type=float, default=0.25, help="Max Gemini calls per second")
+    parser.add_argument("--serper-rps", type=float, default=5.0, help="Max Serper calls per second")
+    parser.add_argument("--youtube-rps", type=float, default=5.0, help="Max YouTube API calls per second")
+    args = parser.parse_args()
+
+    missing = settings.validate()
+    if missing:
+        raise SystemExit(f"Missing API keys: {missing}")
+
+    if settings.FAKE_UPSTREAMS:
+        install_fakes()
+    if settings.CASSETTE_MODE != "off":
+        cassettes.install_cassettes(settings.CASSETTE_MODE, settings.CASSETTE_DIR, settings.CASSETTE_LATENCY_SCALE)
+    configure_rate_limits(args)
+
+    start = time.time()
+    counts = asyncio.run(precompute(
+        read_urls(args.urls_file),
+        RoadmapStore(args.store),
+        Checkpoint(args.checkpoint),
+        concurrency=max(1, args.concurrency),
+        retry_failed=args.retry_failed,
+    ))
+    logger.info(
+        f"🎉 Precompute finished in {time.time() - start:.1f}s: "
+        f"{counts['done']} generated, {counts['failed']} failed, "
+        f"{counts['rejected']} not courses, {counts['skipped']} skipped"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+On-demand sampling profiler for FuckPaidCourses backend.
+
+Samples the stacks of all threads (event loop and executor workers) with
+sys._current_frames() from a dedicated thread for a bounded time, and returns
+the aggregate as collapsed stacks (flamegraph.pl / speedscope) or speedscope
+JSON. Only one profile runs at a time.
+"""
+
+import asyncio
+import collections
+import os
+import sys
+import sysconfig
+import threading
+import time
+
+
+_STDLIB = sysconfig.get_paths()["stdlib"]
+
+# Standard library frames that, on top of a stack, mean the thread is waiting
+# in C (lock, queue, select, socket read), not using CPU: (full path, function).
+# Full paths, so user modules named e.g. socket.py are still sampled.
+IDLE_FRAMES = {
+    (os.path.join(_STDLIB, module), function)
+    for module, function in (
+        ("threading.py", "wait"),
+        ("threading.py", "_wait_for_tstate_lock"),
+        ("queue.py", "get"),
+        ("selectors.py", "select"),
+        ("socket.py", "accept"),
+        ("socket.py", "readinto"),
+        ("ssl.py", "read"),
+        ("ssl.py", "recv_into"),
+        # Idle executor worker blocked in SimpleQueue.get() (C, no frame of its own)
+        (os.path.join("concurrent", "futures", "thread.py"), "_worker"),
+    )
+}
+
+
+def is_idle(frame) -> bool:
+    """Whether a thread whose top frame is this one is waiting rather than running."""
+    code = frame.f_code
+    return (code.co_filename, code.co_name) in IDLE_FRAMES
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is already running."""
+
+
+class SamplingProfiler:
+    """Collects stack samples for a fixed duration."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def _label(self, frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _stack(self, frame) -> list[str]:
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame))
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def sample(self, seconds: float, interval: float, include_idle: bool = False) -> dict:
+        """
+        Sample all threads for `seconds` every `interval` seconds (blocking).
+
+        Returns:
+            dict with "samples" (collapsed stack -> count) and run statistics
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        try:
+            counts: collections.Counter = collections.Counter()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            own_id = threading.get_ident()
+            ticks = 0
+            start = time.perf_counter()
+            deadline = start + seconds
+
+            while time.perf_counter() < deadline:
+                ticks += 1
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    if not include_idle and is_idle(frame):
+                        continue
+                    if thread_id not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    thread_name = names.get(thread_id, str(thread_id))
+                    counts[";".join([thread_name] + self._stack(frame))] += 1
+                time.sleep(interval)
+
+            return {
+                "samples": counts,
+                "ticks": ticks,
+                "seconds": time.perf_counter() - start,
+                "interval": interval,
+            }
+        finally:
+            self._lock.release()
+
+    async def sample_async(self, seconds: float, interval: float, include_idle: bool = False) -> dict:
+        """
+        Run sample() on its own thread and await the result.
+
+        A dedicated thread is used instead of the executor so profiling still
+        works when every executor thread is busy.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def run():
+            try:
+                result = self.sample(seconds, interval, include_idle)
+                loop.call_soon_threadsafe(future.set_result, result)
+            except Exception as e:
+                loop.call_soon_threadsafe(future.set_exception, e)
+
+        threading.Thread(target=run, name="fpc-profiler", daemon=True).start()
+        return await future
+
+
+def to_collapsed(result: dict) -> str:
+    """Collapsed stack format: "frame;frame;frame count" per line."""
+    return "\n".join(f"{stack} {count}" for stack, count in result["samples"].most_common()) + "\n"
+
+
+def to_speedscope(result: dict, name: str = "fpc profile") -> dict:
+    """Speedscope file format with one sampled profile."""
+    frames: list[dict] = []
+    frame_index: dict[str, int] = {}
+    samples, weights = [], []
+
+    for stack, count in result["samples"].items():
+        indexes = []
+        for label in stack.split(";"):
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                frames.append({"name": label})
+            indexes.append(frame_index[label])
+        samples.append(indexes)
+        weights.append(count * result["interval"])
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": "fpc-profiler",
+    }
+
+
+profiler = SamplingProfiler()
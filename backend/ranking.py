@@ -0,0 +1,285 @@
+"""
+Resource ranking for FuckPaidCourses backend.
+
+Documentation links are scored by a domain reputation table compiled once
+into a suffix trie over host labels (TLD first), so "docs.python.org" finds
+its own entry, "python.org" or a wildcard such as any "*.readthedocs.io" in a
+few dict lookups, and blocked sites (course platforms, shops) are dropped.
+Each URL is split into host and path once, when the search result is parsed,
+and the trie walk is remembered per host (results repeat the same sites).
+
+Videos are scored by view count and by how well their duration fits the
+topic's estimatedHours. All candidates of a roadmap are ranked together in
+one pass over flat columns: view counts are normalized across the roadmap,
+and a video or page picked for one topic is not repeated in another.
+"""
+
+import math
+import re
+from typing import Optional
+
+from cache import canonical_url
+
+
+# Scores by host suffix: an entry covers the host and all its subdomains
+DOMAIN_SCORES = {
+    "docs.python.org": 3.0,
+    "developer.mozilla.org": 3.0,
+    "learn.microsoft.com": 2.5,
+    "readthedocs.io": 2.5,
+    "python.org": 2.0,
+    "mozilla.org": 2.0,
+    "realpython.com": 2.0,
+    "freecodecamp.org": 2.0,
+    "w3schools.com": 1.5,
+    "geeksforgeeks.org": 1.5,
+    "tutorialspoint.com": 1.0,
+    "stackoverflow.com": 1.0,
+    "github.com": 1.0,
+    "dev.to": 0.5,
+    "medium.com": 0.3,
+}
+
+# Hosts (and host/path prefixes) that are not free learning resources
+BLOCKED_DOMAINS = [
+    "youtube.com",  # Videos are found separately
+    "youtu.be",
+    "udemy.com",
+    "coursera.org",
+    "skillshare.com",
+    "linkedin.com/learning",
+    "amazon.com",
+    "ebay.com",
+]
+
+# Official documentation usually lives on these subdomains of a project's site
+LABEL_SCORES = {"docs": 2.0, "developer": 1.5, "developers": 1.5, "learn": 1.0}
+
+# Whole path words marking a tutorial or guide (a word, not a substring of one)
+PATH_WORDS = {"tutorial", "tutorials", "guide", "guides", "docs", "documentation", "learn", "reference"}
+PATH_BONUS = 0.5
+
+_has_path_word = re.compile(
+    r"(?<![a-z])(?:%s)(?![a-z])" % "|".join(sorted(PATH_WORDS, key=len, reverse=True))
+).search
+
+# Video score weights: view count (normalized over the roadmap) and duration fit
+VIEWS_WEIGHT = 0.6
+DURATION_WEIGHT = 0.4
+# Doc score weight of the search engine's own ranking (position 1 gets it all)
+POSITION_WEIGHT = 0.5
+
+
+class _Node:
+    __slots__ = ("children", "score", "blocked", "blocked_paths")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        self.score: Optional[float] = None
+        self.blocked = False
+        self.blocked_paths: list[str] = []
+
+
+class DomainReputation:
+    """Suffix trie over host labels mapping domains to a reputation score or a block."""
+
+    def __init__(
+        self,
+        scores: dict[str, float],
+        blocked: list[str],
+        label_scores: dict[str, float],
+        max_sites: int = 10000,
+    ):
+        self._root = _Node()
+        self.label_scores = label_scores
+        self.max_sites = max_sites
+        # Raw URL authority -> (host, score or None if blocked, blocked path prefixes,
+        # characters before the host or None if it isn't just "www."/nothing); results keep
+        # coming from the same sites. Dict ops are atomic, so no lock.
+        self._sites: dict[str, tuple[str, Optional[float], tuple[str, ...], Optional[int]]] = {}
+        for domain, score in scores.items():
+            self._node(domain).score = score
+        for entry in blocked:
+            domain, _, path = entry.partition("/")
+            node = self._node(domain)
+            if path:
+                node.blocked_paths.append(path.rstrip("/") + "/")  # Whole path segments
+            else:
+                node.blocked = True
+
+    def _node(self, domain: str) -> _Node:
+        node = self._root
+        for label in reversed(domain.lower().split(".")):
+            node = node.children.setdefault(label, _Node())
+        return node
+
+    def _site(self, authority: str) -> tuple[str, Optional[float], tuple[str, ...], Optional[int]]:
+        """Host of a URL authority (no userinfo, port, query or "www.") and its trie walk, TLD first."""
+        host = authority.split("?", 1)[0].split("#", 1)[0].rpartition("@")[2].partition(":")[0]
+        if host.startswith("www."):
+            host = host[4:]
+        offset = len(authority) - len(host)
+        if authority[offset:] != host:
+            offset = None
+
+        labels = host.split(".")
+        node = self._root
+        score, depth = 0.0, 0
+        blocked_paths: tuple[str, ...] = ()
+        for matched, label in enumerate(reversed(labels), 1):
+            node = node.children.get(label)
+            if node is None:
+                break
+            if node.blocked:
+                return host, None, (), offset
+            if node.blocked_paths:
+                blocked_paths += tuple(node.blocked_paths)
+            if node.score is not None:
+                score, depth = node.score, matched
+        # "docs.example.org" without an entry of its own: likely official documentation
+        if len(labels) > 2 and depth < len(labels):
+            score += self.label_scores.get(labels[0], 0.0)
+        return host, score, blocked_paths, offset
+
+    def lookup(self, url: str) -> Optional[tuple[float, str]]:
+        """
+        Reputation and dedupe key of a page, parsing the URL once.
+
+        Plain string splits rather than urlsplit(): this runs for every search
+        result. The key is the lowercase host and path, without scheme, "www.",
+        query, fragment or trailing slash.
+
+        Returns:
+            (longest matching suffix's score plus subdomain and path bonuses,
+            key), or None if the page is blocked or the URL has no scheme
+        """
+        _, sep, rest = url.lower().partition("://")
+        if not sep:
+            return None
+        authority, _, path = rest.partition("/")
+        site = self._sites.get(authority)
+        if site is None:
+            if len(self._sites) >= self.max_sites:
+                self._sites.clear()
+            site = self._sites[authority] = self._site(authority)
+        host, score, blocked_paths, offset = site
+        if score is None:
+            return None
+        if "?" in rest or "#" in rest:
+            if "?" in authority or "#" in authority:
+                path = ""  # "site.org?q=1": no path
+            else:
+                path = path.split("?", 1)[0].split("#", 1)[0]
+            key = (host + "/" + path).rstrip("/")
+        elif offset is None:
+            key = (host + "/" + path).rstrip("/")
+        else:
+            key = rest[offset:].rstrip("/")  # The common case: already host + "/" + path
+        if blocked_paths and (path + "/").startswith(blocked_paths):
+            return None
+        if _has_path_word(path):
+            score += PATH_BONUS
+        return score, key
+
+    def score_url(self, url: str) -> Optional[float]:
+        """Reputation of a page (see lookup()); None if blocked or malformed."""
+        found = self.lookup(url)
+        return found[0] if found else None
+
+
+def duration_fit(seconds: Optional[float], topic_hours: Optional[float]) -> float:
+    """
+    How well a video's length suits a topic, 0..1 (0.5 when unknown).
+
+    The ideal video is about a quarter of the topic's estimated time, between
+    5 and 60 minutes; the score falls off with the log of the ratio.
+    """
+    if not seconds:
+        return 0.5
+    target = min(3600.0, max(300.0, (topic_hours or 2.0) * 900.0))
+    return math.exp(-math.log(seconds / target) ** 2 / 2.0)
+
+
+def _public(resource: dict) -> dict:
+    return {k: v for k, v in resource.items() if not k.startswith("_")}
+
+
+def _assign(
+    topic_count: int,
+    topic_column: list[int],
+    score_column: list[float],
+    key_column: list[str],
+    resources: list[dict],
+    per_topic: int,
+) -> list[list[dict]]:
+    """
+    Pick up to per_topic resources for each topic, best first, each resource
+    used once per roadmap; a topic left with nothing reuses its best one.
+    """
+    picked: list[list[dict]] = [[] for _ in range(topic_count)]
+    best: list[Optional[int]] = [None] * topic_count
+    used = set()
+    for i in sorted(range(len(score_column)), key=score_column.__getitem__, reverse=True):
+        topic = topic_column[i]
+        if best[topic] is None:
+            best[topic] = i
+        if len(picked[topic]) >= per_topic or key_column[i] in used:
+            continue
+        used.add(key_column[i])
+        picked[topic].append(_public(resources[i]))
+    for topic, resources_picked in enumerate(picked):
+        if not resources_picked and best[topic] is not None:
+            resources_picked.append(_public(resources[best[topic]]))
+    return picked
+
+
+def rank_roadmap(
+    topics: list[dict],
+    video_candidates: list[list[dict]],
+    doc_candidates: list[list[dict]],
+    videos_per_topic: int = 3,
+    docs_per_topic: int = 2,
+) -> list[tuple[list[dict], list[dict]]]:
+    """
+    Rank the resource candidates of all topics of a roadmap together.
+
+    Video candidates carry "_view_count" and "_duration_seconds", doc
+    candidates "_priority" (domain reputation) and "_position" (search rank).
+    Candidates are deduplicated by "_key" (set when parsed), or else by their
+    canonical URL.
+
+    Returns:
+        (videos, docs) per topic, private "_" fields removed
+    """
+    # Flatten into columns: one row per candidate
+    video_topic, video_views, video_seconds, video_keys, videos = [], [], [], [], []
+    for topic_index, candidates in enumerate(video_candidates):
+        for video in candidates:
+            video_topic.append(topic_index)
+            video_views.append(math.log10(1 + (video.get("_view_count") or 0)))
+            video_seconds.append(video.get("_duration_seconds"))
+            video_keys.append(video.get("_key") or canonical_url(video.get("url", "")))
+            videos.append(video)
+    max_views = max(video_views, default=0.0) or 1.0
+    hours = [topic.get("estimatedHours") for topic in topics]
+    video_scores = [
+        VIEWS_WEIGHT * views / max_views + DURATION_WEIGHT * duration_fit(seconds, hours[topic])
+        for topic, views, seconds in zip(video_topic, video_views, video_seconds)
+    ]
+
+    doc_topic, doc_scores, doc_keys, docs = [], [], [], []
+    for topic_index, candidates in enumerate(doc_candidates):
+        for doc in candidates:
+            position = doc.get("_position") or 10
+            doc_topic.append(topic_index)
+            doc_scores.append(doc.get("_priority", 0.0) + POSITION_WEIGHT * max(0.0, 1 - (position - 1) / 10))
+            doc_keys.append(doc.get("_key") or canonical_url(doc.get("url", "")))
+            docs.append(doc)
+
+    ranked_videos = _assign(len(topics), video_topic, video_scores, video_keys, videos, videos_per_topic)
+    ranked_docs = _assign(len(topics), doc_topic, doc_scores, doc_keys, docs, docs_per_topic)
+    return list(zip(ranked_videos, ranked_docs))
+
+
+# Global reputation table
+domain_reputation = DomainReputation(DOMAIN_SCORES, BLOCKED_DOMAINS, LABEL_SCORES)
@@ -0,0 +1,160 @@
+"""
+Rate limiting primitives for FuckPaidCourses backend.
+Token buckets used to keep upstream API usage within quota, and per-client
+buckets used to keep one client from using up that quota for everyone.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from config import settings
+from metrics import registry
+
+
+RATE_LIMITED = registry.counter(
+    "fpc_rate_limited_total",
+    "Requests rejected by rate limiting or admission control",
+    ("reason",),
+)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` tokens/second."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """Add tokens earned since the last update (caller holds the lock)."""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens without blocking.
+
+        Returns:
+            0.0 on success, otherwise the seconds to wait until enough tokens exist
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block the calling thread until tokens are available."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class ClientRateLimiter:
+    """
+    One token bucket per client key, refilled at `per_minute` tokens a minute
+    (0 disables the limit).
+
+    Only the `max_clients` most recently seen clients keep a bucket (LRU), so
+    memory stays bounded however many addresses hit the server. An evicted
+    client starts again with a full bucket.
+    """
+
+    def __init__(self, per_minute: float, burst: float = None, max_clients: int = 10000):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1.0, per_minute)
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, client: str, tokens: float = 1.0) -> float:
+        """
+        Charge a client for a request.
+
+        Returns:
+            0.0 if allowed, otherwise the seconds until the request would be
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.capacity)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+        return bucket.try_acquire(tokens)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+def retry_after(wait: float) -> str:
+    """Retry-After header value (whole seconds, at least 1)."""
+    return str(max(1, math.ceil(wait)))
+
+
+def client_ip(scope: dict) -> str:
+    """
+    Client address for an ASGI scope (or a Starlette Request's scope).
+
+    The first X-Forwarded-For hop is used only with TRUST_FORWARDED_FOR, i.e.
+    when a proxy we control sets it; otherwise clients could pick any key.
+    """
+    if settings.TRUST_FORWARDED_FOR:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class ClientRateLimitMiddleware:
+    """
+    Pure ASGI middleware applying a coarse per-client limit to every request.
+
+    This only stops floods; cache hits are cheap and pass freely below it.
+    Uncached roadmap generation is metered separately (and much more
+    strictly) by the endpoint, once it knows the request is a cache miss.
+    """
+
+    EXEMPT_PATHS = ("/health", "/ready", "/metrics")
+
+    def __init__(self, app, limiter: ClientRateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in self.EXEMPT_PATHS:
+            return await self.app(scope, receive, send)
+
+        wait = self.limiter.check(client_ip(scope))
+        if not wait:
+            return await self.app(scope, receive, send)
+
+        RATE_LIMITED.labels("client").inc()
+        body = json.dumps({"detail": {
+            "error": "RATE_LIMITED",
+            "message": f"Too many requests. Try again in {retry_after(wait)}s.",
+        }}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", retry_after(wait).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,154 @@
+"""
+Pre-serialized roadmap responses.
+Roadmaps are cached as ready-to-send JSON bytes (optionally compressed), so a
+cache hit is served without any Pydantic validation or serialization.
+"""
+
+import gzip
+import hashlib
+import json
+import math
+
+from fastapi.responses import Response
+
+from config import settings
+from models.schemas import RoadmapResponse
+
+try:
+    import orjson
+except ImportError:  # Optional dependency
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency
+    zstandard = None
+
+
+def _exponent_float(value) -> bool:
+    """Whether Python's repr of a float uses an exponent ("1e+16"), which orjson writes differently ("1e16")."""
+    return isinstance(value, float) and math.isfinite(value) and value != 0 and not 1e-4 <= abs(value) < 1e16
+
+
+def dump_roadmap(roadmap: RoadmapResponse) -> bytes:
+    """
+    Serialize a roadmap to JSON bytes in the exact response_model wire format.
+    
+    FastAPI dumps the model in JSON mode and writes it with json.dumps
+    (compact, raw UTF-8). orjson on the python-mode dump gives the same bytes
+    (field order, escaping, ISO datetimes with "Z" for UTC) except for floats
+    whose repr uses an exponent, so the rare roadmap with such an
+    estimatedHours takes FastAPI's own path, as does everything without orjson.
+    
+    Accepted difference: a non-finite float is written as null by orjson;
+    FastAPI's json.dumps refused it (a 500).
+    """
+    if orjson and not any(_exponent_float(topic.estimatedHours) for topic in roadmap.roadmap):
+        return orjson.dumps(roadmap.model_dump(), option=orjson.OPT_UTC_Z)
+    return json.dumps(
+        roadmap.model_dump(mode="json"),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _accepts(accept_encoding: str, encoding: str) -> bool:
+    """Check whether an Accept-Encoding header allows the given encoding."""
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip() == encoding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def _etag_matches(if_none_match: str, etags: tuple[str, ...]) -> bool:
+    """Weak comparison of an If-None-Match header against our ETags."""
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in etags:
+            return True
+    return False
+
+
+class CachedRoadmap:
+    """A serialized roadmap, stored compressed according to CACHE_COMPRESSION."""
+
+    __slots__ = ("body", "encoding", "etag")
+
+    def __init__(self, body: bytes, encoding: str = "identity", etag: str = ""):
+        self.body = body
+        self.encoding = encoding
+        # Strong ETag of the uncompressed JSON
+        self.etag = etag
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "CachedRoadmap":
+        """Wrap (and compress) already-serialized roadmap JSON."""
+        etag = f'"{hashlib.blake2b(data, digest_size=16).hexdigest()}"'
+        compression = settings.CACHE_COMPRESSION
+        if compression == "zstd" and zstandard:
+            return cls(zstandard.ZstdCompressor(level=3).compress(data), "zstd", etag)
+        if compression == "gzip":
+            return cls(gzip.compress(data, compresslevel=6, mtime=0), "gzip", etag)
+        return cls(data, etag=etag)
+
+    def encoded_etag(self) -> str:
+        """ETag of the compressed representation (differs from the identity one)."""
+        return f'{self.etag[:-1]}-{self.encoding}"'
+
+    def sends_encoded(self, accept_encoding: str) -> bool:
+        """Whether a client with this Accept-Encoding gets the stored (compressed) bytes."""
+        return self.encoding != "identity" and _accepts(accept_encoding, self.encoding)
+
+    def response_etag(self, accept_encoding: str) -> str:
+        """ETag of the representation a client with this Accept-Encoding gets."""
+        return self.encoded_etag() if self.sends_encoded(accept_encoding) else self.etag
+
+    def not_modified(self, if_none_match: str) -> bool:
+        """Check whether the client already holds the current version."""
+        if not if_none_match:
+            return False
+        return _etag_matches(if_none_match, (self.etag, self.encoded_etag()))
+
+    @classmethod
+    def from_roadmap(cls, roadmap: RoadmapResponse) -> "CachedRoadmap":
+        """Serialize a roadmap once, in the same wire format as response_model."""
+        return cls.from_json(dump_roadmap(roadmap))
+
+    def json_bytes(self) -> bytes:
+        """Return the uncompressed JSON body."""
+        if self.encoding == "gzip":
+            return gzip.decompress(self.body)
+        if self.encoding == "zstd":
+            return zstandard.ZstdDecompressor().decompress(self.body)
+        return self.body
+
+    def to_response(self, accept_encoding: str = "", headers: dict = None) -> Response:
+        """Build a response, sending the stored bytes as-is when the client accepts them."""
+        headers = dict(headers or {})
+        headers["ETag"] = self.response_etag(accept_encoding)
+        if self.encoding != "identity":
+            headers["Vary"] = "Accept-Encoding"
+        if self.sends_encoded(accept_encoding):
+            headers["Content-Encoding"] = self.encoding
+            return Response(self.body, media_type="application/json", headers=headers)
+        return Response(self.json_bytes(), media_type="application/json", headers=headers)
+
+    def not_modified_response(self, accept_encoding: str = "", headers: dict = None) -> Response:
+        """
+        Build a 304 response carrying the validators and caching headers.
+
+        The ETag is the one to_response() sends for the same Accept-Encoding
+        (RFC 9110 §15.4.5: a 304 carries the ETag the 200 would have).
+        """
+        headers = dict(headers or {})
+        headers["ETag"] = self.response_etag(accept_encoding)
+        if self.encoding != "identity":
+            headers["Vary"] = "Accept-Encoding"
+        return Response(status_code=304, headers=headers)
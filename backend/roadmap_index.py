@@ -0,0 +1,248 @@
+"""
+Local search over generated roadmaps for FuckPaidCourses backend.
+
+Every roadmap in roadmap_cache is also kept in an in-process inverted index
+(BM25 over topic names, descriptions and course titles), so GET /search
+finds existing roadmaps and topics without running the pipeline. The index
+follows the cache: roadmaps are added as they are cached or restored and
+dropped when their cache entry expires. Snapshot entries restored at startup
+are indexed afterwards in the background (index_pending), so restoring them
+parses no roadmap JSON and no search waits for them.
+"""
+
+import json
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any
+
+from cache import LazyValue
+from config import settings
+from logger import logger
+from metrics import registry
+
+
+SEARCH_SECONDS = registry.histogram(
+    "fpc_search_seconds",
+    "Time spent answering GET /search from the roadmap index",
+)
+ROADMAPS_INDEXED = registry.gauge(
+    "fpc_search_indexed_roadmaps",
+    "Roadmaps in the local search index",
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+[+#]*")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "into",
+    "is", "it", "of", "on", "or", "the", "to", "with", "you", "your", "learn", "using",
+}
+
+# Field weights: a term in the topic name counts this many times
+TOPIC_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+COURSE_TITLE_WEIGHT = 1
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens without stopwords, plural "s" stripped ("c++", "c#" kept)."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _roadmap_data(value: Any) -> dict:
+    """Roadmap JSON from a roadmap_cache value (CachedRoadmap or raw snapshot JSON)."""
+    if isinstance(value, LazyValue):
+        return json.loads(value.raw)
+    return json.loads(value.json_bytes())
+
+
+class RoadmapIndex:
+    """BM25 inverted index with one document per roadmap topic (thread-safe)."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        # term -> {(course_id, topic index): weighted term frequency}
+        self._postings: dict[str, dict[tuple[str, int], int]] = defaultdict(dict)
+        self._doc_lengths: dict[tuple[str, int], int] = {}
+        self._total_length = 0
+        # course_id -> {"course": course info, "topics": [(id, topic, description)], "terms": set, "timestamp"}
+        self._courses: dict[str, dict] = {}
+        # course_id -> (LazyValue, timestamp): restored, not indexed yet (see index_pending)
+        self._pending: dict[str, tuple[LazyValue, float]] = {}
+
+    def add(self, course_id: str, roadmap: dict, timestamp: float = None) -> None:
+        """Index (or re-index) one roadmap given as its JSON dict."""
+        documents = self._documents(roadmap)
+        with self._lock:
+            self._pending.pop(course_id, None)
+            self._insert(course_id, documents, timestamp)
+
+    def _documents(self, roadmap: dict) -> tuple[dict, list, list[list[str]]]:
+        """Course info, (id, topic, description) per topic and each topic's weighted terms (no lock needed)."""
+        course = roadmap.get("course", {})
+        title_terms = tokenize(course.get("title", "")) * COURSE_TITLE_WEIGHT
+        topics, docs = [], []
+        for i, topic in enumerate(roadmap.get("roadmap", [])):
+            name, description = topic.get("topic", ""), topic.get("description", "")
+            terms = tokenize(name) * TOPIC_WEIGHT + tokenize(description) * DESCRIPTION_WEIGHT + title_terms
+            topics.append((topic.get("id", i + 1), name, description))
+            docs.append(terms)
+        return course, topics, docs
+
+    def _insert(self, course_id: str, documents: tuple, timestamp: float = None) -> None:
+        """Replace a course's postings (caller holds the lock)."""
+        course, topics, docs = documents
+        self._remove(course_id)
+        course_terms = set()
+        for i, terms in enumerate(docs):
+            doc = (course_id, i)
+            frequencies: dict[str, int] = defaultdict(int)
+            for term in terms:
+                frequencies[term] += 1
+            for term, count in frequencies.items():
+                self._postings[term][doc] = count
+            course_terms.update(frequencies)
+            self._doc_lengths[doc] = len(terms)
+            self._total_length += len(terms)
+        self._courses[course_id] = {
+            "course": course,
+            "topics": topics,
+            "terms": course_terms,
+            "timestamp": timestamp or time.time(),
+        }
+
+    def add_cached(self, course_id: str, value: Any, timestamp: float) -> None:
+        """roadmap_cache subscriber: index a stored entry (snapshot entries later, see index_pending)."""
+        if isinstance(value, LazyValue):
+            with self._lock:
+                self._remove(course_id)
+                self._pending[course_id] = (value, timestamp)
+            return
+        try:
+            self.add(course_id, _roadmap_data(value), timestamp)
+        except Exception as e:
+            logger.warning("Could not index roadmap %s: %s", course_id, e)
+
+    def index_pending(self) -> int:
+        """
+        Index the restored snapshot entries (blocking: run in the executor after the warm start).
+
+        Each entry is parsed outside the lock, so searches keep running on what
+        is indexed so far. An entry removed or replaced meanwhile is skipped.
+
+        Returns:
+            Number of entries indexed
+        """
+        indexed = 0
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return indexed
+                course_id, (value, timestamp) = next(iter(self._pending.items()))
+            try:
+                documents = self._documents(_roadmap_data(value))
+            except Exception as e:
+                logger.warning("Could not index roadmap %s: %s", course_id, e)
+                documents = None
+            with self._lock:
+                if self._pending.get(course_id, (None,))[0] is not value:
+                    continue
+                del self._pending[course_id]
+                if documents is not None:
+                    self._insert(course_id, documents, timestamp)
+                    indexed += 1
+
+    def remove(self, course_id: str) -> None:
+        with self._lock:
+            self._remove(course_id)
+            self._pending.pop(course_id, None)
+
+    def _remove(self, course_id: str) -> None:
+        entry = self._courses.pop(course_id, None)
+        if entry is None:
+            return
+        for i in range(len(entry["topics"])):
+            self._total_length -= self._doc_lengths.pop((course_id, i), 0)
+        for term in entry["terms"]:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            for i in range(len(entry["topics"])):
+                postings.pop((course_id, i), None)
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, limit: int = 10, topics_per_course: int = 3) -> list[dict]:
+        """
+        Roadmaps matching the query, best first.
+
+        A course scores as its best-matching topic; up to topics_per_course
+        matching topics are returned with it.
+
+        Returns:
+            List of {"courseId", "course", "score", "topics": [{"id", "topic", "description", "score"}]}
+        """
+        terms = set(tokenize(query))
+        now = time.time()
+        with self._lock:
+            documents = len(self._doc_lengths)
+            if not terms or not documents:
+                return []
+            average_length = self._total_length / documents
+            scores: dict[tuple[str, int], float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+                norm = self.k1 * (1 - self.b)
+                scale = self.k1 * self.b / average_length
+                for doc, frequency in postings.items():
+                    length = self._doc_lengths[doc]
+                    scores[doc] += idf * frequency * (self.k1 + 1) / (frequency + norm + scale * length)
+
+            by_course: dict[str, list[tuple[float, int]]] = defaultdict(list)
+            for (course_id, i), score in scores.items():
+                by_course[course_id].append((score, i))
+
+            results = []
+            for course_id, hits in by_course.items():
+                entry = self._courses[course_id]
+                if now - entry["timestamp"] > settings.CACHE_TTL:
+                    continue  # Expired in the cache, not read since
+                hits.sort(reverse=True)
+                results.append({
+                    "courseId": course_id,
+                    "course": entry["course"],
+                    "score": round(hits[0][0], 4),
+                    "topics": [
+                        {
+                            "id": entry["topics"][i][0],
+                            "topic": entry["topics"][i][1],
+                            "description": entry["topics"][i][2],
+                            "score": round(score, 4),
+                        }
+                        for score, i in hits[:topics_per_course]
+                    ],
+                })
+        results.sort(key=lambda result: -result["score"])
+        return results[:limit]
+
+    def __len__(self) -> int:
+        return len(self._courses) + len(self._pending)
+
+
+# Global index over roadmap_cache
+roadmap_index = RoadmapIndex()
+ROADMAPS_INDEXED.set_function(lambda: len(roadmap_index))
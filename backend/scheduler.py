@@ -0,0 +1,134 @@
+"""
+Generation scheduler for FuckPaidCourses backend.
+
+Cache hits never enter the scheduler: they are answered straight from memory
+on the event loop (the fast lane). Cache misses need a generation slot; at
+most `max_running` pipelines run at once, so they cannot take every executor
+thread and loop cycle away from hits. Misses beyond that wait in a bounded
+queue served round-robin across clients, so one client submitting many URLs
+cannot starve everyone else. Queued requests whose client disconnects are
+dropped before they make any upstream call.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional
+
+from metrics import registry, STAGE_SECONDS
+from tracing import span
+
+
+GENERATION_QUEUE_DEPTH = registry.gauge(
+    "fpc_generation_queue_depth",
+    "Cache misses waiting for a generation slot",
+)
+GENERATION_DROPPED = registry.counter(
+    "fpc_generation_dropped_total",
+    "Queued generation requests dropped before running",
+    ("reason",),
+)
+
+
+class QueueFull(Exception):
+    """Raised when the generation queue is at capacity."""
+
+
+class ClientDisconnected(Exception):
+    """Raised when a queued request's client went away."""
+
+
+class GenerationScheduler:
+    """Bounded, per-client fair queue in front of the roadmap pipeline (event loop only)."""
+
+    def __init__(self, max_running: int, max_queued: int, poll_interval: float = 1.0):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+        self.running = 0
+        self.queued = 0
+        # client -> waiters; dict order is the round-robin order
+        self._queues: OrderedDict[str, deque] = OrderedDict()
+        GENERATION_QUEUE_DEPTH.set_function(lambda: self.queued)
+
+    def _slot_free(self) -> bool:
+        return not self.max_running or self.running < self.max_running
+
+    def has_capacity(self) -> bool:
+        """True if a new request would run now or fit in the queue."""
+        return (self._slot_free() and not self.queued) or self.queued < self.max_queued
+
+    @asynccontextmanager
+    async def slot(self, client: str, is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None):
+        """
+        Hold a generation slot for the body of the block.
+
+        Raises:
+            QueueFull: no slot is free and the queue is full
+            ClientDisconnected: is_disconnected() turned true while queued
+        """
+        await self._acquire(client, is_disconnected)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, client: str, is_disconnected) -> None:
+        if self._slot_free() and not self.queued:
+            self.running += 1
+            return
+        if self.queued >= self.max_queued:
+            GENERATION_DROPPED.labels("queue_full").inc()
+            raise QueueFull(f"Generation queue is full ({self.queued} waiting)")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append(waiter)
+        self.queued += 1
+        start = time.perf_counter()
+        try:
+            with span("queue", client=client, position=self.queued):
+                while not waiter.done():
+                    await asyncio.wait((waiter,), timeout=self.poll_interval)
+                    if not waiter.done() and is_disconnected and await is_disconnected():
+                        raise ClientDisconnected()
+                # Last check before the slot is spent on upstream calls
+                if is_disconnected and await is_disconnected():
+                    raise ClientDisconnected()
+        except BaseException as e:
+            if waiter.done():
+                self._release()  # The slot was already handed to us; pass it on
+            else:
+                self._remove(client, waiter)
+            if isinstance(e, ClientDisconnected):
+                GENERATION_DROPPED.labels("disconnected").inc()
+            raise
+        finally:
+            STAGE_SECONDS.labels("queue").observe(time.perf_counter() - start)
+
+    def _remove(self, client: str, waiter: asyncio.Future) -> None:
+        queue = self._queues.get(client)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+            self.queued -= 1
+        except ValueError:
+            pass
+        if not queue:
+            del self._queues[client]
+
+    def _release(self) -> None:
+        """Hand the slot to the next client in round-robin order, or free it."""
+        while self._queues:
+            client, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            if not waiter.done():
+                waiter.set_result(None)  # running count carries over to the waiter
+                return
+        self.running -= 1
@@ -0,0 +1,346 @@
+"""
+Record/replay cassettes for upstream API responses.
+
+In record mode the real clients of the four services are wrapped so every
+upstream response (or error) is appended, with its latency, to a gzipped JSON
+lines cassette per upstream (one gzip stream per file, flushed after each line). Incoming roadmap requests are logged next to them
+with their arrival time. In replay mode the wrappers serve the recorded
+responses instead of calling out, sleeping for the recorded latency first, so
+a recorded day of traffic can be replayed offline (see loadtest.py --replay).
+
+Cassette line: {"k": request key, "t": wall time, "latency": seconds,
+"trace": trace id, "response": body} or {..., "error": {"type", "message", "status"}}
+
+Gemini calls are keyed on the model and the untruncated course content, not
+the final prompt: the prompt is cut to a length that depends on load at the
+time (see LLMService.route()), which would make replays under other load miss.
+"""
+
+import atexit
+import collections
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+
+from config import settings
+from logger import logger
+from tracing import current_span
+
+
+REQUEST_LOG = "requests.jsonl.gz"
+
+# Course content and title behind the Gemini call being made (set by LLMService)
+_gemini_source: contextvars.ContextVar = contextvars.ContextVar("cassette_gemini_source", default=None)
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+class ReplayedUpstreamError(Exception):
+    """A recorded upstream failure, re-raised on replay."""
+
+    def __init__(self, error: dict):
+        super().__init__(error.get("message") or error.get("type", "upstream error"))
+        self.error_type = error.get("type")
+        self.code = error.get("status")
+        self.status_code = error.get("status")
+
+
+def request_key(request) -> str:
+    """Stable short key for a JSON-serializable request description."""
+    raw = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+@contextmanager
+def gemini_source(content: str, course_title: str = ""):
+    """Key Gemini calls made inside the block on this content instead of the prompt."""
+    token = _gemini_source.set({"title": course_title, "content": content})
+    try:
+        yield
+    finally:
+        _gemini_source.reset(token)
+
+
+def read_records(path: str):
+    """JSON records of a gzipped JSON lines file; a file cut off mid-stream (no gzip trailer) yields what it has."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+        except EOFError:
+            return  # Recording process stopped without closing the stream
+
+
+def _error_status(exc: BaseException):
+    for value in (
+        getattr(getattr(exc, "response", None), "status_code", None),
+        getattr(getattr(exc, "resp", None), "status", None),
+        getattr(exc, "code", None),
+        getattr(exc, "status_code", None),
+    ):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+class CassetteStore:
+    """Append-only cassettes (one file per upstream) with replay lookup."""
+
+    def __init__(self, directory: str, latency_scale: float = 1.0):
+        self.directory = directory
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._tapes: dict[str, dict[str, list]] = {}
+        self._cursors: collections.Counter = collections.Counter()
+        # path -> open gzip text stream, one per cassette while recording
+        self._streams: dict = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.jsonl.gz")
+
+    def _append(self, path: str, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            stream = self._streams.get(path)
+            if stream is None:
+                os.makedirs(self.directory, exist_ok=True)
+                # A new gzip member after any earlier run's; gzip readers concatenate them
+                stream = self._streams[path] = gzip.open(path, "at", encoding="utf-8")
+            stream.write(line)
+            stream.flush()  # Sync flush: recorded lines are readable before close()
+
+    def close(self) -> None:
+        """Finish the open cassette streams (gzip trailers)."""
+        with self._lock:
+            for stream in self._streams.values():
+                try:
+                    stream.close()
+                except OSError as e:
+                    logger.warning("Cassette close failed: %s", e)
+            self._streams.clear()
+
+    def record(self, upstream: str, key: str, latency: float, response=None, error: BaseException = None) -> None:
+        """Append one upstream call to the upstream's cassette."""
+        record = {"k": key, "t": time.time(), "latency": round(latency, 4)}
+        active = current_span()
+        if active is not None:
+            record["trace"] = active.trace_id
+        if error is not None:
+            record["error"] = {"type": type(error).__name__, "message": str(error), "status": _error_status(error)}
+        else:
+            record["response"] = response
+        try:
+            self._append(self._path(upstream), record)
+        except OSError as e:
+            logger.warning("Cassette write failed for %s: %s", upstream, e)
+
+    def record_request(self, url: str) -> None:
+        """Log an incoming roadmap request for traffic replay."""
+        try:
+            self._append(os.path.join(self.directory, REQUEST_LOG), {"t": time.time(), "url": url})
+        except OSError as e:
+            logger.warning("Cassette request log write failed: %s", e)
+
+    def _tape(self, upstream: str) -> dict[str, list]:
+        tape = self._tapes.get(upstream)
+        if tape is None:
+            tape = collections.defaultdict(list)
+            path = self._path(upstream)
+            if os.path.exists(path):
+                for record in read_records(path):
+                    tape[record["k"]].append(record)
+            self._tapes[upstream] = tape
+            logger.info("📼 Loaded %d recorded %s requests", len(tape), upstream)
+        return tape
+
+    def replay(self, upstream: str, key: str):
+        """
+        Serve a recorded call: sleep for its latency, then return or raise.
+
+        Requests recorded several times are replayed in recorded order, cycling.
+        """
+        with self._lock:
+            records = self._tape(upstream).get(key)
+            if not records:
+                raise CassetteMiss(f"No recorded {upstream} response for request {key}")
+            index = self._cursors[(upstream, key)]
+            self._cursors[(upstream, key)] += 1
+            record = records[index % len(records)]
+
+        time.sleep(record.get("latency", 0) * self.latency_scale)
+        if "error" in record:
+            raise ReplayedUpstreamError(record["error"])
+        return record["response"]
+
+    def call(self, mode: str, upstream: str, request, fetch, encode=lambda r: r, decode=lambda r: r):
+        """Run fetch() through the cassette according to mode ("record" or "replay")."""
+        key = request_key(request)
+        if mode == "replay":
+            return decode(self.replay(upstream, key))
+
+        start = time.perf_counter()
+        try:
+            result = fetch()
+        except Exception as e:
+            self.record(upstream, key, time.perf_counter() - start, error=e)
+            raise
+        self.record(upstream, key, time.perf_counter() - start, response=encode(result))
+        return result
+
+
+class _CassetteClient:
+    def __init__(self, store: CassetteStore, mode: str, inner=None):
+        self.store = store
+        self.mode = mode
+        self.inner = inner
+
+
+class CassetteFirecrawlClient(_CassetteClient):
+    """Wraps FirecrawlApp.scrape_url()."""
+
+    def scrape_url(self, url: str, params: dict = None) -> dict:
+        return self.store.call(
+            self.mode, "firecrawl", {"url": url, "params": params},
+            lambda: self.inner.scrape_url(url, params=params),
+        )
+
+
+class _ReplayedGenerateResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.parsed = None  # LLMService falls back to parsing .text
+
+
+class _CassetteModels(_CassetteClient):
+    def generate_content(self, model: str, contents: str, config: dict = None):
+        # The schema class in config is not serializable; model and course content identify the call
+        source = _gemini_source.get()
+        request = {"model": model, "source": source} if source is not None else {"model": model, "contents": contents}
+        return self.store.call(
+            self.mode, "gemini", request,
+            lambda: self.inner.models.generate_content(model=model, contents=contents, config=config),
+            encode=lambda response: {"text": response.text},
+            decode=lambda body: _ReplayedGenerateResponse(body["text"]),
+        )
+
+
+class CassetteGenaiClient:
+    """Wraps google.genai.Client().models.generate_content()."""
+
+    def __init__(self, store: CassetteStore, mode: str, inner=None):
+        self.models = _CassetteModels(store, mode, inner)
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """httpx transport recording or replaying Serper responses (status and JSON body)."""
+
+    def __init__(self, store: CassetteStore, mode: str, inner: httpx.BaseTransport = None):
+        self.store = store
+        self.mode = mode
+        self.inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content or b"null")
+
+        def fetch() -> dict:
+            response = self.inner.handle_request(request)
+            response.read()
+            return {"status": response.status_code, "json": response.json() if response.content else None}
+
+        recorded = self.store.call(self.mode, "serper", {"path": request.url.path, "body": body}, fetch)
+        return httpx.Response(recorded["status"], json=recorded["json"], request=request)
+
+
+class _CassetteVideosRequest:
+    def __init__(self, client: "CassetteYouTubeClient", id: str, part: str):
+        self.client = client
+        self.id = id
+        self.part = part
+
+    def execute(self) -> dict:
+        client = self.client
+
+        def fetch() -> dict:
+            with client.inner as youtube:
+                return youtube.videos().list(id=self.id, part=self.part).execute()
+
+        return client.store.call(client.mode, "youtube", {"id": self.id, "part": self.part}, fetch)
+
+
+class CassetteYouTubeClient(_CassetteClient):
+    """Wraps the YouTube resource used by YouTubeService._fetch_video_details()."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def videos(self):
+        return self
+
+    def list(self, id: str, part: str = ""):
+        return _CassetteVideosRequest(self, id, part)
+
+
+cassette_store = None
+
+
+def install_cassettes(mode: str, directory: str, latency_scale: float = 1.0) -> CassetteStore:
+    """
+    Wrap the clients of all four service singletons for record or replay.
+
+    Returns:
+        The CassetteStore in use (also kept as cassette_store)
+    """
+    global cassette_store
+    from services.scraper import scraper_service
+    from services.llm import llm_service
+    from services.search import search_service
+    from services.youtube import youtube_service
+
+    if mode not in ("record", "replay"):
+        raise ValueError(f"Unknown cassette mode: {mode}")
+    store = CassetteStore(directory, latency_scale)
+
+    if mode == "replay":
+        # Keys only need to be non-empty so settings.validate() passes
+        for key in ("FIRECRAWL_API_KEY", "GEMINI_API_KEY", "SERPER_API_KEY", "YOUTUBE_API_KEY"):
+            setattr(settings, key, getattr(settings, key) or "replay")
+        for service in (scraper_service, llm_service, search_service, youtube_service):
+            if not service.key_pool:
+                service.key_pool.set_keys(["replay-key"])
+        inner_transport = None
+    else:
+        inner_transport = search_service.http._transport
+
+    def wrap(pool, cassette_client):
+        # Recording wraps the real per-key client; replay never calls out
+        factory = pool.client_factory
+        pool.set_client_factory(
+            lambda key: cassette_client(store, mode, factory(key) if mode == "record" else None)
+        )
+
+    wrap(scraper_service.key_pool, CassetteFirecrawlClient)
+    wrap(llm_service.key_pool, CassetteGenaiClient)
+    wrap(youtube_service.key_pool, CassetteYouTubeClient)
+    search_service.http = httpx.Client(
+        timeout=search_service.http.timeout,
+        transport=CassetteTransport(store, mode, inner_transport),
+    )
+
+    cassette_store = store
+    atexit.register(store.close)
+    return store
@@ -0,0 +1,308 @@
+"""
+Offline stand-ins for the upstream APIs (Firecrawl, Gemini, Serper, YouTube).
+
+install_fakes() swaps fake clients into the service singletons so the whole
+pipeline runs without network access or quota. Each upstream has a latency
+distribution (log-normal around a median) and error rates for 503s, 429s and
+timeouts. Payloads are deterministic per input and shaped like the real APIs.
+"""
+
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+import httpx
+
+from config import settings
+
+
+@dataclass
+class UpstreamProfile:
+    """Latency and failure behaviour of one fake upstream."""
+    median_latency: float
+    sigma: float = 0.4
+    error_503: float = 0.0
+    error_429: float = 0.0
+    timeout: float = 0.0
+    timeout_after: float = 15.0
+    not_found: float = 0.0  # Share of inputs that always answer 404 (decided per input)
+    invalid_output: float = 0.0  # Share of LLM answers that are malformed (decided per model and prompt)
+
+
+# Defaults loosely based on production timings
+DEFAULT_PROFILES = {
+    "firecrawl": UpstreamProfile(
+        median_latency=2.5, sigma=0.5, error_503=0.01, timeout=0.01, timeout_after=30.0, not_found=0.02,
+    ),
+    "gemini": UpstreamProfile(median_latency=3.0, sigma=0.4, error_503=0.03, error_429=0.01, invalid_output=0.03),
+    "serper": UpstreamProfile(median_latency=0.6, sigma=0.3, error_429=0.005),
+    "youtube": UpstreamProfile(median_latency=0.25, sigma=0.3, error_503=0.005),
+}
+
+TOPIC_WORDS = [
+    "Fundamentals", "Setup & Tooling", "Core Syntax", "Data Structures", "Functions",
+    "Object-Oriented Design", "Error Handling", "Testing", "Async Programming",
+    "Working with APIs", "Databases", "Deployment", "Performance Tuning", "Security Basics",
+    "Final Project",
+]
+
+DOC_DOMAINS = [
+    "docs.python.org", "developer.mozilla.org", "realpython.com", "freecodecamp.org",
+    "geeksforgeeks.org", "medium.com", "stackoverflow.com", "udemy.com", "w3schools.com",
+    "learn.microsoft.com", "dev.to", "amazon.com",
+]
+
+
+class FakeUpstreamError(Exception):
+    """Error raised by fake SDK clients, shaped like the real SDK errors."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status} {message}")
+        self.code = status
+        self.status_code = status
+
+
+class FakeUpstream:
+    """Shared latency/error simulation for one upstream."""
+
+    def __init__(self, name: str, profile: UpstreamProfile, seed: int = None):
+        self.name = name
+        self.profile = profile
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def simulate(self) -> int:
+        """
+        Sleep for a sampled latency and return an HTTP status to respond with.
+
+        Returns 200, 503 or 429, or 0 for a timeout (after sleeping timeout_after).
+        """
+        profile = self.profile
+        with self._lock:
+            self.calls += 1
+            roll = self._rng.random()
+            latency = profile.median_latency * math.exp(self._rng.gauss(0, profile.sigma))
+        latency *= settings.FAKE_LATENCY_SCALE
+
+        if roll < profile.timeout:
+            time.sleep(profile.timeout_after * settings.FAKE_LATENCY_SCALE)
+            return 0
+        time.sleep(latency)
+        roll -= profile.timeout
+        if roll < profile.error_503:
+            return 503
+        if roll - profile.error_503 < profile.error_429:
+            return 429
+        return 200
+
+    def check(self) -> None:
+        """simulate() for SDK-style clients: raise on failure."""
+        status = self.simulate()
+        if status == 0:
+            raise TimeoutError(f"{self.name} request timed out")
+        if status == 503:
+            raise FakeUpstreamError(503, "Service Unavailable")
+        if status == 429:
+            raise FakeUpstreamError(429, "Too Many Requests / quota exceeded")
+
+
+def _seeded(text: str) -> random.Random:
+    """Deterministic RNG per input, so the same course always gives the same payload."""
+    return random.Random(int(hashlib.md5(text.encode()).hexdigest()[:8], 16))
+
+
+def _slug_title(url: str) -> str:
+    path = [p for p in url.split("?")[0].split("/") if p]
+    slug = path[-1] if len(path) > 2 else "course"
+    return slug.replace("-", " ").replace("_", " ").title() or "Course"
+
+
+class FakeFirecrawlClient:
+    """Mimics FirecrawlApp.scrape_url()."""
+
+    def __init__(self, upstream: FakeUpstream):
+        self.upstream = upstream
+
+    def scrape_url(self, url: str, params: dict = None) -> dict:
+        self.upstream.check()
+        if _seeded("404:" + url).random() < self.upstream.profile.not_found:
+            raise FakeUpstreamError(404, "Not Found")
+        # Curriculum follows the slug (mirrors of a course match), stats follow the URL
+        stats = _seeded(url)
+        title = _slug_title(url)
+        rng = _seeded(title)
+        sections = rng.sample(TOPIC_WORDS, rng.randint(6, 12))
+        lines = [f"# {title}", "", f"{stats.randint(1000, 90000)} students · Rated {stats.uniform(3.8, 4.9):.1f}", ""]
+        for i, section in enumerate(sections, 1):
+            lines.append(f"## Section {i}: {section}")
+            for j in range(rng.randint(3, 8)):
+                lines.append(f"- Lecture {i}.{j + 1}: {section} part {j + 1} ({rng.randint(3, 25)}:00)")
+            lines.append("")
+        return {"markdown": "\n".join(lines), "metadata": {"title": f"{title} | Udemy"}}
+
+
+class _FakeGenerateResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.parsed = None  # Exercise the JSON text path
+
+
+class _FakeModels:
+    def __init__(self, upstream: FakeUpstream):
+        self.upstream = upstream
+
+    def generate_content(self, model: str, contents: str, config: dict = None):
+        self.upstream.check()
+        match = re.search(r"^Course Title: (.+)$", contents, re.MULTILINE)
+        title = match.group(1) if match else "Course"
+        sections = re.findall(r"^## Section \d+: (.+)$", contents, re.MULTILINE) or TOPIC_WORDS[:5]
+        rng = _seeded(contents)
+        topics = [
+            {
+                "topic": f"{section} in {title}"[:60],
+                "description": f"Learn {section.lower()} as covered in {title}.",
+                "estimatedHours": round(rng.uniform(1, 6), 1),
+            }
+            for section in sections[:15]
+        ]
+        text = json.dumps({"topics": topics})
+        if _seeded(f"invalid:{model}:{contents}").random() < self.upstream.profile.invalid_output:
+            text = text[:len(text) // 2]  # Cut off mid-answer
+        # Like the real API, stop at the output budget (~4 chars per token)
+        max_tokens = (config or {}).get("max_output_tokens")
+        if max_tokens:
+            text = text[:max_tokens * 4]
+        return _FakeGenerateResponse(text)
+
+
+class FakeGenaiClient:
+    """Mimics google.genai.Client().models.generate_content()."""
+
+    def __init__(self, upstream: FakeUpstream):
+        self.models = _FakeModels(upstream)
+
+
+def _video_id(rng: random.Random) -> str:
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-"
+    return "".join(rng.choice(alphabet) for _ in range(11))
+
+
+def fake_serper_transport(upstream: FakeUpstream) -> httpx.MockTransport:
+    """httpx transport answering Serper /search requests (organic and videos)."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status = upstream.simulate()
+        if status == 0:
+            raise httpx.ReadTimeout("Serper request timed out", request=request)
+        if status != 200:
+            return httpx.Response(status, json={"message": "fake upstream error"})
+
+        payload = json.loads(request.content)
+        query = payload.get("q", "")
+        rng = _seeded(query)
+        if payload.get("type") == "videos":
+            videos = [
+                {
+                    "title": f"{query.replace('site:youtube.com ', '')} #{i + 1}",
+                    "link": f"https://www.youtube.com/watch?v={_video_id(rng)}",
+                    "imageUrl": "https://i.ytimg.com/vi/placeholder/hqdefault.jpg",
+                    "source": "YouTube",
+                    "duration": f"{rng.randint(5, 90)}:{rng.randint(0, 59):02d}",
+                }
+                for i in range(payload.get("num", 10))
+            ]
+            return httpx.Response(200, json={"videos": videos})
+
+        organic = []
+        for i in range(payload.get("num", 10)):
+            domain = rng.choice(DOC_DOMAINS)
+            organic.append({
+                "title": f"{query} - {domain}",
+                "link": f"https://{domain}/{'tutorial' if rng.random() < 0.3 else 'article'}/{i}",
+                "snippet": f"A practical explanation of {query} with examples. " * 3,
+                "position": i + 1,
+            })
+        return httpx.Response(200, json={"organic": organic})
+
+    return httpx.MockTransport(handler)
+
+
+class _FakeVideosRequest:
+    def __init__(self, upstream: FakeUpstream, ids: str):
+        self.upstream = upstream
+        self.ids = [i for i in ids.split(",") if i]
+
+    def execute(self) -> dict:
+        status = self.upstream.simulate()
+        if status == 0:
+            raise TimeoutError("YouTube request timed out")
+        if status != 200:
+            raise FakeUpstreamError(status, "YouTube API error")
+        items = []
+        for vid in self.ids:
+            rng = _seeded(vid)
+            items.append({
+                "id": vid,
+                "snippet": {
+                    "title": f"Tutorial {vid}",
+                    "channelTitle": rng.choice(["freeCodeCamp.org", "Corey Schafer", "Traversy Media", "Fireship"]),
+                    "thumbnails": {"high": {"url": f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"}},
+                },
+                "contentDetails": {"duration": f"PT{rng.randint(0, 3)}H{rng.randint(0, 59)}M{rng.randint(0, 59)}S"},
+                "statistics": {"viewCount": str(int(10 ** rng.uniform(3, 7)))},
+            })
+        return {"items": items}
+
+
+class FakeYouTubeClient:
+    """Mimics the googleapiclient YouTube resource used by YouTubeService."""
+
+    def __init__(self, upstream: FakeUpstream):
+        self.upstream = upstream
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def videos(self):
+        return self
+
+    def list(self, id: str, part: str = ""):
+        return _FakeVideosRequest(self.upstream, id)
+
+
+def install_fakes(profiles: dict[str, UpstreamProfile] = None, seed: int = None) -> dict[str, FakeUpstream]:
+    """
+    Point all four service singletons at fake upstreams.
+
+    Returns:
+        The FakeUpstream objects by name (for call counts or tweaking profiles)
+    """
+    from services.scraper import scraper_service
+    from services.llm import llm_service
+    from services.search import search_service
+    from services.youtube import youtube_service
+
+    profiles = {**DEFAULT_PROFILES, **(profiles or {})}
+    upstreams = {name: FakeUpstream(name, profile, seed) for name, profile in profiles.items()}
+
+    # Keys only need to be non-empty so settings.validate() passes
+    for key in ("FIRECRAWL_API_KEY", "GEMINI_API_KEY", "SERPER_API_KEY", "YOUTUBE_API_KEY"):
+        setattr(settings, key, getattr(settings, key) or "fake")
+    for service in (scraper_service, llm_service, search_service, youtube_service):
+        if not service.key_pool:
+            service.key_pool.set_keys(["fake-key"])
+
+    scraper_service.key_pool.set_client_factory(lambda key: FakeFirecrawlClient(upstreams["firecrawl"]))
+    llm_service.key_pool.set_client_factory(lambda key: FakeGenaiClient(upstreams["gemini"]))
+    search_service.http = httpx.Client(transport=fake_serper_transport(upstreams["serper"]))
+    youtube_service.key_pool.set_client_factory(lambda key: FakeYouTubeClient(upstreams["youtube"]))
+    return upstreams
@@ -4,9 +4,52 @@ Extracts structured topics from course content with Pydantic schemas.
 """
 
 import json
-from google import genai
+import time
+from dataclasses import dataclass
+from typing import Optional
 from pydantic import BaseModel, Field
 from config import settings
+from keypool import KeyPool, Quota, parse_keys, quota_status
+from logger import logger
+from metrics import registry, track_upstream
+from services import cassettes
+from tracing import span
+
+
+LLM_ROUTES = registry.counter(
+    "fpc_llm_routes_total",
+    "Gemini calls by model and routing reason (small, standard, pressure, escalated)",
+    ("model", "reason"),
+)
+LLM_INVALID_OUTPUTS = registry.counter(
+    "fpc_llm_invalid_outputs_total",
+    "Gemini answers that failed structured-output validation",
+    ("model", "reason"),
+)
+
+
+def _genai_client(key: str):
+    """Gemini client for one key; the SDK (slow to import) loads on first use."""
+    from google import genai
+    return genai.Client(api_key=key)
+
+
+class InvalidTopics(ValueError):
+    """A Gemini answer that is not a usable topic list."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(f"{reason}: {message}")
+        self.reason = reason
+
+
+@dataclass(frozen=True)
+class Route:
+    """Model and limits for one extraction attempt."""
+    tier: int
+    model: str
+    max_output_tokens: int
+    content_chars: int
+    reason: str
 
 
 class TopicItem(BaseModel):
@@ -24,12 +67,15 @@ class TopicList(BaseModel):
 class LLMService:
     """Service for processing content using Google Gemini with structured output."""
     
+    # Most topics the extraction prompt asks for (sizes the small route's answer budget)
+    MAX_TOPICS = 15
+    
     # System prompt for topic extraction
-    EXTRACTION_PROMPT = """You are an expert at analyzing online course curricula. 
+    EXTRACTION_PROMPT = f"""You are an expert at analyzing online course curricula. 
 Given the markdown content of a course page, extract the main topics/modules that the course covers.
 
 Rules:
-- Extract 5-15 topics maximum (combine very small topics, split very large ones)
+- Extract 5-{MAX_TOPICS} topics maximum (combine very small topics, split very large ones)
 - Order topics logically (prerequisites before advanced topics)
 - Keep topic names beginner-friendly and concise (3-8 words)
 - If the content seems incomplete or unclear, make reasonable inferences based on the course title
@@ -40,79 +86,147 @@ Course content to analyze:
 """
 
     def __init__(self):
-        if settings.GEMINI_API_KEY:
-            self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
-        else:
-            self.client = None
+        self.key_pool = KeyPool(
+            "gemini",
+            parse_keys(settings.GEMINI_API_KEY),
+            [
+                Quota("requests", settings.GEMINI_RPM_PER_KEY, 60),
+                Quota("tokens", settings.GEMINI_TPM_PER_KEY, 60),
+            ],
+            client_factory=_genai_client,
+        )
+        # Models from cheapest to heaviest; the next one is tried when an answer fails validation
+        self.models = [m.strip() for m in settings.GEMINI_MODELS.split(",") if m.strip()]
+        # Smoothed Gemini call latency (seconds)
+        self.latency = 0.0
+        # Optional TokenBucket, set by batch jobs to stay within Gemini RPM
+        self.rate_limiter = None
     
-    def extract_topics(self, content: str, course_title: str = "") -> list[dict]:
+    def route(self, content_chars: int) -> Route:
+        """
+        Pick the model and output limits for a first attempt.
+        
+        Always the cheapest tier; input size sets the answer budget, and when
+        Gemini is slow or the keys are low on quota the content is cut shorter
+        (fewer input tokens) and failed answers aren't escalated.
+        """
+        pressure = (
+            self.key_pool.headroom() < settings.GEMINI_LOW_QUOTA_HEADROOM
+            or (settings.GEMINI_SLOW_SECONDS and self.latency > settings.GEMINI_SLOW_SECONDS)
+        )
+        if pressure:
+            return Route(0, self.models[0], settings.GEMINI_MAX_OUTPUT_TOKENS, settings.GEMINI_PRESSURE_CONTENT_CHARS, "pressure")
+        if content_chars <= settings.GEMINI_SMALL_INPUT_CHARS:
+            small_tokens = self.MAX_TOPICS * settings.GEMINI_TOKENS_PER_TOPIC
+            return Route(0, self.models[0], small_tokens, settings.GEMINI_MAX_CONTENT_CHARS, "small")
+        return Route(0, self.models[0], settings.GEMINI_MAX_OUTPUT_TOKENS, settings.GEMINI_MAX_CONTENT_CHARS, "standard")
+    
+    def escalate(self, route: Route) -> Optional[Route]:
+        """Next heavier model after an answer failed validation (None: no tier left, or under pressure)."""
+        if route.reason == "pressure" or route.tier + 1 >= len(self.models):
+            return None
+        return Route(
+            route.tier + 1,
+            self.models[route.tier + 1],
+            settings.GEMINI_ESCALATED_OUTPUT_TOKENS,
+            route.content_chars,
+            "escalated",
+        )
+    
+    def extract_topics(self, content: str, course_title: str = "", route: Route = None) -> list[dict]:
         """
         Extract structured topics from course content.
         
+        Starts on the cheapest model (see route()); an answer that fails
+        validation is retried on the next heavier model before falling back
+        to generic topics.
+        
         Args:
             content: Markdown content of the course page
             course_title: Optional course title for context
+            route: First route, if the caller already picked it with route()
             
         Returns:
             List of topic dictionaries with 'topic', 'description', 'estimatedHours'
+            (plus 'fallback': True on generic fallback topics)
         """
-        if not self.client:
+        if not self.key_pool:
             raise ValueError("Gemini API key not configured")
         
+        route = route or self.route(len(content))
+        
         # Prepare the prompt
         prompt = self.EXTRACTION_PROMPT
         if course_title:
             prompt += f"\nCourse Title: {course_title}\n\n"
-        prompt += content[:15000]  # Limit content length to avoid token limits
+        prompt += content[:route.content_chars]  # Limit content length to avoid token limits
         
-        try:
-            # Generate response with structured output using new SDK
-            # Using gemini-2.5-flash-lite for better quota availability
-            # Added retry logic for 503 errors
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    response = self.client.models.generate_content(
-                        model='gemini-2.5-flash-lite',
-                        contents=prompt,
-                        config={
-                            'response_mime_type': 'application/json',
-                            'response_schema': TopicList,
-                            'temperature': 0.3,
-                        },
-                    )
-                    break
-                except Exception as e:
-                    if "503" in str(e) and attempt < max_retries - 1:
-                        import time
-                        wait_time = 2 ** attempt  # Exponential backoff: 1s, 2s, 4s...
-                        print(f"Gemini 503 error, retrying in {wait_time}s...")
-                        time.sleep(wait_time)
-                        continue
-                    raise e
-            
-            # Parse the structured response
-            if response.parsed:
-                # response.parsed is a TopicList instance
-                topics = []
-                for item in response.parsed.topics:
-                    topics.append({
-                        "topic": item.topic,
-                        "description": item.description,
-                        "estimatedHours": item.estimatedHours,
-                    })
-                return topics if topics else self._fallback_topics()
-            else:
-                # Fallback to parsing JSON text
-                result = json.loads(response.text)
-                if isinstance(result, dict) and "topics" in result:
-                    topics_list = result["topics"]
-                elif isinstance(result, list):
-                    topics_list = result
-                else:
+        while True:
+            LLM_ROUTES.labels(route.model, route.reason).inc()
+            with cassettes.gemini_source(content, course_title):
+                response = self._generate_with_retries(prompt, route)
+            try:
+                return self._parse_topics(response)
+            except InvalidTopics as e:
+                LLM_INVALID_OUTPUTS.labels(route.model, e.reason).inc()
+                next_route = self.escalate(route)
+                if next_route is None:
+                    logger.warning("Gemini %s answer failed validation (%s), using fallback topics", route.model, e)
                     return self._fallback_topics()
-                
-                topics = []
+                logger.warning("Gemini %s answer failed validation (%s), retrying on %s", route.model, e, next_route.model)
+                route = next_route
+    
+    def _generate_with_retries(self, prompt: str, route: Route):
+        """_generate() with retries on another key (quota errors) or after a backoff (503)."""
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                return self._generate(prompt, route)
+            except Exception as e:
+                # A rate-limited key is cooled off by the pool, so retry at once on another key
+                if quota_status(e) and len(self.key_pool) > 1 and attempt < max_retries - 1:
+                    logger.warning("Gemini key rate limited, retrying with another key...")
+                    continue
+                if "503" in str(e) and attempt < max_retries - 1:
+                    wait_time = 2 ** attempt  # Exponential backoff: 1s, 2s, 4s...
+                    logger.warning("Gemini 503 error, retrying in %ds...", wait_time)
+                    time.sleep(wait_time)
+                    continue
+                logger.error("Gemini API error: %s", e)
+                raise
+    
+    def _parse_topics(self, response) -> list[dict]:
+        """
+        Validate a structured answer into topic dicts.
+        
+        Raises:
+            InvalidTopics: the answer is not JSON, not a topic list, or has no topics
+        """
+        if response.parsed:
+            # response.parsed is a TopicList instance
+            topics = [
+                {
+                    "topic": item.topic,
+                    "description": item.description,
+                    "estimatedHours": item.estimatedHours,
+                }
+                for item in response.parsed.topics
+            ]
+        else:
+            # Fallback to parsing JSON text
+            try:
+                result = json.loads(response.text or "")
+            except json.JSONDecodeError as e:
+                raise InvalidTopics("invalid_json", str(e))
+            if isinstance(result, dict) and "topics" in result:
+                topics_list = result["topics"]
+            elif isinstance(result, list):
+                topics_list = result
+            else:
+                raise InvalidTopics("bad_shape", "no topic list in the answer")
+            
+            topics = []
+            try:
                 for i, item in enumerate(topics_list):
                     if isinstance(item, dict) and "topic" in item:
                         topics.append({
@@ -120,32 +234,61 @@ Course content to analyze:
                             "description": str(item.get("description", "")),
                             "estimatedHours": float(item.get("estimatedHours", 2.0)),
                         })
-                return topics if topics else self._fallback_topics()
-            
-        except json.JSONDecodeError as e:
-            print(f"JSON parse error: {e}")
-            return self._fallback_topics()
-        except Exception as e:
-            print(f"Gemini API error: {e}")
-            raise
+            except (TypeError, ValueError) as e:
+                raise InvalidTopics("bad_shape", str(e))
+        if not topics:
+            raise InvalidTopics("empty", "no topics in the answer")
+        return topics
+    
+    def _generate(self, prompt: str, route: Route):
+        """Call Gemini once with the structured-output config (rate limited and metered)."""
+        with span("gemini.generate", model=route.model, route=route.reason, prompt_chars=len(prompt)):
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            # Reserve an estimate (~4 chars per token plus the answer), corrected from usage metadata
+            estimate = len(prompt) // 4 + route.max_output_tokens
+            with self.key_pool.use(requests=1, tokens=estimate) as lease, track_upstream("gemini"):
+                start = time.perf_counter()
+                try:
+                    response = lease.client.models.generate_content(
+                        model=route.model,
+                        contents=prompt,
+                        config={
+                            'response_mime_type': 'application/json',
+                            'response_schema': TopicList,
+                            'temperature': 0.3,
+                            'max_output_tokens': route.max_output_tokens,
+                        },
+                    )
+                finally:
+                    # Smoothed call latency, read by route(); failures and timeouts count too
+                    self.latency += 0.2 * (time.perf_counter() - start - self.latency)
+                usage = getattr(response, "usage_metadata", None)
+                total = getattr(usage, "total_token_count", None)
+                if total:
+                    lease.charge("tokens", total - estimate)
+                return response
     
     def _fallback_topics(self) -> list[dict]:
-        """Return fallback topics if extraction fails."""
+        """Return fallback topics if extraction fails (marked, so their roadmap is never cached)."""
         return [
             {
                 "topic": "Introduction & Setup",
                 "description": "Getting started with the fundamentals",
                 "estimatedHours": 1.0,
+                "fallback": True,
             },
             {
                 "topic": "Core Concepts",
                 "description": "Understanding the main principles",
                 "estimatedHours": 3.0,
+                "fallback": True,
             },
             {
                 "topic": "Practical Application",
                 "description": "Hands-on practice and projects",
                 "estimatedHours": 4.0,
+                "fallback": True,
             },
         ]
 
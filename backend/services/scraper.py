@@ -3,10 +3,20 @@ Firecrawl scraper service.
 Scrapes course pages and extracts curriculum content.
 """
 
+import ipaddress
 import re
 from typing import Optional
-from firecrawl import FirecrawlApp
+from urllib.parse import urlsplit
 from config import settings
+from keypool import KeyPool, NoKeyAvailable, Quota, parse_keys
+from metrics import track_upstream, error_code
+from tracing import span
+
+
+def _firecrawl_client(key: str):
+    """Firecrawl client for one key; the SDK loads on first use."""
+    from firecrawl import FirecrawlApp
+    return FirecrawlApp(api_key=key)
 
 
 class ScraperService:
@@ -23,44 +33,116 @@ class ScraperService:
         "udacity": r"udacity\.com",
     }
     
+    # Compiled once; dict order decides ties
+    _PLATFORM_REGEXES = [(name.capitalize(), re.compile(pattern)) for name, pattern in PLATFORM_PATTERNS.items()]
+    
+    # Course pages on the known platforms; other pages there are home, search or profile pages
+    COURSE_PATH_PATTERNS = {
+        "Udemy": re.compile(r"^/course/[^/]+"),
+        "Coursera": re.compile(r"^/(learn|specializations|professional-certificates|projects)/[^/]+"),
+        "Skillshare": re.compile(r"/classes/[^/]+"),
+        "Pluralsight": re.compile(r"^/(library/)?(courses|paths)/[^/]+"),
+        "Linkedin": re.compile(r"^/learning/[^/]+"),
+        "Udacity": re.compile(r"^/course/[^/]+"),
+    }
+    
+    # Hosts that never serve course pages
+    NON_COURSE_HOSTS = {
+        "google.com", "youtube.com", "youtu.be", "facebook.com", "instagram.com",
+        "twitter.com", "x.com", "tiktok.com", "reddit.com", "wikipedia.org",
+    }
+    
+    # File types that are not course pages
+    NON_COURSE_EXTENSIONS = (
+        ".pdf", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".mp3", ".mp4",
+        ".zip", ".gz", ".exe", ".dmg", ".css", ".js", ".json", ".xml", ".txt",
+    )
+    
+    # Firecrawl statuses that will not change on retry (the page is gone or unscrapable)
+    PERMANENT_FAILURE_STATUSES = {"400", "404", "410", "422"}
+    
+    # Pages with less markdown than this have no curriculum to extract. They are usually
+    # bot walls, consent pages or partial renders, so the failure counts as transient
+    MIN_CONTENT_CHARS = 100
+    
     def __init__(self):
-        if settings.FIRECRAWL_API_KEY:
-            self.client = FirecrawlApp(api_key=settings.FIRECRAWL_API_KEY)
-        else:
-            self.client = None
+        self.key_pool = KeyPool(
+            "firecrawl",
+            parse_keys(settings.FIRECRAWL_API_KEY),
+            [Quota("credits", settings.FIRECRAWL_CREDITS_PER_KEY)],
+            client_factory=_firecrawl_client,
+        )
+        # Optional TokenBucket, set by batch jobs to stay within Firecrawl limits
+        self.rate_limiter = None
     
     def detect_platform(self, url: str) -> str:
         """Detect which platform the course URL belongs to."""
         url_lower = url.lower()
-        for platform, pattern in self.PLATFORM_PATTERNS.items():
-            if re.search(pattern, url_lower):
-                return platform.capitalize()
+        for platform, regex in self._PLATFORM_REGEXES:
+            if regex.search(url_lower):
+                return platform
         return "Unknown"
     
+    def non_course_reason(self, url: str) -> Optional[str]:
+        """
+        Cheap pre-check run before any upstream call.
+        
+        Returns:
+            Why the URL is obviously not a course page, or None if it may be one
+        """
+        parts = urlsplit(url.strip())
+        host = (parts.hostname or "").lower()
+        if host.startswith("www."):
+            host = host[4:]
+        if not host or "." not in host or host == "localhost":
+            return "URL has no public host"
+        try:
+            ipaddress.ip_address(host)
+            return "URL points to an IP address, not a course site"
+        except ValueError:
+            pass
+        if host in self.NON_COURSE_HOSTS or any(host.endswith("." + h) for h in self.NON_COURSE_HOSTS):
+            return f"{host} does not host courses"
+        
+        path = parts.path.lower()
+        if path.endswith(self.NON_COURSE_EXTENSIONS):
+            return "URL points to a file, not a course page"
+        
+        pattern = self.COURSE_PATH_PATTERNS.get(self.detect_platform(url))
+        if pattern is not None and not pattern.search(path):
+            return "URL is not a course page on this platform"
+        return None
+    
     def scrape_course(self, url: str) -> dict:
         """
         Scrape a course page and extract content.
         
         Returns:
-            dict with keys: title, platform, content (markdown), success
+            dict with keys: title, platform, content (markdown), success.
+            On failure: error, and permanent (True if retrying cannot help)
+        
+        Raises:
+            NoKeyAvailable: every Firecrawl key is out of quota
         """
-        if not self.client:
+        if not self.key_pool:
             raise ValueError("Firecrawl API key not configured")
         
         platform = self.detect_platform(url)
         
         try:
             # Scrape the page using Firecrawl
-            result = self.client.scrape_url(
-                url,
-                params={
-                    "formats": ["markdown"],
-                    "onlyMainContent": True,
-                }
-            )
+            result = self._scrape(url)
             
             # Extract content from result
             content = result.get("markdown", "")
+            if len(content.strip()) < self.MIN_CONTENT_CHARS:
+                return {
+                    "success": False,
+                    "error": "Page has no course content",
+                    "permanent": False,
+                    "platform": platform,
+                    "url": url,
+                }
             
             # Try to extract title from the content or metadata
             title = self._extract_title(content, result.get("metadata", {}))
@@ -73,14 +155,31 @@ class ScraperService:
                 "url": url,
             }
             
+        except NoKeyAvailable:
+            raise
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
+                "permanent": error_code(e) in self.PERMANENT_FAILURE_STATUSES,
                 "platform": platform,
                 "url": url,
             }
     
+    def _scrape(self, url: str) -> dict:
+        """Call Firecrawl for a single page (rate limited and metered)."""
+        with span("firecrawl.scrape", url=url):
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            with self.key_pool.use(credits=1) as lease, track_upstream("firecrawl"):
+                return lease.client.scrape_url(
+                    url,
+                    params={
+                        "formats": ["markdown"],
+                        "onlyMainContent": True,
+                    }
+                )
+    
     def _extract_title(self, content: str, metadata: dict) -> str:
         """Extract course title from content or metadata."""
         # Try metadata first
@@ -91,9 +190,9 @@ class ScraperService:
                 title = title.replace(suffix, "")
             return title.strip()
         
-        # Try to find first heading in markdown
-        lines = content.split("\n")
-        for line in lines[:20]:  # Check first 20 lines
+        # Try to find first heading in markdown (only split off the first 20 lines)
+        lines = content.split("\n", 20)
+        for line in lines[:20]:
             line = line.strip()
             if line.startswith("# "):
                 return line[2:].strip()
@@ -6,6 +6,11 @@ Searches for documentation and official resources.
 import httpx
 from typing import Optional
 from config import settings
+from keypool import KeyPool, NoKeyAvailable, Quota, parse_keys
+from logger import logger
+from metrics import track_upstream
+from ranking import domain_reputation, rank_roadmap
+from tracing import span
 
 
 class SearchService:
@@ -13,34 +18,30 @@ class SearchService:
     
     SERPER_API_URL = "https://google.serper.dev/search"
     
-    # Preferred domains for documentation (higher priority)
-    PRIORITY_DOMAINS = [
-        "docs.",
-        "developer.",
-        "learn.",
-        "tutorial",
-        "guide",
-        "mozilla.org",
-        "w3schools.com",
-        "realpython.com",
-        "freecodecamp.org",
-        "geeksforgeeks.org",
-        "tutorialspoint.com",
-    ]
+    def __init__(self):
+        self.key_pool = KeyPool(
+            "serper",
+            parse_keys(settings.SERPER_API_KEY),
+            [Quota("credits", settings.SERPER_CREDITS_PER_KEY)],
+        )
+        self._http: Optional[httpx.Client] = None
+        # Optional TokenBucket, set by batch jobs to stay within Serper limits
+        self.rate_limiter = None
     
-    # Domains to filter out (less useful for learning)
-    BLOCKED_DOMAINS = [
-        "youtube.com",  # We handle YouTube separately
-        "udemy.com",
-        "coursera.org",
-        "skillshare.com",
-        "linkedin.com/learning",
-        "amazon.com",
-        "ebay.com",
-    ]
+    @property
+    def http(self) -> httpx.Client:
+        """Shared client (thread-safe, keeps connections alive), built on first use: its SSL setup is slow."""
+        if self._http is None:
+            self._http = httpx.Client(timeout=15.0)
+        return self._http
     
-    def __init__(self):
-        self.api_key = settings.SERPER_API_KEY
+    @http.setter
+    def http(self, client: httpx.Client) -> None:
+        self._http = client
+    
+    def warm_up(self) -> None:
+        """Build the HTTP client ahead of the first search."""
+        self.http
     
     def search_documentation(self, topic: str, max_results: int = 3) -> list[dict]:
         """
@@ -53,81 +54,83 @@ class SearchService:
         Returns:
             List of documentation links with title, url, snippet
         """
-        if not self.api_key:
+        candidates = self.documentation_candidates(topic)
+        return rank_roadmap([{"topic": topic}], [[]], [candidates], docs_per_topic=max_results)[0][1]
+    
+    def documentation_candidates(self, topic: str) -> list[dict]:
+        """
+        Unranked documentation results for a topic, for ranking.rank_roadmap().
+        
+        Returns:
+            Parsed results (blocked domains removed) with "_priority", "_position" and "_key"
+        """
+        if not self.key_pool:
             raise ValueError("Serper API key not configured")
         
         # Enhance query for documentation
         query = f"{topic} tutorial documentation guide"
         
         try:
-            response = httpx.post(
-                self.SERPER_API_URL,
-                headers={
-                    "X-API-KEY": self.api_key,
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "q": query,
-                    "num": 10,  # Get more results to filter
-                },
-                timeout=15.0,
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Parse and filter results
+            data = self._post({
+                "q": query,
+                "num": 10,  # Get more results to filter
+            })
             docs = []
-            organic_results = data.get("organic", [])
-            
-            for result in organic_results:
+            for result in data.get("organic", []):
                 doc = self._parse_result(result)
                 if doc:
                     docs.append(doc)
+            return docs
             
-            # Sort by priority (official docs first)
-            docs.sort(key=lambda d: d.get("_priority", 0), reverse=True)
-            
-            # Remove priority field and limit results
-            for d in docs:
-                d.pop("_priority", None)
-            
-            return docs[:max_results]
-            
+        except NoKeyAvailable:
+            raise  # Out of quota: the roadmap must not be cached without documentation
         except httpx.HTTPError as e:
-            print(f"Serper API error: {e}")
+            logger.warning("Serper API error: %s", e)
             return []
         except Exception as e:
-            print(f"Search error: {e}")
+            logger.warning("Search error: %s", e)
             return []
     
+    def _post(self, payload: dict) -> dict:
+        """POST a query to Serper and return the JSON body (rate limited and metered)."""
+        with span("serper.search", q=payload.get("q"), type=payload.get("type", "search")):
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            # Serper charges 2 credits for more than 10 results
+            credits = 2 if payload.get("num", 10) > 10 else 1
+            with self.key_pool.use(credits=credits) as lease, track_upstream("serper"):
+                response = self.http.post(
+                    self.SERPER_API_URL,
+                    headers={
+                        "X-API-KEY": lease.secret,
+                        "Content-Type": "application/json",
+                    },
+                    json=payload,
+                )
+                response.raise_for_status()
+                return response.json()
+    
     def _parse_result(self, result: dict) -> Optional[dict]:
-        """Parse a Serper result into our format."""
+        """Parse a Serper result into our format (None for blocked domains)."""
         url = result.get("link", "")
-        
-        # Filter blocked domains
-        for blocked in self.BLOCKED_DOMAINS:
-            if blocked in url.lower():
-                return None
-        
         title = result.get("title", "")
-        snippet = result.get("snippet", "")
-        
         if not url or not title:
             return None
         
-        # Calculate priority based on domain
-        priority = 0
-        url_lower = url.lower()
-        for domain in self.PRIORITY_DOMAINS:
-            if domain in url_lower:
-                priority += 1
+        # URL parsed once, for the reputation index and the dedupe key
+        found = domain_reputation.lookup(url)
+        if found is None:
+            return None
+        priority, key = found
+        snippet = result.get("snippet", "")
         
         return {
             "title": title,
             "url": url,
             "snippet": snippet[:200] if snippet else None,
             "_priority": priority,
+            "_position": result.get("position"),
+            "_key": key,
         }
 
     def search_videos(self, query: str, num_results: int = 3) -> list[dict]:
@@ -141,31 +144,22 @@ class SearchService:
         Returns:
             List of video result dictionaries
         """
-        if not self.api_key:
+        if not self.key_pool:
             raise ValueError("Serper API key not configured")
             
         try:
-            response = httpx.post(
-                self.SERPER_API_URL,
-                headers={
-                    "X-API-KEY": self.api_key,
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "q": query,
-                    "type": "videos",
-                    "num": num_results,
-                    "engine": "google"
-                },
-                timeout=15.0,
-            )
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self._post({
+                "q": query,
+                "type": "videos",
+                "num": num_results,
+                "engine": "google"
+            })
             return data.get("videos", [])
             
+        except NoKeyAvailable:
+            raise
         except Exception as e:
-            print(f"Serper video search error: {e}")
+            logger.warning("Serper video search error: %s", e)
             return []
 
 
@@ -3,28 +3,61 @@ YouTube search service using Official Google YouTube Data API v3.
 Most reliable method, no scraping or bot detection issues.
 """
 
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from config import settings
+from keypool import KeyPool, NoKeyAvailable, Quota, parse_keys
+from logger import logger
+from metrics import track_upstream
+from ranking import rank_roadmap
+from tracing import span
 import re
-from datetime import timedelta
+from typing import Optional
+
+
+# Video ID after "v=" or a path slash; covers watch?v=, youtu.be/ and embed/ URLs
+VIDEO_ID_PATTERN = re.compile(r'(?:v=|/)([0-9A-Za-z_-]{11})')
+ISO_DURATION_PATTERN = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
+
+
+def _youtube_client(key: str):
+    """YouTube Data API resource for one key; googleapiclient loads on first use."""
+    from googleapiclient.discovery import build
+    return build("youtube", "v3", developerKey=key, cache_discovery=False)
+
 
 class YouTubeService:
     """Service for searching YouTube videos using Official API."""
     
     def __init__(self):
-        # Prefer specific YouTube key, fallback to Gemini key (often same project)
-        self.api_key = settings.YOUTUBE_API_KEY or settings.GEMINI_API_KEY
+        # Prefer specific YouTube keys, fallback to Gemini keys (often same project).
+        # A new client is built per call (googleapiclient clients aren't thread-safe).
+        self.key_pool = KeyPool(
+            "youtube",
+            parse_keys(settings.YOUTUBE_API_KEY or settings.GEMINI_API_KEY),
+            [Quota("units", settings.YOUTUBE_UNITS_PER_DAY, 86400)],
+            client_factory=_youtube_client,
+            share_clients=False,
+        )
+        # Optional TokenBucket, set by batch jobs to stay within YouTube quota
+        self.rate_limiter = None
     
     def search_videos(self, query: str, max_results: int = 3) -> list[dict]:
+        """
+        Best videos for a query, ranked by views and duration (see ranking.py).
+        """
+        max_results = min(max(1, max_results), 5)
+        candidates = self.video_candidates(query)
+        return rank_roadmap([{"topic": query}], [candidates], [[]], videos_per_topic=max_results)[0][0]
+    
+    def video_candidates(self, query: str) -> list[dict]:
         """
         Hybrid Search:
         1. Use Serper to find video URLs (Fast, saves YouTube Search Quota).
         2. Use YouTube API to fetch details (views, duration) for those IDs (Cheap: 1 unit).
         Threads-safe and High Quality.
-        """
-        max_results = min(max(1, max_results), 5)
         
+        Returns:
+            Unranked videos with "_view_count", "_duration_seconds" and "_key" (video ID), for ranking.rank_roadmap()
+        """
         # 1. Discovery Phase (Serper)
         # Fetch more candidates to ensure we find valid YouTube links
         from services.search import search_service
@@ -32,8 +65,10 @@ class YouTubeService:
             # Append 'youtube' to query to ensure we get video platform results
             discovery_query = f"site:youtube.com {query}"
             raw_results = search_service.search_videos(discovery_query, num_results=10)
+        except NoKeyAvailable:
+            raise  # Out of quota: the roadmap must not be cached without videos
         except Exception as e:
-            print(f"Serper discovery failed: {e}")
+            logger.warning("Serper discovery failed: %s", e)
             raw_results = []
             
         if not raw_results:
@@ -54,68 +89,66 @@ class YouTubeService:
             return []
             
         # 2. Enrichment Phase (YouTube API)
-        if not self.api_key:
-            print("YouTube API not initialized (no key) - returning raw Serper results")
-            return self._fallback_response(video_map.values(), max_results)
+        if not self.key_pool:
+            logger.warning("YouTube API not initialized (no key) - returning raw Serper results")
+            return self._fallback_response(video_map.values())
             
         try:
-            with build("youtube", "v3", developerKey=self.api_key, cache_discovery=False) as youtube:
-                videos_response = youtube.videos().list(
-                    id=",".join(video_ids[:50]), # API limit per call
-                    part="snippet,contentDetails,statistics"
-                ).execute()
-                
-                candidates = []
-                for item in videos_response.get("items", []):
-                    vid_id = item["id"]
-                    snippet = item.get("snippet", {})
-                    statistics = item.get("statistics", {})
-                    content_details = item.get("contentDetails", {})
-                    
-                    # Parse details
-                    duration_iso = content_details.get("duration", "PT0S")
-                    duration_formatted = self._parse_iso_duration(duration_iso)
-                    view_count = int(statistics.get("viewCount", 0))
-                    
-                    # Merge with basic info (prefer API data over Serper)
-                    candidates.append({
-                        "title": snippet.get("title", video_map[vid_id].get("title")),
-                        "url": f"https://www.youtube.com/watch?v={vid_id}",
-                        "thumbnail": snippet.get("thumbnails", {}).get("high", {}).get("url", video_map[vid_id].get("imageUrl")),
-                        "views": self._format_views(view_count),
-                        "channel": snippet.get("channelTitle", video_map[vid_id].get("source")),
-                        "duration": duration_formatted,
-                        "_view_count": view_count
-                    })
-                
-                # Sort by views and return top N
-                candidates.sort(key=lambda x: x["_view_count"], reverse=True)
+            videos_response = self._fetch_video_details(video_ids[:50])  # API limit per call
+            
+            candidates = []
+            for item in videos_response.get("items", []):
+                vid_id = item["id"]
+                snippet = item.get("snippet", {})
+                statistics = item.get("statistics", {})
+                content_details = item.get("contentDetails", {})
                 
-                for vid in candidates:
-                    vid.pop("_view_count", None)
-                    
-                return candidates[:max_results]
+                # Parse details
+                duration_iso = content_details.get("duration", "PT0S")
+                duration_formatted = self._parse_iso_duration(duration_iso)
+                duration_seconds = self._iso_duration_seconds(duration_iso)
+                view_count = int(statistics.get("viewCount", 0))
                 
+                # Merge with basic info (prefer API data over Serper)
+                candidates.append({
+                    "title": snippet.get("title", video_map[vid_id].get("title")),
+                    "url": f"https://www.youtube.com/watch?v={vid_id}",
+                    "thumbnail": snippet.get("thumbnails", {}).get("high", {}).get("url", video_map[vid_id].get("imageUrl")),
+                    "views": self._format_views(view_count),
+                    "channel": snippet.get("channelTitle", video_map[vid_id].get("source")),
+                    "duration": duration_formatted,
+                    "_view_count": view_count,
+                    "_duration_seconds": duration_seconds,
+                    "_key": vid_id,
+                })
+            return candidates
+            
+        except NoKeyAvailable:
+            raise
         except Exception as e:
-            print(f"YouTube Enrichement failed: {e}. Returning raw results.")
-            return self._fallback_response(video_map.values(), max_results)
+            logger.warning("YouTube enrichment failed: %s. Returning raw results.", e)
+            return self._fallback_response(video_map.values())
+
+    def _fetch_video_details(self, video_ids: list[str]) -> dict:
+        """Fetch snippet, duration and statistics for video IDs (rate limited and metered)."""
+        with span("youtube.videos", ids=len(video_ids)):
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            # videos.list costs 1 quota unit regardless of the number of IDs
+            with self.key_pool.use(units=1) as lease, track_upstream("youtube"):
+                with lease.client as youtube:
+                    return youtube.videos().list(
+                        id=",".join(video_ids),
+                        part="snippet,contentDetails,statistics"
+                    ).execute()
 
     def _extract_video_id(self, url: str) -> str:
         """Extract YouTube Video ID from URL."""
-        # Regex for standard and short URLs
-        patterns = [
-            r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-            r'(?:youtu\.be\/)([0-9A-Za-z_-]{11})',
-            r'(?:embed\/)([0-9A-Za-z_-]{11})'
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        return ""
-
-    def _fallback_response(self, serper_results, max_results):
-        """Return raw Serper results if enrichment fails."""
+        match = VIDEO_ID_PATTERN.search(url)
+        return match.group(1) if match else ""
+
+    def _fallback_response(self, serper_results, max_results: int = None):
+        """Return raw Serper results if enrichment fails (no view counts, Serper's "mm:ss" durations)."""
         videos = []
         for res in list(serper_results)[:max_results]:
             videos.append({
@@ -124,7 +157,9 @@ class YouTubeService:
                 "thumbnail": res.get("imageUrl", "https://i.ytimg.com/vi/placeholder/hqdefault.jpg"),
                 "views": "N/A",
                 "channel": res.get("source", "YouTube"),
-                "duration": res.get("duration", "")
+                "duration": res.get("duration", ""),
+                "_duration_seconds": self._clock_seconds(res.get("duration", "")),
+                "_key": self._extract_video_id(res.get("link", "")) or None,
             })
         return videos
 
@@ -133,7 +168,7 @@ class YouTubeService:
         """Parse ISO 8601 duration string (PT1H2M3S) to HH:MM:SS."""
         try:
             # Simple regex parsing for PT#H#M#S format
-            match = re.match(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?', iso_duration)
+            match = ISO_DURATION_PATTERN.match(iso_duration)
             if not match:
                 return ""
             
@@ -149,6 +184,23 @@ class YouTubeService:
         except:
             return ""
 
+    def _iso_duration_seconds(self, iso_duration: str) -> Optional[int]:
+        """Seconds in an ISO 8601 duration (PT1H2M3S), None if unparseable or zero."""
+        match = ISO_DURATION_PATTERN.match(iso_duration or "")
+        if not match:
+            return None
+        h, m, s = (int(g) if g else 0 for g in match.groups())
+        return h * 3600 + m * 60 + s or None
+
+    def _clock_seconds(self, clock: str) -> Optional[int]:
+        """Seconds in a "h:mm:ss" or "mm:ss" duration, None if unparseable."""
+        seconds = 0
+        for part in (clock or "").split(":"):
+            if not part.strip().isdigit():
+                return None
+            seconds = seconds * 60 + int(part)
+        return seconds or None
+
     def _format_views(self, count: int) -> str:
         """Format view count for display (e.g., 1.2M, 500K)."""
         if not count: return "N/A"
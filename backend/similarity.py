@@ -0,0 +1,198 @@
+"""
+Near-duplicate course detection for FuckPaidCourses backend.
+
+The same course is often scraped from several URLs (mirrors, affiliate
+pages, other platforms) whose markdown differs only in prices, review counts
+and dates. Course content is reduced to word shingles without those numbers
+and summarized as a MinHash signature. Signatures are indexed with
+LSH banding, so a near-identical course is found in a few dict lookups and
+its cached topics can be reused instead of calling Gemini and the search
+APIs again.
+
+Short pages get no signature: consent and bot walls or login interstitials
+look alike on every course of a platform. Callers also check that the titles
+share most of their words (title_similarity) before reusing a roadmap.
+"""
+
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Optional
+
+from cache import LazyValue
+from config import settings
+
+
+# Mersenne prime for the (a * x + b) mod p hash family
+_PRIME = (1 << 61) - 1
+
+# Words and numbers; only short integers (versions, section numbers) are kept,
+# prices, ratings, counts and dates differ between mirrors of one course
+_TOKEN = re.compile(r"[a-z]+|\d+(?:[.,:/-]\d+)*")
+
+_TITLE_WORD = re.compile(r"[a-z0-9+#]+")
+
+
+def title_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of two titles' word sets, ignoring case and punctuation (mirrors reword titles slightly)."""
+    words_a, words_b = set(_TITLE_WORD.findall(a.lower())), set(_TITLE_WORD.findall(b.lower()))
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+class SimilarityIndex:
+    """MinHash signatures of course content, bucketed by LSH band (thread-safe)."""
+
+    def __init__(
+        self,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 4,
+        min_shingles: int = 150,
+        threshold: float = 0.9,
+        max_entries: int = 50000,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_shingles = min_shingles
+        self.threshold = threshold
+        self.max_entries = max_entries
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(num_perm)]
+        self._lock = threading.Lock()
+        # course_id -> (signature, timestamp); insertion order is age order
+        self._signatures: dict[str, tuple[tuple[int, ...], float]] = {}
+        # (band, band values) -> course_ids
+        self._buckets: dict[tuple, set[str]] = {}
+
+    def signature(self, text: str) -> Optional[tuple[int, ...]]:
+        """
+        MinHash signature of the text's word shingles (CPU bound, run in the executor).
+
+        Returns:
+            The signature, or None if the text has fewer than min_shingles
+            distinct shingles (too short to tell courses apart)
+        """
+        words = [w for w in _TOKEN.findall(text.lower()) if not w[0].isdigit() or len(w) <= 2]
+        k = self.shingle_size
+        if len(words) - k + 1 < self.min_shingles:
+            return None
+        hashes = {
+            zlib.crc32(" ".join(words[i:i + k]).encode("utf-8"))
+            for i in range(len(words) - k + 1)
+        }
+        if len(hashes) < self.min_shingles:
+            return None
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms)
+
+    def match(self, text: str, exclude: str = None) -> tuple[Optional[tuple[int, ...]], list[tuple[str, float]]]:
+        """
+        Signature of the text and the indexed courses similar to it, in one executor hop.
+
+        Returns:
+            (signature or None, list of (course_id, similarity) as from similar())
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None, []
+        return signature, self.similar(signature, exclude)
+
+    def _band_keys(self, signature: tuple[int, ...]):
+        rows = self.rows
+        for band in range(self.bands):
+            yield band, signature[band * rows:(band + 1) * rows]
+
+    def add(self, course_id: str, signature: tuple[int, ...], timestamp: float = None) -> None:
+        """Index a course's signature (replacing any previous one)."""
+        if len(signature) != self.num_perm:
+            return
+        with self._lock:
+            self._remove(course_id)
+            while self.max_entries and len(self._signatures) >= self.max_entries:
+                self._remove(next(iter(self._signatures)))
+            self._signatures[course_id] = (signature, timestamp or time.time())
+            for key in self._band_keys(signature):
+                self._buckets.setdefault(key, set()).add(course_id)
+
+    def remove(self, course_id: str) -> None:
+        with self._lock:
+            self._remove(course_id)
+
+    def _remove(self, course_id: str) -> None:
+        entry = self._signatures.pop(course_id, None)
+        if entry is None:
+            return
+        for key in self._band_keys(entry[0]):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(course_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def similar(self, signature: tuple[int, ...], exclude: str = None) -> list[tuple[str, float]]:
+        """
+        Indexed courses at or above the similarity threshold, most similar first.
+
+        Returns:
+            List of (course_id, estimated Jaccard similarity)
+        """
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+            candidates.discard(exclude)
+            matches = []
+            for course_id in candidates:
+                other = self._signatures[course_id][0]
+                similarity = sum(1 for x, y in zip(signature, other) if x == y) / self.num_perm
+                if similarity >= self.threshold:
+                    matches.append((course_id, similarity))
+        matches.sort(key=lambda match: -match[1])
+        return matches
+
+    # SimpleCache-style interface, so the index is saved in cache snapshots
+
+    def entries(self) -> list[tuple[str, tuple[int, ...], float]]:
+        """Return (course_id, signature, timestamp) for unexpired entries."""
+        now = time.time()
+        with self._lock:
+            return [
+                (course_id, signature, ts) for course_id, (signature, ts) in self._signatures.items()
+                if now - ts <= settings.CACHE_TTL
+            ]
+
+    def restore(self, course_id: str, value, timestamp: float) -> bool:
+        """Restore a snapshot entry (value may still be raw JSON). Returns True if stored."""
+        if time.time() - timestamp > settings.CACHE_TTL:
+            return False
+        current = self._signatures.get(course_id)
+        if current and current[1] >= timestamp:
+            return False
+        if isinstance(value, LazyValue):
+            value = value.decode(value.raw)
+        self.add(course_id, tuple(value), timestamp)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._signatures.clear()
+            self._buckets.clear()
+
+
+# Global index of scraped course content
+course_index = SimilarityIndex(
+    min_shingles=settings.SIMILARITY_MIN_SHINGLES,
+    threshold=settings.SIMILARITY_THRESHOLD,
+    max_entries=settings.SIMILARITY_MAX_ENTRIES,
+)
@@ -0,0 +1,9 @@
+"""
+Shared test setup: run from backend/ (python -m pytest) with the backend
+modules importable, as the server and scripts import them.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
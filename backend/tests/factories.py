@@ -0,0 +1,46 @@
+"""Model factories shared by the test modules."""
+
+from datetime import datetime
+
+from models.schemas import RoadmapResponse
+
+
+def make_roadmap(
+    topics: int = 3,
+    hours=2.5,
+    generated_at: datetime = datetime(2024, 6, 1, 12, 30, 45),
+    text: str = "Python Basics",
+) -> RoadmapResponse:
+    """A validated roadmap with `topics` topics (one video and one doc each) built around `text`."""
+    return RoadmapResponse.model_validate({
+        "course": {
+            "title": f"{text} Bootcamp",
+            "platform": "Udemy",
+            "originalUrl": "https://www.udemy.com/course/python-bootcamp/?couponCode=X&utm_source=y",
+            "totalTopics": topics,
+        },
+        "roadmap": [
+            {
+                "id": i + 1,
+                "order": i + 1,
+                "topic": f"{text} {i + 1}",
+                "description": f"Learn {text.lower()}, step {i + 1}.",
+                "estimatedHours": hours,
+                "videos": [
+                    {
+                        "title": f"{text} tutorial",
+                        "url": f"https://www.youtube.com/watch?v=abcdefghij{i % 10}",
+                        "thumbnail": "https://i.ytimg.com/vi/abcdefghij0/hqdefault.jpg",
+                        "views": "1.2M",
+                        "channel": "Channel",
+                        "duration": "12:34" if i % 2 else None,
+                    }
+                ],
+                "documentation": [
+                    {"title": "Docs", "url": f"https://docs.python.org/3/tutorial/{i}", "snippet": None if i % 2 else "A snippet"},
+                ],
+            }
+            for i in range(topics)
+        ],
+        "generatedAt": generated_at,
+    })
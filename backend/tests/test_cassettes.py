@@ -0,0 +1,45 @@
+"""Tests for upstream record/replay cassettes."""
+
+import gzip
+import os
+from types import SimpleNamespace
+
+from services.cassettes import CassetteGenaiClient, CassetteStore, gemini_source, read_records
+
+
+class FakeGenai:
+    def __init__(self):
+        self.models = self
+        self.calls = 0
+
+    def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        return SimpleNamespace(text=f'{{"topics": [], "n": {self.calls}}}')
+
+
+def test_gemini_replay_ignores_prompt_truncation(tmp_path):
+    content = "Section 1: Basics. " * 1000
+    recorder = CassetteGenaiClient(CassetteStore(str(tmp_path)), "record", FakeGenai())
+    with gemini_source(content, "Course"):
+        recorded = recorder.models.generate_content("cheap", "PROMPT" + content[:15000])
+    recorder.models.store.close()
+
+    player = CassetteGenaiClient(CassetteStore(str(tmp_path)), "replay")
+    # Replayed under pressure: the prompt is cut shorter than when recorded
+    with gemini_source(content, "Course"):
+        replayed = player.models.generate_content("cheap", "PROMPT" + content[:8000])
+    assert replayed.text == recorded.text
+
+
+def test_records_share_one_stream_and_are_readable_before_close(tmp_path):
+    store = CassetteStore(str(tmp_path))
+    for i in range(50):
+        store.record("serper", f"key{i}", 0.01, response={"status": 200, "json": {"i": i}})
+    path = os.path.join(str(tmp_path), "serper.jsonl.gz")
+    assert [r["k"] for r in read_records(path)] == [f"key{i}" for i in range(50)]
+
+    store.close()
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data.count(b"\x1f\x8b\x08") == 1  # One gzip member, not one per record
+    assert len(gzip.decompress(data).splitlines()) == 50
@@ -0,0 +1,69 @@
+"""Tests for API key rotation and cooldowns."""
+
+import json
+
+import httpx
+import pytest
+
+from keypool import KeyPool, NoKeyAvailable, quota_status
+from services.search import SearchService
+
+
+class GoogleApiError(Exception):
+    """Shaped like googleapiclient's HttpError: status on .resp, JSON body on .content."""
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(f"<HttpError {status}>")
+        self.resp = type("Resp", (), {"status": status})()
+        self.content = json.dumps({"error": {"code": status, "errors": [{"reason": reason}]}}).encode()
+
+
+def _http_error(status: int, body: dict = None) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://upstream.test")
+    response = httpx.Response(status, json=body or {}, request=request)
+    return httpx.HTTPStatusError(f"{status} error", request=request, response=response)
+
+
+@pytest.mark.parametrize("exc, expected", [
+    (_http_error(429), "429"),
+    (_http_error(402, {"error": "Insufficient credits"}), "402"),
+    (GoogleApiError(403, "quotaExceeded"), "403"),
+    (GoogleApiError(403, "forbidden"), None),
+    (_http_error(403, {"error": "Website not supported"}), None),
+    (Exception("Failed to scrape URL. Status code: 403"), None),
+    (Exception("Payment Required (402)"), None),
+    (_http_error(500), None),
+])
+def test_quota_status(exc, expected):
+    assert quota_status(exc) == expected
+
+
+def _fail(pool: KeyPool, exc: Exception) -> None:
+    with pytest.raises(type(exc)):
+        with pool.use():
+            raise exc
+
+
+def test_only_key_is_never_cooled_off():
+    pool = KeyPool("test", ["only-key-1234"])
+    for exc in (_http_error(429), _http_error(402), GoogleApiError(403, "quotaExceeded")):
+        _fail(pool, exc)
+    assert pool.availability() == (1, 0.0)
+
+
+def test_quota_errors_cool_off_one_of_several_keys():
+    pool = KeyPool("test", ["first-key-1111", "second-key-2222"])
+    _fail(pool, _http_error(402))
+    assert pool.availability()[0] == 1
+    _fail(pool, _http_error(403, {"error": "Website not supported"}))
+    assert pool.availability()[0] == 1
+
+
+def test_search_does_not_swallow_exhausted_keys():
+    service = SearchService()
+    service.key_pool = KeyPool("serper", ["key-1234"], max_wait=0)
+    service.key_pool.keys[0].cooldown_until = float("inf")
+    with pytest.raises(NoKeyAvailable):
+        service.documentation_candidates("docker")
+    with pytest.raises(NoKeyAvailable):
+        service.search_videos("docker")
@@ -0,0 +1,67 @@
+"""Tests for Gemini routing and topic extraction."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from config import settings
+from keypool import KeyPool
+from services.llm import LLMService
+
+
+class FakeModels:
+    def __init__(self, answer=None, error=None):
+        self.answer, self.error, self.configs = answer, error, []
+
+    def generate_content(self, model, contents, config):
+        self.configs.append(config)
+        if self.error:
+            raise self.error
+        return SimpleNamespace(parsed=None, text=self.answer, usage_metadata=None)
+
+
+def _service(models: FakeModels, monkeypatch, pressure: bool = False) -> LLMService:
+    service = LLMService()
+    service.key_pool = KeyPool("gemini", ["key-1234"], client_factory=lambda key: SimpleNamespace(models=models))
+    service.models = ["cheap", "heavy"]
+    monkeypatch.setattr(settings, "GEMINI_LOW_QUOTA_HEADROOM", 2.0 if pressure else 0.0)
+    return service
+
+
+def _answer(topics: int) -> str:
+    return json.dumps({"topics": [
+        {
+            "topic": f"Building REST APIs with Framework Part {i}",
+            "description": "Design resources and routes, validate input, handle errors and test the endpoints end to end.",
+            "estimatedHours": 2.5,
+        }
+        for i in range(topics)
+    ]})
+
+
+def test_small_route_fits_the_largest_answer(monkeypatch):
+    route = _service(FakeModels(), monkeypatch).route(1000)
+    assert route.reason == "small"
+    # ~4 characters per token: a full answer must fit the budget
+    assert len(_answer(LLMService.MAX_TOPICS)) / 4 < route.max_output_tokens
+
+
+def test_fallback_topics_are_marked(monkeypatch):
+    service = _service(FakeModels(answer='{"topics": [{"topic": "Trunc'), monkeypatch, pressure=True)
+    topics = service.extract_topics("content", "Course")
+    assert topics and all(topic["fallback"] for topic in topics)
+
+
+def test_valid_answer_is_not_marked(monkeypatch):
+    service = _service(FakeModels(answer=_answer(5)), monkeypatch)
+    topics = service.extract_topics("content", "Course")
+    assert len(topics) == 5
+    assert not any(topic.get("fallback") for topic in topics)
+
+
+def test_failed_calls_count_towards_latency(monkeypatch):
+    service = _service(FakeModels(error=TimeoutError("Gemini timed out")), monkeypatch)
+    with pytest.raises(TimeoutError):
+        service.extract_topics("content", "Course")
+    assert service.latency > 0
@@ -0,0 +1,83 @@
+"""Tests for the async logging setup."""
+
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+from contextlib import redirect_stdout
+
+from config import settings
+from logger import RequestLogger, configured_level, log_timing, parse_level, setup_logging, stop_logging
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_async_json_logs_keep_exceptions():
+    out = io.StringIO()
+    try:
+        with redirect_stdout(out):
+            logger = setup_logging(level=logging.INFO, fmt="json", async_mode=True)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Failed %s of %d", "job", 3)
+        stop_logging()
+    finally:
+        setup_logging(
+            level=configured_level(),
+            fmt=settings.LOG_FORMAT,
+            async_mode=settings.LOG_ASYNC,
+        )
+
+    entry = json.loads(out.getvalue().strip().splitlines()[-1])
+    assert entry["msg"] == "Failed job of 3"
+    assert entry["level"] == "error"
+    assert "ValueError: boom" in entry["exc"]
+
+
+def test_parse_level():
+    assert parse_level("DEBUG") == logging.DEBUG
+    assert parse_level("warning") == logging.WARNING
+    assert parse_level("15") == 15
+    assert parse_level("LOUD") is None
+
+
+def test_invalid_log_level_falls_back_to_info():
+    result = subprocess.run(
+        # Level on stderr: the log writer thread shares stdout with print()
+        [sys.executable, "-c", "import sys; from logger import logger, stop_logging; print(logger.level, file=sys.stderr); stop_logging()"],
+        cwd=BACKEND_DIR,
+        env=dict(os.environ, LOG_LEVEL="LOUD", LOG_FORMAT="json"),
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "Unknown LOG_LEVEL 'LOUD'" in result.stdout
+    assert result.stderr.strip() == str(logging.INFO)
+
+
+class _Counted:
+    """Counts how often it is formatted into a log message."""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "value"
+
+
+def test_disabled_request_logs_are_not_formatted():
+    logger = setup_logging(level=logging.WARNING, fmt="color", async_mode=False)
+    operation = _Counted()
+    try:
+        with RequestLogger(operation, "https://example.com/course") as req_log:
+            req_log.step("Scraping", operation)
+            req_log.detail("Title: %s", operation)
+        log_timing(operation)(lambda: None)()
+    finally:
+        setup_logging(level=configured_level(), fmt=settings.LOG_FORMAT, async_mode=settings.LOG_ASYNC)
+    assert operation.formatted == 0
@@ -0,0 +1,64 @@
+"""Precompute checkpoint: terminal statuses are recorded once and skipped."""
+
+import asyncio
+import json
+
+import precompute
+from cache import canonical_url
+from factories import make_roadmap
+from persistence import RoadmapStore
+from precompute import Checkpoint, precompute as run_precompute
+
+
+COURSE_URL = "https://www.udemy.com/course/python-basics/"
+FAILING_URL = "https://www.udemy.com/course/broken-course/"
+NON_COURSE_URL = "https://www.youtube.com/watch?v=abc"
+
+
+def _run(tmp_path, monkeypatch, retry_failed=False):
+    calls = []
+
+    async def fake_build_roadmap(url, req_log, shared_topics=None):
+        calls.append(url)
+        if url == FAILING_URL:
+            raise precompute.HTTPException(status_code=400, detail={"message": "scrape failed"})
+        return make_roadmap()
+
+    monkeypatch.setattr(precompute, "build_roadmap", fake_build_roadmap)
+    urls = {canonical_url(url): url for url in (COURSE_URL, FAILING_URL, NON_COURSE_URL)}
+    counts = asyncio.run(run_precompute(
+        urls,
+        RoadmapStore(str(tmp_path / "roadmaps.jsonl")),
+        Checkpoint(str(tmp_path / "checkpoint.jsonl")),
+        concurrency=2,
+        retry_failed=retry_failed,
+    ))
+    return counts, calls
+
+
+def _checkpoint_lines(tmp_path):
+    with open(tmp_path / "checkpoint.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_rejection_is_recorded_once(tmp_path, monkeypatch):
+    counts, calls = _run(tmp_path, monkeypatch)
+    assert counts["done"] == 1 and counts["failed"] == 1 and counts["rejected"] == 1
+    assert NON_COURSE_URL not in calls
+
+    counts, calls = _run(tmp_path, monkeypatch)
+    assert calls == []
+    assert counts["skipped"] == 3 and counts["rejected"] == 0
+
+    statuses = [line["status"] for line in _checkpoint_lines(tmp_path)]
+    assert sorted(statuses) == ["done", "failed", "rejected"]
+
+
+def test_retry_failed_does_not_append_rejection_again(tmp_path, monkeypatch):
+    _run(tmp_path, monkeypatch)
+    counts, calls = _run(tmp_path, monkeypatch, retry_failed=True)
+    assert calls == [FAILING_URL]
+    assert counts["rejected"] == 1
+
+    rejected = [line for line in _checkpoint_lines(tmp_path) if line["status"] == "rejected"]
+    assert len(rejected) == 1
@@ -0,0 +1,41 @@
+"""Tests for the per-client request limiter."""
+
+import asyncio
+
+from ratelimit import ClientRateLimiter, ClientRateLimitMiddleware
+
+
+async def _ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def _statuses(middleware: ClientRateLimitMiddleware, path: str, count: int) -> list[int]:
+    """Status codes of `count` GET requests to path from one client."""
+    statuses = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def run():
+        for _ in range(count):
+            scope = {"type": "http", "method": "GET", "path": path, "headers": [], "client": ("10.0.0.1", 1234)}
+            await middleware(scope, receive, send)
+
+    asyncio.run(run())
+    return statuses
+
+
+def test_client_over_limit_gets_429():
+    middleware = ClientRateLimitMiddleware(_ok_app, ClientRateLimiter(3))
+    assert _statuses(middleware, "/roadmaps/abc", 6) == [200, 200, 200, 429, 429, 429]
+
+
+def test_probe_and_metrics_paths_are_exempt():
+    middleware = ClientRateLimitMiddleware(_ok_app, ClientRateLimiter(3))
+    for path in ("/health", "/ready", "/metrics"):
+        assert _statuses(middleware, path, 6) == [200] * 6
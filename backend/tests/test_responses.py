@@ -0,0 +1,77 @@
+"""
+Golden tests for pre-serialized roadmaps.
+
+dump_roadmap() must produce byte-for-byte what FastAPI sends for the same
+model through response_model (which is what clients and ETags saw before
+roadmaps were cached as bytes).
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from factories import make_roadmap
+from models.schemas import RoadmapResponse
+from responses import CachedRoadmap, dump_roadmap, orjson
+
+
+_app = FastAPI()
+_current: dict = {}
+
+
+@_app.get("/roadmap", response_model=RoadmapResponse)
+async def _roadmap():
+    return _current["roadmap"]
+
+
+def fastapi_bytes(roadmap: RoadmapResponse) -> bytes:
+    """Body of a plain FastAPI endpoint returning the roadmap with response_model."""
+    _current["roadmap"] = roadmap
+
+    async def fetch():
+        transport = httpx.ASGITransport(app=_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/roadmap")
+            response.raise_for_status()
+            return response.content
+
+    return asyncio.run(fetch())
+
+
+GOLDEN_ROADMAPS = {
+    "typical": make_roadmap(topics=15),
+    "no_topics": make_roadmap(topics=0),
+    "unicode": make_roadmap(text='Café "quotes" \\ back\tslash \x01\x1f\x7f   😀 中文'),
+    "hours_none": make_roadmap(hours=None),
+    "hours_int": make_roadmap(hours=3),
+    "hours_repr": make_roadmap(hours=0.1 + 0.2),
+    "hours_large": make_roadmap(hours=123456789012345.6),
+    "hours_exponent_large": make_roadmap(hours=1e16),
+    "hours_exponent_small": make_roadmap(hours=1e-5),
+    "microseconds": make_roadmap(generated_at=datetime(2024, 6, 1, 12, 30, 45, 123456)),
+    "utc": make_roadmap(generated_at=datetime(2024, 6, 1, tzinfo=timezone.utc)),
+    "zero_offset": make_roadmap(generated_at=datetime(2024, 6, 1, tzinfo=timezone(timedelta(0)))),
+    "offset": make_roadmap(generated_at=datetime(2024, 6, 1, tzinfo=timezone(timedelta(hours=5, minutes=30)))),
+}
+
+
+@pytest.mark.parametrize("name", sorted(GOLDEN_ROADMAPS))
+def test_dump_matches_fastapi_bytes(name):
+    roadmap = GOLDEN_ROADMAPS[name]
+    assert dump_roadmap(roadmap) == fastapi_bytes(roadmap)
+
+
+@pytest.mark.parametrize("name", sorted(GOLDEN_ROADMAPS))
+def test_cached_roadmap_round_trip(name):
+    roadmap = GOLDEN_ROADMAPS[name]
+    assert CachedRoadmap.from_roadmap(roadmap).json_bytes() == fastapi_bytes(roadmap)
+
+
+@pytest.mark.skipif(orjson is None, reason="orjson not installed")
+def test_non_finite_hours_are_null():
+    # Accepted difference: FastAPI's json.dumps refused this roadmap (500)
+    roadmap = make_roadmap(hours=float("inf"))
+    assert b'"estimatedHours":null' in dump_roadmap(roadmap)
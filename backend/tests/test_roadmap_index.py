@@ -0,0 +1,68 @@
+"""Tests for the local roadmap search index."""
+
+import json
+import time
+
+import roadmap_index as module
+from cache import LazyValue, SimpleCache
+from factories import make_roadmap
+from persistence import SNAPSHOT_CODECS
+from responses import CachedRoadmap
+
+
+def _subscribed_index():
+    cache = SimpleCache(name="roadmap-test")
+    index = module.RoadmapIndex()
+    cache.subscribe(index.add_cached, index.remove)
+    return cache, index
+
+
+def _snapshot_value(text: str) -> LazyValue:
+    raw = SNAPSHOT_CODECS["roadmap"][0](CachedRoadmap.from_roadmap(make_roadmap(text=text)))
+    return LazyValue(raw, SNAPSHOT_CODECS["roadmap"][1])
+
+
+def test_restored_roadmaps_are_indexed_in_the_background(monkeypatch):
+    cache, index = _subscribed_index()
+    parsed, loads = [], json.loads
+    monkeypatch.setattr(module.json, "loads", lambda s: parsed.append(s) or loads(s))
+
+    for i in range(5):
+        cache.restore(f"course{i}", _snapshot_value("Kubernetes"), time.time())
+    assert len(index) == 5
+    # Neither restoring nor an early search parses the snapshot entries
+    assert index.search("kubernetes") == []
+    assert parsed == []
+
+    assert index.index_pending() == 5
+    assert len(parsed) == 5
+    assert {r["courseId"] for r in index.search("kubernetes")} == {f"course{i}" for i in range(5)}
+    assert index.index_pending() == 0
+
+
+def test_removed_before_indexing_is_not_indexed():
+    cache, index = _subscribed_index()
+    cache.restore("gone", _snapshot_value("Kubernetes"), time.time())
+    index.remove("gone")
+
+    assert index.index_pending() == 0
+    assert index.search("kubernetes") == []
+    assert len(index) == 0
+
+
+def test_stored_roadmap_replaces_pending_snapshot_entry():
+    cache, index = _subscribed_index()
+    cache.restore("course", _snapshot_value("Kubernetes"), time.time())
+    index.add("course", json.loads(CachedRoadmap.from_roadmap(make_roadmap(text="Docker")).json_bytes()))
+
+    assert index.index_pending() == 0
+    assert index.search("kubernetes") == []
+    assert [r["courseId"] for r in index.search("docker")] == ["course"]
+
+
+def test_stored_roadmaps_are_searchable_immediately():
+    cache, index = _subscribed_index()
+    cache.set("https://www.udemy.com/course/docker/", CachedRoadmap.from_roadmap(make_roadmap(text="Docker")))
+
+    [result] = index.search("docker")
+    assert result["course"]["title"] == "Docker Bootcamp"
@@ -0,0 +1,42 @@
+"""Tests for the scraper's cheap non-course pre-check."""
+
+import pytest
+
+from services.scraper import ScraperService
+
+
+@pytest.mark.parametrize("url", [
+    "https://www.udemy.com/course/python-bootcamp/",
+    "https://www.coursera.org/learn/machine-learning",
+    "https://www.pluralsight.com/courses/docker-fundamentals",
+    "https://www.pluralsight.com/paths/kubernetes-administration",
+    "https://app.pluralsight.com/library/courses/docker-fundamentals",
+    "https://app.pluralsight.com/library/courses/docker-fundamentals/table-of-contents",
+    "https://www.linkedin.com/learning/learning-python",
+    "https://example.com/some-course",
+])
+def test_course_pages_pass(url):
+    assert ScraperService().non_course_reason(url) is None
+
+
+@pytest.mark.parametrize("url", [
+    "https://www.pluralsight.com/",
+    "https://app.pluralsight.com/library/",
+    "https://www.pluralsight.com/search?q=docker",
+    "https://www.udemy.com/courses/search/?q=python",
+    "https://www.linkedin.com/learningx/something",
+    "https://www.youtube.com/watch?v=abc",
+    "http://127.0.0.1/course/x",
+    "https://example.com/syllabus.pdf",
+])
+def test_non_course_pages_are_rejected(url):
+    assert ScraperService().non_course_reason(url) is not None
+
+
+def test_page_without_content_is_a_transient_failure():
+    service = ScraperService()
+    service.key_pool.set_keys(["key-1234"])
+    service._scrape = lambda url: {"markdown": "Please enable JavaScript and cookies to continue"}
+    result = service.scrape_course("https://www.udemy.com/course/python-bootcamp/")
+    assert result["success"] is False
+    assert result["permanent"] is False
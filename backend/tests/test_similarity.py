@@ -0,0 +1,31 @@
+"""Tests for near-duplicate course detection."""
+
+import random
+
+from similarity import SimilarityIndex, title_similarity
+
+
+def _course_page(seed: int, price: str) -> str:
+    rng = random.Random(seed)
+    words = [rng.choice("abcdefghijklmnopqrstuvwxyz") * rng.randint(2, 8) + str(i % 7) for i in range(60)]
+    body = " ".join(rng.choice(words) for _ in range(600))
+    return f"Price {price} rated 4.7 by 12,345 students. {body} Updated 2024-05-01"
+
+
+def test_mirror_on_another_platform_matches():
+    index = SimilarityIndex(min_shingles=50, threshold=0.95)
+    index.add("udemy-course", index.signature(_course_page(1, "$19.99")))
+    signature, matches = index.match(_course_page(1, "€84.99"), exclude="mirror")
+    assert signature is not None
+    assert [course_id for course_id, _ in matches] == ["udemy-course"]
+    assert index.match(_course_page(2, "$19.99"))[1] == []
+
+
+def test_title_similarity_tolerates_rewording():
+    assert title_similarity(
+        "The Complete Python Bootcamp From Zero to Hero in Python",
+        "Complete Python Bootcamp: Go from zero to hero",
+    ) >= 0.5
+    assert title_similarity("Docker Mastery", "docker mastery!") == 1.0
+    assert title_similarity("Docker Mastery", "Kubernetes for Beginners") < 0.5
+    assert title_similarity("", "Docker") == 0.0
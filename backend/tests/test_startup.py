@@ -0,0 +1,49 @@
+"""Import-time budget: the upstream SDKs stay out of `import main`, the app out of `import pipeline`."""
+
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Slow-to-import SDKs that load on first use (or in the client warm-up after startup)
+LAZY_SDKS = ("google.genai", "firecrawl", "googleapiclient")
+
+
+def test_import_main_leaves_sdks_unloaded():
+    script = (
+        "import json, sys\n"
+        "import main\n"
+        f"print(json.dumps(sorted(m for m in sys.modules if m.startswith({LAZY_SDKS!r}))))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BACKEND_DIR,
+        env=dict(os.environ, LOG_LEVEL="CRITICAL"),
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    eager = [m for m in loaded if any(m == sdk or m.startswith(sdk + ".") for sdk in LAZY_SDKS)]
+    assert eager == []
+
+
+def test_import_pipeline_leaves_app_unloaded():
+    script = (
+        "import sys\n"
+        "import pipeline\n"
+        "print('main' in sys.modules)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BACKEND_DIR,
+        env=dict(os.environ, LOG_LEVEL="CRITICAL"),
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "False"
@@ -0,0 +1,61 @@
+"""Executor call accounting in tracing.run_in_executor."""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import ExecutorStats, run_in_executor, start_trace
+import tracing
+
+
+def _run_with_stats(monkeypatch, scenario):
+    stats = ExecutorStats()
+    monkeypatch.setattr(tracing, "executor_stats", stats)
+
+    async def main():
+        executor = ThreadPoolExecutor(max_workers=1)
+        asyncio.get_running_loop().set_default_executor(executor)
+        try:
+            await scenario(stats)
+        finally:
+            executor.shutdown(wait=True)
+
+    asyncio.run(main())
+    return stats
+
+
+def test_counts_queued_and_in_flight_calls(monkeypatch):
+    release = threading.Event()
+    seen = {}
+
+    async def scenario(stats):
+        with start_trace("test"):
+            calls = [asyncio.ensure_future(run_in_executor("wait", release.wait)) for _ in range(3)]
+            while stats.started < 1:
+                await asyncio.sleep(0.01)
+            seen["queued"], seen["in_flight"] = stats.queued, stats.in_flight
+            release.set()
+            await asyncio.gather(*calls)
+
+    stats = _run_with_stats(monkeypatch, scenario)
+    assert seen == {"queued": 2, "in_flight": 3}
+    assert (stats.submitted, stats.started, stats.completed) == (3, 3, 3)
+    assert stats.queued == stats.in_flight == 0
+
+
+def test_call_cancelled_before_start_is_settled(monkeypatch):
+    release = threading.Event()
+
+    async def scenario(stats):
+        running = asyncio.ensure_future(run_in_executor("wait", release.wait))
+        waiting = asyncio.ensure_future(run_in_executor("wait", release.wait))
+        while stats.started < 1:
+            await asyncio.sleep(0.01)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        release.set()
+        await running
+
+    stats = _run_with_stats(monkeypatch, scenario)
+    assert (stats.submitted, stats.started, stats.completed) == (2, 2, 2)
+    assert stats.queued == stats.in_flight == 0
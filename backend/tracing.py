@@ -0,0 +1,323 @@
+"""
+Lightweight per-request tracing for FuckPaidCourses backend.
+
+Spans are tracked with a contextvar, so they follow asyncio tasks and (via
+run_in_executor below) blocking calls in the thread pool. Finished traces are
+kept in a buffer of the slowest recent requests for /admin/traces, and can be
+exported as Chrome trace-event JSON (open in Perfetto or chrome://tracing).
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+from config import settings
+
+
+class Span:
+    """A timed operation with attributes and child spans."""
+
+    __slots__ = ("name", "attrs", "start", "end", "children", "trace_id", "thread")
+
+    def __init__(self, name: str, trace_id: str, attrs: dict = None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: list["Span"] = []
+        self.trace_id = trace_id
+        self.thread = threading.current_thread().name
+
+    @property
+    def duration(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start)
+
+    def child(self, name: str, attrs: dict = None) -> "Span":
+        span = Span(name, self.trace_id, attrs)
+        self.children.append(span)
+        return span
+
+    def to_dict(self, origin: float) -> dict:
+        """Nested representation with times in ms relative to the root span."""
+        return {
+            "name": self.name,
+            "startMs": round((self.start - origin) * 1000, 3),
+            "durationMs": round(self.duration * 1000, 3),
+            "thread": self.thread,
+            "attrs": self.attrs,
+            "children": [c.to_dict(origin) for c in self.children],
+        }
+
+
+class Trace:
+    """A finished request: root span plus wall-clock start time."""
+
+    __slots__ = ("root", "wall_start")
+
+    def __init__(self, root: Span, wall_start: float):
+        self.root = root
+        self.wall_start = wall_start
+
+    def to_dict(self) -> dict:
+        return {
+            "traceId": self.root.trace_id,
+            "startedAt": self.wall_start,
+            "durationMs": round(self.root.duration * 1000, 3),
+            "root": self.root.to_dict(self.root.start),
+        }
+
+    def to_chrome(self) -> dict:
+        """Chrome trace-event format (complete "X" events, one track per thread)."""
+        events = []
+        threads: dict[str, int] = {}
+        origin = self.root.start
+
+        def visit(span: Span) -> None:
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            events.append({
+                "name": span.name,
+                "ph": "X",
+                "ts": round(self.wall_start * 1e6 + (span.start - origin) * 1e6, 1),
+                "dur": round(span.duration * 1e6, 1),
+                "pid": 1,
+                "tid": tid,
+                "args": span.attrs,
+            })
+            for child in span.children:
+                visit(child)
+
+        visit(self.root)
+        for name, tid in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class SlowTraceBuffer:
+    """Keeps the N slowest traces seen within a sliding time window."""
+
+    def __init__(self, size: int, window: float):
+        self.size = size
+        self.window = window
+        self._heap: list[tuple[float, int, Trace]] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace) -> bool:
+        """Offer a trace. Returns True if it was kept."""
+        entry = (trace.root.duration, next(self._counter), trace)
+        with self._lock:
+            self._expire()
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+                return True
+            if entry[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+                return True
+            return False
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.window
+        if any(t.wall_start < cutoff for _, _, t in self._heap):
+            self._heap = [e for e in self._heap if e[2].wall_start >= cutoff]
+            heapq.heapify(self._heap)
+
+    def slowest(self) -> list[Trace]:
+        """Traces ordered slowest first."""
+        with self._lock:
+            self._expire()
+            return [t for _, _, t in sorted(self._heap, key=lambda e: e[0], reverse=True)]
+
+
+class _ChromeExporter:
+    """Writes kept traces as Chrome trace JSON files from a background thread."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._queue: queue.Queue = queue.Queue(maxsize=100)
+        threading.Thread(target=self._run, name="fpc-trace-export", daemon=True).start()
+
+    def export(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            pass  # Never block requests on trace export
+
+    def _run(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            trace = self._queue.get()
+            path = os.path.join(self.directory, f"trace-{int(trace.wall_start)}-{trace.root.trace_id}.json")
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(trace.to_chrome(), f, default=str)
+            except OSError:
+                pass
+
+
+class ExecutorStats:
+    """
+    Submitted, started and completed counts of run_in_executor calls.
+
+    Counted in the wrapper rather than read from the executor, whose work
+    queue is a private attribute of ThreadPoolExecutor.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+
+    @property
+    def queued(self) -> int:
+        """Calls waiting for a free executor thread."""
+        return self.submitted - self.started
+
+    @property
+    def in_flight(self) -> int:
+        """Calls submitted and not yet completed (queued or running)."""
+        return self.submitted - self.completed
+
+    def submit(self) -> "_ExecutorCall":
+        with self._lock:
+            self.submitted += 1
+        return _ExecutorCall(self)
+
+
+class _ExecutorCall:
+    """One call's progress through ExecutorStats (queued -> running -> done)."""
+
+    __slots__ = ("stats", "state")
+
+    QUEUED, RUNNING, DONE = 0, 1, 2
+
+    def __init__(self, stats: ExecutorStats):
+        self.stats = stats
+        self.state = self.QUEUED
+
+    def start(self) -> None:
+        """Called in the worker thread before the function runs."""
+        with self.stats._lock:
+            if self.state == self.QUEUED:
+                self.state = self.RUNNING
+                self.stats.started += 1
+
+    def finish(self) -> None:
+        """Called in the worker thread after the function returns or raises."""
+        with self.stats._lock:
+            if self.state == self.RUNNING:
+                self.state = self.DONE
+                self.stats.completed += 1
+
+    def abandon(self) -> None:
+        """Called by the awaiting task; settles a call cancelled before it started."""
+        with self.stats._lock:
+            if self.state == self.QUEUED:
+                self.state = self.DONE
+                self.stats.started += 1
+                self.stats.completed += 1
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("fpc_span", default=None)
+
+slow_traces = SlowTraceBuffer(settings.TRACE_BUFFER_SIZE, settings.TRACE_WINDOW)
+_exporter = _ChromeExporter(settings.TRACE_EXPORT_DIR) if settings.TRACE_EXPORT_DIR else None
+executor_stats = ExecutorStats()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def start_trace(name: str, **attrs: Any):
+    """Start a root span for a request; the finished trace is offered to the slow buffer."""
+    wall_start = time.time()
+    root = Span(name, uuid.uuid4().hex[:16], attrs)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        root.end = time.perf_counter()
+        _current_span.reset(token)
+        trace = Trace(root, wall_start)
+        if slow_traces.add(trace) and _exporter and root.duration >= settings.TRACE_EXPORT_MIN_SECONDS:
+            _exporter.export(trace)
+
+
+@contextmanager
+def span(name: str, **attrs: Any):
+    """Time a block as a child of the current span (no-op outside a trace)."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, attrs)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+async def run_in_executor(name: str, func: Callable, *args: Any) -> Any:
+    """
+    Run a blocking call in the default executor inside a span.
+
+    The current context is copied into the worker thread so spans opened by
+    the service are nested correctly, and the time spent waiting for a free
+    thread is recorded separately as queue_ms. Every call is counted in
+    executor_stats.
+    """
+    loop = asyncio.get_running_loop()
+    parent = _current_span.get()
+    tracked = executor_stats.submit()
+
+    if parent is None:
+        def call():
+            tracked.start()
+            try:
+                return func(*args)
+            finally:
+                tracked.finish()
+
+        try:
+            return await loop.run_in_executor(None, call)
+        finally:
+            tracked.abandon()
+
+    child = parent.child(name)
+    ctx = contextvars.copy_context()
+
+    def call():
+        tracked.start()
+        child.attrs["queue_ms"] = round((time.perf_counter() - child.start) * 1000, 3)
+        child.thread = threading.current_thread().name
+        token = _current_span.set(child)
+        try:
+            return func(*args)
+        finally:
+            _current_span.reset(token)
+            tracked.finish()
+
+    try:
+        return await loop.run_in_executor(None, ctx.run, call)
+    finally:
+        tracked.abandon()
+        child.end = time.perf_counter()
@@ -1,7 +1,56 @@
 // API configuration
 const API_BASE = import.meta.env.VITE_API_URL || 'http://localhost:8000'
 
+// Maps course URL -> roadmap ID returned by the API (X-Roadmap-Id header)
+const ROADMAP_IDS_KEY = 'fpc_roadmap_ids'
+// Only the most recently used courses are remembered, so localStorage stays small
+const MAX_ROADMAP_IDS = 50
+
+function loadRoadmapIds() {
+    try {
+        return JSON.parse(localStorage.getItem(ROADMAP_IDS_KEY)) || {}
+    } catch {
+        return {}
+    }
+}
+
+function saveRoadmapId(url, id) {
+    const ids = loadRoadmapIds()
+    // Re-insert so insertion order is recency order, then drop the oldest
+    delete ids[url]
+    ids[url] = id
+    const urls = Object.keys(ids)
+    for (const old of urls.slice(0, Math.max(0, urls.length - MAX_ROADMAP_IDS))) {
+        delete ids[old]
+    }
+    try {
+        localStorage.setItem(ROADMAP_IDS_KEY, JSON.stringify(ids))
+    } catch {
+        // Storage full or disabled: the roadmap is just regenerated next time
+    }
+}
+
+// Cacheable GET: the browser/CDN revalidates with If-None-Match, so repeat
+// views usually get a 304 (or an edge hit) instead of a new generation.
+async function fetchCachedRoadmap(id) {
+    try {
+        const response = await fetch(`${API_BASE}/roadmaps/${encodeURIComponent(id)}`)
+        if (!response.ok) return null
+        const data = await response.json()
+        return data.success ? data : null
+    } catch {
+        return null
+    }
+}
+
 export async function generateRoadmap(url) {
+    const key = url.trim()
+    const knownId = loadRoadmapIds()[key]
+    if (knownId) {
+        const cached = await fetchCachedRoadmap(knownId)
+        if (cached) return cached
+    }
+
     const response = await fetch(`${API_BASE}/generate-roadmap`, {
         method: 'POST',
         headers: {
@@ -20,5 +69,8 @@ export async function generateRoadmap(url) {
         throw new Error(data.message || 'Failed to generate roadmap')
     }
 
+    const roadmapId = response.headers.get('X-Roadmap-Id')
+    if (roadmapId) saveRoadmapId(key, roadmapId)
+
     return data
 }